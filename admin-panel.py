@@ -1,10 +1,43 @@
 import sqlite3
 import json
+import re
+import zlib
+import gzip
+import hashlib
 import toml
 import os
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template_string
+import time
+import argparse
+import bisect
+import sys
+import random
+import shutil
+import tempfile
+import atexit
+import functools
+import threading
+import collections
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context, copy_current_request_context
 from flask_cors import CORS
+from werkzeug.serving import make_server
+
+try:
+    import websocket  # pip install websocket-client, only needed for LIVE_STREAM_MODE = "relay"
+except ImportError:
+    websocket = None
+
+try:
+    import grpc  # pip install grpcio, only needed for ADMISSION_GRPC_ADDRESS
+except ImportError:
+    grpc = None
+
+try:
+    import coincurve  # pip install coincurve, only needed to check signatures on import
+except ImportError:
+    coincurve = None
 
 
 # ==============================================================================
@@ -23,6 +56,36 @@ RELAY_WEBSOCKET_URL = "wss://your.relay.here"
 # 4. Geheimer Schlüssel für die Flask-Session
 SECRET_SESSION_KEY = 'Mit openssl rand -hex 32 im Terminal generieren'
 
+# 5. Pfad zur eigenen Datenbank des Admin-Panels (Statistiken, Jobs, Indizes).
+#    Wird automatisch angelegt, das Schema des Relays bleibt unverändert.
+ADMIN_DATABASE_PATH = "/path/to/admin-panel.db"
+
+# 6. Intervall in Sekunden, in dem die Dashboard-Statistiken fortgeschrieben werden
+STATS_REFRESH_INTERVAL = 10
+
+# 7. Volltextsuche (SQLite FTS5) für Notizen aktivieren. Der Index liegt in der
+#    Admin-Datenbank und wird im Hintergrund aufgebaut (benötigt zusätzlichen Speicherplatz).
+FULLTEXT_SEARCH = False
+
+# 8. Quelle des Live-Streams:
+#    "relay"   = das Panel hält eine einzige Subscription zum Relay und verteilt die Events
+#                an alle geöffneten Browser (benötigt `pip install websocket-client`)
+#    "database" = das Panel liest neue Events direkt aus der Datenbank des Relays
+#                (auch ohne Zugriff auf RELAY_WEBSOCKET_URL, zeigt auch versteckte Events)
+#    "browser" = jeder Browser verbindet sich selbst mit RELAY_WEBSOCKET_URL
+LIVE_STREAM_MODE = "relay"
+
+# 9. Adresse, unter der das Panel die Event-Zulassung für das Relay beantwortet (gRPC,
+#    benötigt `pip install grpcio`). Im config.toml des Relays eintragen:
+#        [grpc]
+#        event_admission_server = "http://[::1]:50051"
+#    Sperren wirken dann sofort, ohne Neustart des Relays. None = deaktiviert.
+ADMISSION_GRPC_ADDRESS = None
+
+# 10. SQL-Anweisungen des Panels, die länger als so viele Sekunden brauchen, werden mit
+#     ihrem Abfrageplan im Tab "Performance" protokolliert
+SLOW_QUERY_SECONDS = 0.25
+
 # ==============================================================================
 # ===== ENDE DER KONFIGURATION =================================================
 # ==============================================================================
@@ -32,17 +95,507 @@ app.secret_key = SECRET_SESSION_KEY
 app.permanent_session_lifetime = timedelta(hours=8)
 CORS(app)
 
-# --- Hilfsfunktionen ---
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
+# --- Metriken ---
+# Instrumentation for /metrics in the Prometheus text format. Requests and SQLite
+# statements are timed into fixed-bucket histograms held in memory, so a scrape
+# only formats numbers that already exist. What it reports about the relay comes
+# from the incremental statistics and file sizes, never from a scan of the event table.
+
+METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Kinds reported one by one; all others are summed up as kind="other"
+METRICS_TOP_KINDS = 30
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def metric_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+def metric_family(name, metric_type, help_text, samples):
+    """Formats one metric family; samples are (labels dict, value) pairs."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    lines.extend(f'{name}{metric_labels(labels)} {value:g}' if isinstance(value, float) else f'{name}{metric_labels(labels)} {value}'
+                 for labels, value in samples)
+    return lines
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.bucket_labels = [f'{bound:g}' for bound in buckets] + ['+Inf']
+        self.lock = threading.Lock()
+        # label values -> [count per bucket (the last one is +Inf), sum]
+        self.series = {}
+
+    def observe(self, label_values, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def render(self):
+        with self.lock:
+            snapshot = [(values, list(counts), total) for values, (counts, total) in sorted(self.series.items())]
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for values, counts, total in snapshot:
+            labels = dict(zip(self.label_names, values))
+            cumulative = 0
+            for bound, count in zip(self.bucket_labels, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{metric_labels({**labels, "le": bound})} {cumulative}')
+            lines.append(f'{self.name}_sum{metric_labels(labels)} {total:g}')
+            lines.append(f'{self.name}_count{metric_labels(labels)} {cumulative}')
+        return lines
+
+request_latency = Histogram('panel_http_request_duration_seconds', 'Time until the response (headers, for streams) was ready, per route.', ('route', 'method', 'status'))
+query_latency = Histogram('panel_sqlite_query_duration_seconds',
+                          'Time SQLite spent on a statement, fetching its rows included, per database and calling function.',
+                          ('db', 'caller'))
+
+@app.before_request
+def start_request_timer():
+    request.environ['panel.started'] = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = request.environ.get('panel.started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_latency.observe((route, request.method, str(response.status_code)), time.perf_counter() - started)
+    return response
+
+# --- Abfrage-Profiler ---
+# Every statement run on a pooled connection is profiled: the time SQLite spends
+# on it (executing and fetching, not the Python code in between), the rows it
+# returned or changed, and the virtual machine steps counted by the connection's
+# progress handler, which stand in for the rows it had to look at. Statements are
+# aggregated by their text. Those slower than SLOW_QUERY_SECONDS go to an
+# in-memory slow-query log together with their EXPLAIN QUERY PLAN; full table
+# scans in the plan come with a suggested index.
+
+PROFILE_MAX_STATEMENTS = 500
+SLOW_QUERY_LOG_SIZE = 200
+SLOW_QUERY_MAX_SQL = 4000
+profile_lock = threading.Lock()
+profile_statements = {}
+slow_queries = collections.deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """One key per statement shape: whitespace collapsed and placeholder lists of any length folded."""
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', sql)
+    return re.sub(r'\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+', '(?, ...), ...', sql)
+
+def query_caller(frame):
+    # Comprehensions, lambdas and generators are attributed to the function they are written in
+    while frame.f_back is not None and frame.f_code.co_name.startswith('<'):
+        frame = frame.f_back
+    return frame.f_code.co_name
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Adds up the time spent in SQLite and the rows returned until the statement is finished:
+    exhausted, or replaced by the next statement on the connection, or the connection released."""
+    profile = None
+
+    def start(self, sql, parameters, caller, many=False):
+        conn = self.connection
+        conn.finish_statement()
+        self.profile = {"sql": sql, "parameters": None if many else parameters, "caller": caller, "seconds": 0.0, "rows": 0,
+                        "steps": conn.progress_ticks, "error": False}
+        conn.active_cursor = self
+
+    def timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self.profile is not None:
+                self.profile["seconds"] += time.perf_counter() - started
+
+    def fetchone(self):
+        row = self.timed(super().fetchone)
+        if self.profile is not None:
+            if row is None:
+                self.finish()
+            else:
+                self.profile["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.timed(super().fetchmany, self.arraysize if size is None else size)
+        if self.profile is not None:
+            self.profile["rows"] += len(rows)
+            if not rows:
+                self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self.timed(super().fetchall)
+        if self.profile is not None:
+            self.profile["rows"] += len(rows)
+            self.finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self.timed(super().__next__)
+        except StopIteration:
+            self.finish()
+            raise
+        if self.profile is not None:
+            self.profile["rows"] += 1
+        return row
+
+    def finish(self):
+        profile, self.profile = self.profile, None
+        if profile is None:
+            return
+        conn = self.connection
+        if conn.active_cursor is self:
+            conn.active_cursor = None
+        if profile["rows"] == 0 and self.rowcount > 0:
+            # Writes report the rows they changed
+            profile["rows"] = self.rowcount
+        profile["steps"] = (conn.progress_ticks - profile["steps"]) * QUERY_PROGRESS_STEPS
+        record_statement(conn, profile)
+
+def record_statement(conn, profile):
+    db = conn.pool.name if conn.pool else 'unpooled'
+    seconds = profile["seconds"]
+    query_latency.observe((db, profile["caller"]), seconds)
+    key = (db, normalize_sql(profile["sql"]))
+    with profile_lock:
+        entry = profile_statements.get(key)
+        if entry is None:
+            if len(profile_statements) >= PROFILE_MAX_STATEMENTS:
+                # Make room by forgetting the statement that cost the least so far
+                del profile_statements[min(profile_statements, key=lambda k: profile_statements[k]["total_seconds"])]
+            entry = profile_statements[key] = {"db": db, "sql": key[1], "callers": set(), "calls": 0, "errors": 0, "total_seconds": 0.0,
+                                               "max_seconds": 0.0, "rows": 0, "steps": 0, "slow": 0}
+        entry["callers"].add(profile["caller"])
+        entry["calls"] += 1
+        entry["errors"] += profile["error"]
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        entry["rows"] += profile["rows"]
+        entry["steps"] += profile["steps"]
+        slow = seconds >= SLOW_QUERY_SECONDS
+        if slow:
+            entry["slow"] += 1
+    if slow:
+        plan = explain_query_plan(conn, profile["sql"], profile["parameters"])
+        slow_queries.append({"at": int(time.time()), "db": db, "caller": profile["caller"], "sql": profile["sql"][:SLOW_QUERY_MAX_SQL],
+                             "seconds": round(seconds, 4), "rows": profile["rows"], "steps": profile["steps"], "error": profile["error"],
+                             "plan": plan, "full_scans": sorted({table for table, _ in plan_scans(profile["sql"], plan)}),
+                             "suggestions": suggest_indexes(conn, profile["sql"], plan)})
+
+def explain_query_plan(conn, sql, parameters):
+    """The plan as indented lines, or [] for statements that can't be explained again (executemany, errors)."""
+    if parameters is None:
+        return []
+    try:
+        # The plain execute: explaining must not profile itself or trip the deadline
+        conn.set_progress_handler(None, 0)
+        rows = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    finally:
+        conn.set_progress_handler(conn.on_progress, QUERY_PROGRESS_STEPS)
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+# A full table scan, or a walk through a whole index
+SCAN_RE = re.compile(r'SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (?:COVERING )?INDEX \w+)?')
+TABLE_ALIAS_RE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE\b|JOIN\b|ORDER\b|GROUP\b|LIMIT\b|ON\b|INNER\b|LEFT\b|CROSS\b)(\w+))?', re.IGNORECASE)
+CONDITION_RE = re.compile(r'(?:(\w+)\.)?(\w+)\s*(=|==|\bIN\b|\bIS\b|>=|<=|>|<|\bBETWEEN\b)', re.IGNORECASE)
+
+def plan_scans(sql, plan):
+    """(table, alias) for every scan in the plan. Newer SQLite versions name a table by its alias only."""
+    aliases = {alias: table for table, alias in TABLE_ALIAS_RE.findall(sql) if alias}
+    scans = [match.groups() for match in (SCAN_RE.fullmatch(line.strip()) for line in plan) if match]
+    return [(aliases[name], name) if name in aliases else (name, alias) for name, alias in scans]
+
+def suggest_indexes(conn, sql, plan):
+    """CREATE INDEX statements for tables the plan reads in full: the columns compared for
+    equality in the WHERE clause first, then one range column, then the ORDER BY column
+    if the plan sorts in a temporary b-tree. Nothing is suggested when an index already
+    starts with the first of these columns, or when the WHERE clause has none of them."""
+    scans = plan_scans(sql, plan)
+    if not scans:
+        return []
+    where = re.search(r'\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)', sql, re.IGNORECASE | re.DOTALL)
+    order_by = re.search(r'\bORDER BY\s+(?:(\w+)\.)?(\w+)', sql, re.IGNORECASE)
+    sorts = any('USE TEMP B-TREE FOR ORDER BY' in line for line in plan)
+    suggestions = []
+    for table, alias in scans:
+        try:
+            columns = {row[1] for row in sqlite3.Connection.execute(conn, f'PRAGMA table_info({table})')}
+            indexed = {sqlite3.Connection.execute(conn, f'PRAGMA index_info("{index[1]}")').fetchone()[2]
+                       for index in sqlite3.Connection.execute(conn, f'PRAGMA index_list({table})').fetchall()}
+        except (sqlite3.Error, TypeError):
+            continue
+        equal, ranged = [], []
+        for qualifier, column, operator in CONDITION_RE.findall(where.group(1) if where else ''):
+            if column not in columns or (qualifier and qualifier not in (table, alias)) or column in equal + ranged:
+                continue
+            (equal if operator.upper() in ('=', '==', 'IN', 'IS') else ranged).append(column)
+        index_columns = equal + ranged[:1]
+        if sorts and order_by and order_by.group(2) in columns and order_by.group(2) not in index_columns and not ranged:
+            index_columns.append(order_by.group(2))
+        if not index_columns or index_columns[0] in indexed:
+            continue
+        suggestions.append(f'CREATE INDEX IF NOT EXISTS {table}_{"_".join(index_columns)}_index ON {table}({", ".join(index_columns)});')
+    return suggestions
+
+def profile_report(order='total', limit=50):
+    sort_keys = {'total': lambda e: e["total_seconds"], 'max': lambda e: e["max_seconds"], 'calls': lambda e: e["calls"],
+                 'average': lambda e: e["total_seconds"] / e["calls"], 'steps': lambda e: e["steps"]}
+    with profile_lock:
+        entries = [{**entry, "callers": sorted(entry["callers"])} for entry in profile_statements.values()]
+        slow = list(slow_queries)
+    entries.sort(key=sort_keys.get(order, sort_keys['total']), reverse=True)
+    for entry in entries:
+        entry["average_seconds"] = entry["total_seconds"] / entry["calls"]
+    return {"statements": entries[:limit], "tracked": len(entries), "slow_queries": slow[::-1],
+            "slow_query_seconds": SLOW_QUERY_SECONDS}
+
+def profile_reset():
+    with profile_lock:
+        profile_statements.clear()
+        slow_queries.clear()
+
+# --- Datenbank-Verbindungen ---
+# Connections are pooled instead of opened per request. Reads on the relay DB use
+# genuinely read-only connections; all writes to it go through one writer
+# connection that is handed out exclusively, so the panel never competes with
+# itself for the relay's write lock. conn.close() returns a connection to its pool.
+
+DB_POOL_MAX_IDLE = 8
+DB_BUSY_TIMEOUT_MS = 5000
+DB_READ_PRAGMAS = ('PRAGMA query_only = ON', 'PRAGMA mmap_size = 268435456', 'PRAGMA cache_size = -16000')
+
+class PooledConnection(sqlite3.Connection):
+    pool = None
+    active_cursor = None
+    # Deadline of the bounded query the connection is used for (see with_query_deadline)
+    deadline = None
+    progress_ticks = 0
+
+    def on_progress(self):
+        self.progress_ticks += 1
+        if self.deadline is None or time.monotonic() < self.deadline:
+            return 0
+        query_local.timed_out = True
+        return 1
+
+    def run_profiled(self, method, sql, parameters, many):
+        cursor = self.cursor(ProfiledCursor)
+        cursor.start(sql, parameters, query_caller(sys._getframe(2)), many)
+        try:
+            cursor.timed(method, cursor, sql, parameters)
+        except Exception:
+            cursor.profile["error"] = True
+            cursor.finish()
+            raise
+        # Writes and other statements without result rows are finished right away
+        if cursor.description is None:
+            cursor.finish()
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.run_profiled(sqlite3.Cursor.execute, sql, parameters, False)
+
+    def executemany(self, sql, parameters):
+        return self.run_profiled(sqlite3.Cursor.executemany, sql, parameters, True)
+
+    def finish_statement(self):
+        if self.active_cursor is not None:
+            self.active_cursor.finish()
+
+    def close(self):
+        self.pool.release(self)
+
+class ConnectionPool:
+    def __init__(self, name, connect, exclusive=False):
+        self.name = name
+        self.connect = connect
+        # An exclusive pool hands out one connection at a time and makes other threads wait for it
+        self.exclusive_lock = threading.RLock() if exclusive else None
+        self.max_idle = 1 if exclusive else DB_POOL_MAX_IDLE
+        self.lock = threading.Lock()
+        self.idle = []
+        self.metrics = {"created": 0, "checkouts": 0, "reused": 0, "in_use": 0, "discarded": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    def acquire(self):
+        if self.exclusive_lock:
+            started = time.perf_counter()
+            self.exclusive_lock.acquire()
+            waited = time.perf_counter() - started
+            with self.lock:
+                self.metrics["wait_seconds_total"] += waited
+                self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+            self.metrics["checkouts"] += 1
+            self.metrics["in_use"] += 1
+            self.metrics["reused" if conn else "created"] += 1
+        if conn is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                self.release_slot()
+                raise
+            conn.pool = self
+            conn.set_progress_handler(conn.on_progress, QUERY_PROGRESS_STEPS)
+        return conn
+
+    def release(self, conn):
+        try:
+            conn.finish_statement()
+            conn.deadline = None
+            if conn.in_transaction:
+                conn.rollback()
+            with self.lock:
+                keep = len(self.idle) < self.max_idle
+                if keep:
+                    self.idle.append(conn)
+                else:
+                    self.metrics["discarded"] += 1
+            if not keep:
+                sqlite3.Connection.close(conn)
+        finally:
+            self.release_slot()
+
+    def release_slot(self):
+        with self.lock:
+            self.metrics["in_use"] -= 1
+        if self.exclusive_lock:
+            self.exclusive_lock.release()
+
+    def stats(self):
+        with self.lock:
+            return {**self.metrics, "idle": len(self.idle)}
+
+def connect_relay_readonly():
+    conn = sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, factory=PooledConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    for pragma in DB_READ_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def get_db_connection_rw():
-    conn = sqlite3.connect(DATABASE_PATH)
+def connect_relay_writer():
+    conn = sqlite3.connect(DATABASE_PATH, factory=PooledConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
     return conn
 
+def connect_admin():
+    conn = sqlite3.connect(ADMIN_DATABASE_PATH, factory=PooledConnection, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    return conn
+
+relay_read_pool = ConnectionPool('relay_read', connect_relay_readonly)
+relay_write_pool = ConnectionPool('relay_write', connect_relay_writer, exclusive=True)
+admin_pool = ConnectionPool('admin', connect_admin)
+
+def get_db_connection():
+    return with_query_deadline(relay_read_pool.acquire())
+
+def get_db_connection_rw():
+    """The relay writer connection. Other threads block until it is closed again, so keep it short."""
+    return relay_write_pool.acquire()
+
+def get_admin_db_connection():
+    return with_query_deadline(admin_pool.acquire())
+
+def pool_metrics():
+    return {pool.name: pool.stats() for pool in (relay_read_pool, relay_write_pool, admin_pool)}
+
+# Expensive read endpoints run on a bounded pool of query threads instead of the
+# request thread, so a burst of searches cannot occupy every connection while
+# cheap endpoints wait. Reads they make are interrupted by a progress handler
+# once QUERY_TIMEOUT seconds have passed since the request arrived (time spent
+# waiting for a free query thread included); the request then fails with 504.
+
+QUERY_WORKERS = 4
+QUERY_TIMEOUT = 30.0
+# The progress handler checks the deadline and counts steps for the profiler every this many VM instructions
+QUERY_PROGRESS_STEPS = 1000
+query_local = threading.local()
+query_pool_lock = threading.Lock()
+query_pool = None
+query_metrics = {"queued": 0, "running": 0, "completed": 0, "timeouts": 0}
+
+def with_query_deadline(conn):
+    """Makes the connection's statements abort once the current bounded query's deadline has passed."""
+    conn.deadline = getattr(query_local, 'deadline', None)
+    return conn
+
+def get_query_pool():
+    global query_pool
+    with query_pool_lock:
+        if query_pool is None:
+            query_pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix='query')
+        return query_pool
+
+def query_timeout_response():
+    with query_pool_lock:
+        query_metrics["timeouts"] += 1
+    return jsonify({"error": f"Query took longer than {QUERY_TIMEOUT:g}s and was aborted. Narrow the search or try again later."}), 504
+
+def bounded_query(view):
+    """Runs a view on the query pool with a deadline on its database reads."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        deadline = time.monotonic() + QUERY_TIMEOUT
+
+        @copy_current_request_context
+        def run():
+            with query_pool_lock:
+                query_metrics["queued"] -= 1
+                query_metrics["running"] += 1
+            try:
+                if time.monotonic() >= deadline:
+                    return query_timeout_response()
+                query_local.deadline, query_local.timed_out = deadline, False
+                response = view(*args, **kwargs)
+                # An interrupted statement surfaces as a generic sqlite3 error inside the view
+                return query_timeout_response() if query_local.timed_out else response
+            finally:
+                query_local.deadline = None
+                with query_pool_lock:
+                    query_metrics["running"] -= 1
+                    query_metrics["completed"] += 1
+
+        with query_pool_lock:
+            query_metrics["queued"] += 1
+        future = get_query_pool().submit(run)
+        try:
+            # Backstop for views stuck outside SQLite, e.g. waiting for the writer connection
+            return future.result(timeout=QUERY_TIMEOUT + 5)
+        except FutureTimeoutError:
+            return query_timeout_response()
+    return wrapper
+
+def query_pool_stats():
+    with query_pool_lock:
+        return {**query_metrics, "workers": QUERY_WORKERS, "timeout_seconds": QUERY_TIMEOUT}
+
+# --- Hilfsfunktionen ---
+
 def setup_database():
     conn = get_db_connection_rw()
     conn.execute('''
@@ -62,195 +615,3303 @@ def format_db_size(size_bytes):
     elif size_bytes < 1024**3: return f"{round(size_bytes / (1024**2), 2)} MB"
     else: return f"{round(size_bytes / (1024**3), 2)} GB"
 
-# --- API Endpunkte ---
+def setup_admin_database():
+    conn = get_admin_db_connection()
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS admin_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS stats_kinds (
+            kind INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS stats_authors (
+            author BLOB PRIMARY KEY,
+            count INTEGER NOT NULL,
+            first_seen INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS stats_authors_count_index ON stats_authors(count);
+        CREATE INDEX IF NOT EXISTS stats_authors_first_seen_index ON stats_authors(first_seen);
+        CREATE TABLE IF NOT EXISTS stats_replaceable (
+            author BLOB NOT NULL,
+            kind INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (author, kind)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS stats_timeline (
+            step INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            events INTEGER NOT NULL DEFAULT 0,
+            new_authors INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (step, bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS stats_timeline_kinds (
+            step INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            kind INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (step, bucket, kind)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            position INTEGER NOT NULL DEFAULT 0,
+            start_position INTEGER NOT NULL DEFAULT 0,
+            end_position INTEGER NOT NULL DEFAULT 0,
+            progress INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at INTEGER NOT NULL,
+            started_at INTEGER,
+            updated_at INTEGER,
+            finished_at INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_index ON jobs(status);
+        CREATE TABLE IF NOT EXISTS spam_activity (
+            bucket INTEGER NOT NULL,
+            author BLOB NOT NULL,
+            kind INTEGER NOT NULL,
+            events INTEGER NOT NULL DEFAULT 0,
+            duplicates INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, author, kind)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS spam_fingerprints (
+            band INTEGER PRIMARY KEY,
+            bucket INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS spam_fingerprints_bucket_index ON spam_fingerprints(bucket);
+        CREATE TABLE IF NOT EXISTS retention_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind INTEGER,
+            max_age_days INTEGER,
+            author_cap INTEGER,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            created_at INTEGER NOT NULL,
+            last_run_at INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS retention_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER,
+            rule_id INTEGER,
+            description TEXT NOT NULL,
+            started_at INTEGER NOT NULL,
+            duration_seconds REAL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS storage_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at INTEGER NOT NULL,
+            report TEXT NOT NULL
+        );
+    ''')
+    global fts_ready
+    if FULLTEXT_SEARCH:
+        try:
+            # rowid mirrors event.id in the relay DB
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS fts_events USING fts5(content, tokenize = 'unicode61 remove_diacritics 2')")
+            fts_ready = True
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search disabled, FTS5 is not available: {e}")
+    conn.commit()
+    conn.close()
 
-@app.route('/api/stats')
-def get_stats():
-    conn, conn_rw = None, None
-    stats = {}
+def get_meta(conn, key, default=0):
+    row = conn.execute('SELECT value FROM admin_meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row and row[0] is not None else default
+
+def set_meta(conn, key, value):
+    conn.execute('INSERT INTO admin_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, value))
+
+# --- Antwort-Cache ---
+# Read endpoints that every open browser polls (stats, ban list, config, ...) are
+# cached per URL for a few seconds. Code that changes the underlying data calls
+# invalidate_cache() with the affected groups, so a ban or a delete shows up on
+# the next request instead of after the TTL. Responses carry an ETag and
+# Cache-Control: no-cache, so browsers revalidate and unchanged payloads come
+# back as an empty 304.
+
+RESPONSE_CACHE_MAX_ENTRIES = 256
+CacheEntry = collections.namedtuple('CacheEntry', 'body mimetype etag expires')
+
+class ResponseCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        # One lock per key, so concurrent misses compute a payload once
+        self.key_locks = {}
+        # Bumped on invalidation; a payload computed across an invalidation is not stored
+        self.generations = collections.Counter()
+        self.metrics = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    def lookup(self, cache_key):
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None and entry.expires > time.monotonic():
+                self.metrics["hits"] += 1
+                return entry
+        return None
+
+    def fetch(self, group, key, ttl, build):
+        """Returns (entry, True) from the cache or (entry, False) after calling build(), which
+        returns a Flask response. Non-200 responses are not cached and come back as (response, False)."""
+        cache_key = (group, key)
+        entry = self.lookup(cache_key)
+        if entry is not None:
+            return entry, True
+        with self.lock:
+            key_lock = self.key_locks.setdefault(cache_key, threading.Lock())
+        with key_lock:
+            entry = self.lookup(cache_key)
+            if entry is not None:
+                return entry, True
+            with self.lock:
+                self.metrics["misses"] += 1
+                generation = self.generations[group]
+            response = build()
+            if response.status_code != 200 or response.is_streamed:
+                return response, False
+            body = response.get_data()
+            entry = CacheEntry(body, response.mimetype, hashlib.sha1(body).hexdigest(), time.monotonic() + ttl)
+            with self.lock:
+                if self.generations[group] == generation:
+                    if len(self.entries) >= RESPONSE_CACHE_MAX_ENTRIES:
+                        now = time.monotonic()
+                        self.entries = {k: e for k, e in self.entries.items() if e.expires > now}
+                        if len(self.entries) >= RESPONSE_CACHE_MAX_ENTRIES:
+                            self.entries.clear()
+                        self.key_locks = {k: lock for k, lock in self.key_locks.items() if k in self.entries or k == cache_key}
+                    self.entries[cache_key] = entry
+            return entry, False
+
+    def invalidate(self, *groups):
+        with self.lock:
+            for group in groups:
+                self.generations[group] += 1
+            self.entries = {k: e for k, e in self.entries.items() if k[0] not in groups}
+            self.metrics["invalidations"] += 1
+
+    def stats(self):
+        with self.lock:
+            return {**self.metrics, "entries": len(self.entries)}
+
+response_cache = ResponseCache()
+
+def invalidate_cache(*groups):
+    response_cache.invalidate(*groups)
+
+def cached_response(group, ttl, vary=None):
+    """Caches a GET endpoint for ttl seconds or until invalidate_cache(group). vary() adds
+    something cheap to check to the key, e.g. the mtime of a file that may change behind our back."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            key = (request.full_path, vary() if vary else None)
+            entry, hit = response_cache.fetch(group, key, ttl, lambda: app.make_response(view(*args, **kwargs)))
+            if not isinstance(entry, CacheEntry):
+                return entry
+            response = Response(entry.body, mimetype=entry.mimetype)
+            response.set_etag(entry.etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+            response = response.make_conditional(request)
+            if response.status_code == 304:
+                with response_cache.lock:
+                    response_cache.metrics["not_modified"] += 1
+            return response
+        return wrapper
+    return decorator
+
+# --- Statistik-Engine ---
+# The dashboard numbers are running aggregates kept in the admin DB. They are
+# advanced from a rowid high-water mark on the relay's event table, so reading
+# them never touches more than the rows added since the last refresh.
+
+STATS_BATCH_SIZE = 50000
+stats_lock = threading.Lock()
+
+# Bucket width in seconds -> how far back buckets of that width are kept.
+# The timeline is an activity histogram: it counts events as they were ingested
+# and is not decremented when events are deleted or superseded later.
+TIMELINE_RETENTION = {60: 2 * 86400, 3600: 35 * 86400}
+
+def is_replaceable_kind(kind):
+    return kind in (0, 3) or 10000 <= kind < 20000 or 30000 <= kind < 40000
+
+def stats_apply(admin, kinds, authors, first_seen):
+    """Applies per-kind and per-author count deltas to the aggregate tables. Returns first_seen of newly added authors."""
+    for kind, delta in kinds.items():
+        if delta:
+            admin.execute('INSERT INTO stats_kinds (kind, count) VALUES (?, ?) ON CONFLICT(kind) DO UPDATE SET count = count + excluded.count', (kind, delta))
+    admin.execute('DELETE FROM stats_kinds WHERE count <= 0')
+
+    distinct_delta, new_authors = 0, []
+    for author, delta in authors.items():
+        row = admin.execute('SELECT count FROM stats_authors WHERE author = ?', (author,)).fetchone()
+        if row is None:
+            if delta > 0:
+                admin.execute('INSERT INTO stats_authors (author, count, first_seen) VALUES (?, ?, ?)', (author, delta, first_seen[author]))
+                distinct_delta += 1
+                new_authors.append(first_seen[author])
+        elif row[0] + delta <= 0:
+            admin.execute('DELETE FROM stats_authors WHERE author = ?', (author,))
+            distinct_delta -= 1
+        elif author in first_seen:
+            admin.execute('UPDATE stats_authors SET count = count + ?, first_seen = MIN(first_seen, ?) WHERE author = ?', (delta, first_seen[author], author))
+        else:
+            admin.execute('UPDATE stats_authors SET count = count + ? WHERE author = ?', (delta, author))
+
+    set_meta(admin, 'stats_total_events', get_meta(admin, 'stats_total_events') + sum(kinds.values()))
+    set_meta(admin, 'stats_distinct_authors', get_meta(admin, 'stats_distinct_authors') + distinct_delta)
+    return new_authors
+
+def timeline_buckets(created_at, now):
+    for step, keep in TIMELINE_RETENTION.items():
+        if created_at >= now - keep:
+            yield step, created_at - created_at % step
+
+def timeline_apply(admin, events, new_authors, now):
+    """Adds event timestamps (with kinds) and new-author timestamps to the histogram buckets."""
+    totals, kinds = {}, {}
+    for created_at, kind in events:
+        for step, bucket in timeline_buckets(created_at, now):
+            totals.setdefault((step, bucket), [0, 0])[0] += 1
+            kinds[(step, bucket, kind)] = kinds.get((step, bucket, kind), 0) + 1
+    for first_seen in new_authors:
+        for step, bucket in timeline_buckets(first_seen, now):
+            totals.setdefault((step, bucket), [0, 0])[1] += 1
+    admin.executemany('''INSERT INTO stats_timeline (step, bucket, events, new_authors) VALUES (?, ?, ?, ?)
+                         ON CONFLICT(step, bucket) DO UPDATE SET events = events + excluded.events, new_authors = new_authors + excluded.new_authors''',
+                      [(step, bucket, e, n) for (step, bucket), (e, n) in totals.items()])
+    admin.executemany('''INSERT INTO stats_timeline_kinds (step, bucket, kind, count) VALUES (?, ?, ?, ?)
+                         ON CONFLICT(step, bucket, kind) DO UPDATE SET count = count + excluded.count''',
+                      [(step, bucket, kind, n) for (step, bucket, kind), n in kinds.items()])
+
+def timeline_prune(admin, now):
+    for step, keep in TIMELINE_RETENTION.items():
+        admin.execute('DELETE FROM stats_timeline WHERE step = ? AND bucket < ?', (step, now - keep - step))
+        admin.execute('DELETE FROM stats_timeline_kinds WHERE step = ? AND bucket < ?', (step, now - keep - step))
+
+def timeline_sum(admin, since):
+    """Sums events and new authors over the minute buckets that overlap (since, now]."""
+    row = admin.execute('SELECT COALESCE(SUM(events), 0), COALESCE(SUM(new_authors), 0) FROM stats_timeline WHERE step = 60 AND bucket > ?', (since - 60,)).fetchone()
+    return row[0], row[1]
+
+def stats_advance(max_rows=None):
+    """Folds events added since the last run into the aggregates. Returns the number of rows processed."""
+    processed = 0
+    conn, admin = get_db_connection(), get_admin_db_connection()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        now_ts = int(datetime.now().timestamp())
-        ts_24h_ago = now_ts - (24 * 3600)
-        ts_1h_ago = now_ts - 3600
+        while max_rows is None or processed < max_rows:
+            # The lock covers one batch only, so a delete waiting for it (with the relay writer held) waits one batch at most
+            with stats_lock:
+                # IMMEDIATE serializes concurrent panel processes on the high-water mark
+                admin.execute('BEGIN IMMEDIATE')
+                last_id = get_meta(admin, 'stats_last_id')
+                rows = conn.execute('SELECT id, author, kind, created_at FROM event WHERE id > ? ORDER BY id LIMIT ?', (last_id, STATS_BATCH_SIZE)).fetchall()
+                if not rows:
+                    admin.rollback()
+                    break
+                last_id = rows[-1]['id']
 
-        stats['total_events'] = cursor.execute('SELECT COUNT(*) FROM event').fetchone()[0] or 0
-        stats['distinct_pubkeys'] = cursor.execute('SELECT COUNT(DISTINCT author) FROM event').fetchone()[0] or 0
-        stats['events_24h'] = cursor.execute('SELECT COUNT(*) FROM event WHERE created_at > ?', (ts_24h_ago,)).fetchone()[0] or 0
-        stats['events_1h'] = cursor.execute('SELECT COUNT(*) FROM event WHERE created_at > ?', (ts_1h_ago,)).fetchone()[0] or 0
-        stats['new_users_24h'] = cursor.execute("SELECT COUNT(*) FROM (SELECT MIN(created_at) as first_seen FROM event GROUP BY author) WHERE first_seen > ?", (ts_24h_ago,)).fetchone()[0] or 0
-        stats['top_kinds'] = [dict(row) for row in cursor.execute("SELECT kind, COUNT(*) as count FROM event GROUP BY kind ORDER BY count DESC LIMIT 5").fetchall()]
-        dm_count = cursor.execute("SELECT COUNT(*) FROM event WHERE kind = 4").fetchone()[0] or 0
-        stats['dm_percentage'] = round((dm_count / stats['total_events']) * 100, 2) if stats['total_events'] > 0 else 0
-        top_users_query = cursor.execute("SELECT lower(hex(author)) as pubkey, COUNT(*) as count FROM event GROUP BY author ORDER BY count DESC LIMIT 5").fetchall()
-        stats['top_users'] = [dict(row) for row in top_users_query]
-        oldest_event_ts = cursor.execute("SELECT MIN(created_at) FROM event").fetchone()[0]
-        stats['oldest_event_date'] = datetime.fromtimestamp(oldest_event_ts).strftime('%d. %b %Y') if oldest_event_ts else "N/A"
-        
-        # This count is read from our own table for UI speed
-        conn_rw = get_db_connection_rw()
-        stats['banned_pubkeys'] = conn_rw.execute('SELECT COUNT(*) FROM banned_pubkeys').fetchone()[0] or 0
-        
-        stats['db_size'] = format_db_size(os.path.getsize(DATABASE_PATH)) if os.path.exists(DATABASE_PATH) else "N/A"
-    except Exception as e:
-        print(f"Error fetching stats: {e}")
-        return jsonify({"error": str(e)}), 500
+                kinds, authors, first_seen, replaceable = {}, {}, {}, {}
+                for row in rows:
+                    author, kind, created_at = row['author'], row['kind'], row['created_at']
+                    kinds[kind] = kinds.get(kind, 0) + 1
+                    authors[author] = authors.get(author, 0) + 1
+                    first_seen[author] = min(first_seen.get(author, created_at), created_at)
+                    if is_replaceable_kind(kind):
+                        replaceable[(author, kind)] = replaceable.get((author, kind), 0) + 1
+
+                # The relay deletes superseded replaceable events, so re-count those pairs via author_kind_index
+                for (author, kind), added in replaceable.items():
+                    known = admin.execute('SELECT count FROM stats_replaceable WHERE author = ? AND kind = ?', (author, kind)).fetchone()
+                    live = conn.execute('SELECT COUNT(*) FROM event WHERE author = ? AND kind = ? AND id <= ?', (author, kind, last_id)).fetchone()[0]
+                    removed = (known[0] if known else 0) + added - live
+                    if removed > 0:
+                        kinds[kind] -= removed
+                        authors[author] -= removed
+                    admin.execute('INSERT INTO stats_replaceable (author, kind, count) VALUES (?, ?, ?) ON CONFLICT(author, kind) DO UPDATE SET count = excluded.count', (author, kind, live))
+                admin.execute('DELETE FROM stats_replaceable WHERE count <= 0')
+
+                new_authors = stats_apply(admin, kinds, authors, first_seen)
+                timeline_apply(admin, [(row['created_at'], row['kind']) for row in rows], new_authors, int(time.time()))
+                set_meta(admin, 'stats_last_id', last_id)
+                admin.commit()
+                processed += len(rows)
+
+        # MIN() on created_at_index is a single index seek
+        set_meta(admin, 'stats_oldest_event', conn.execute('SELECT MIN(created_at) FROM event').fetchone()[0])
+        timeline_prune(admin, int(time.time()))
+        set_meta(admin, 'stats_updated_at', int(time.time()))
+        admin.commit()
     finally:
-        if conn: conn.close()
-        if conn_rw: conn_rw.close()
-    return jsonify(stats)
+        conn.close()
+        admin.close()
+    if processed:
+        invalidate_cache('stats', 'timeseries')
+    return processed
 
-@app.route('/api/events/batch-delete', methods=['POST'])
-def batch_delete_events():
-    data = request.get_json()
-    age_days = data.get('age_days')
-    kind = data.get('kind')
-    where_clauses = []
-    params = []
-    if age_days:
+def stats_forget(conn, admin, where_clause, params):
+    """Subtracts the events matching where_clause from the aggregates. Call under stats_lock, before deleting them."""
+    last_id = get_meta(admin, 'stats_last_id')
+    kinds, authors = {}, {}
+    grouped = conn.execute(f'SELECT author, kind, COUNT(*) FROM event WHERE ({where_clause}) AND id <= ? GROUP BY author, kind', (*params, last_id))
+    for author, kind, count in grouped:
+        kinds[kind] = kinds.get(kind, 0) - count
+        authors[author] = authors.get(author, 0) - count
+        if is_replaceable_kind(kind):
+            admin.execute('UPDATE stats_replaceable SET count = count - ? WHERE author = ? AND kind = ?', (count, author, kind))
+    admin.execute('DELETE FROM stats_replaceable WHERE count <= 0')
+    stats_apply(admin, kinds, authors, {})
+
+def stats_rebuild():
+    with stats_lock:
+        admin = get_admin_db_connection()
         try:
-            ts_limit = int((datetime.now() - timedelta(days=int(age_days))).timestamp())
-            where_clauses.append("created_at < ?")
-            params.append(ts_limit)
-        except (ValueError, TypeError):
-            return jsonify({"error": "Invalid age_days value"}), 400
-    if kind != None and kind != '':
+            admin.execute('DELETE FROM stats_kinds')
+            admin.execute('DELETE FROM stats_authors')
+            admin.execute('DELETE FROM stats_replaceable')
+            admin.execute('DELETE FROM stats_timeline')
+            admin.execute('DELETE FROM stats_timeline_kinds')
+            admin.execute("DELETE FROM admin_meta WHERE key LIKE 'stats_%'")
+            admin.commit()
+        finally:
+            admin.close()
+    return stats_advance()
+
+def stats_check(sample_limit=10):
+    """Compares the aggregates against the live tables up to the high-water mark. Expensive: full scans."""
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        # Both databases are in WAL mode: a read transaction opened under the lock pins a snapshot
+        # of each, so the scans below see a consistent pair without blocking deletes while they run
+        with stats_lock:
+            conn.execute('BEGIN')
+            conn.execute('SELECT 1 FROM event LIMIT 1').fetchall()
+            admin.execute('BEGIN')
+            last_id = get_meta(admin, 'stats_last_id')
+        report = {"last_id": last_id, "mismatches": []}
+        def mismatch(name, stored, live):
+            if stored != live:
+                report["mismatches"].append({"check": name, "stored": stored, "live": live})
+
+        mismatch('total_events', get_meta(admin, 'stats_total_events'),
+                 conn.execute('SELECT COUNT(*) FROM event WHERE id <= ?', (last_id,)).fetchone()[0])
+        mismatch('distinct_pubkeys', get_meta(admin, 'stats_distinct_authors'),
+                 conn.execute('SELECT COUNT(DISTINCT author) FROM event WHERE id <= ?', (last_id,)).fetchone()[0])
+        live_kinds = dict(conn.execute('SELECT kind, COUNT(*) FROM event WHERE id <= ? GROUP BY kind', (last_id,)).fetchall())
+        stored_kinds = dict(admin.execute('SELECT kind, count FROM stats_kinds').fetchall())
+        for kind in sorted(set(live_kinds) | set(stored_kinds)):
+            mismatch(f'kind {kind}', stored_kinds.get(kind, 0), live_kinds.get(kind, 0))
+
+        # Merge-join both author lists in key order so neither side has to fit in memory
+        live = conn.execute('SELECT author, COUNT(*), MIN(created_at) FROM event WHERE id <= ? GROUP BY author ORDER BY author', (last_id,))
+        stored = admin.execute('SELECT author, count, first_seen FROM stats_authors ORDER BY author')
+        author_mismatches, first_seen_mismatches, samples = 0, 0, []
+        l, s = live.fetchone(), stored.fetchone()
+        while l is not None or s is not None:
+            if s is None or (l is not None and l[0] < s[0]):
+                entry, l = (l[0], 0, l[1]), live.fetchone()
+            elif l is None or s[0] < l[0]:
+                entry, s = (s[0], s[1], 0), stored.fetchone()
+            else:
+                entry = (l[0], s[1], l[1])
+                if s[2] != l[2]:
+                    first_seen_mismatches += 1
+                l, s = live.fetchone(), stored.fetchone()
+            if entry[1] != entry[2]:
+                author_mismatches += 1
+                if len(samples) < sample_limit:
+                    samples.append({"pubkey": entry[0].hex(), "stored": entry[1], "live": entry[2]})
+        mismatch('author_counts', 0, author_mismatches)
+        report["author_samples"] = samples
+        # first_seen is not lowered again when an author's oldest event is deleted, so this is informational
+        report["first_seen_drift"] = first_seen_mismatches
+        report["consistent"] = not report["mismatches"]
+        return report
+    finally:
+        conn.close()
+        admin.close()
+
+# --- Volltextindex ---
+# An FTS5 table in the admin DB, filled by tailing the event table by rowid.
+# Rows deleted through the panel are removed right away; rows the relay removes
+# itself (e.g. superseded profiles) are dropped lazily when a search hits them.
+
+FTS_KINDS = (0, 1, 30023)
+FTS_BATCH_SIZE = 5000
+fts_ready = False
+fts_lock = threading.Lock()
+
+def extract_note_text(raw):
+    """The relay stores the whole serialized event; only its content field is indexed."""
+    try:
+        content = json.loads(raw).get('content')
+    except (ValueError, AttributeError):
+        return raw
+    return content if isinstance(content, str) else ''
+
+def fts_advance(max_rows=None):
+    """Indexes events added since the last run. Returns the number of rows scanned."""
+    if not fts_ready:
+        return 0
+    scanned = 0
+    kinds = ','.join(str(k) for k in FTS_KINDS)
+    with fts_lock:
+        conn, admin = get_db_connection(), get_admin_db_connection()
         try:
-            where_clauses.append("kind = ?")
-            params.append(int(kind))
-        except (ValueError, TypeError):
-            return jsonify({"error": "Invalid kind value"}), 400
-    if not where_clauses:
-        return jsonify({"error": "No delete criteria specified"}), 400
-    
-    conn = get_db_connection_rw()
+            while max_rows is None or scanned < max_rows:
+                admin.execute('BEGIN IMMEDIATE')
+                last_id = get_meta(admin, 'fts_last_id')
+                max_id = min(conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0, last_id + FTS_BATCH_SIZE)
+                if max_id <= last_id:
+                    admin.rollback()
+                    break
+                rows = conn.execute(f'SELECT id, content FROM event WHERE id > ? AND id <= ? AND kind IN ({kinds})', (last_id, max_id)).fetchall()
+                admin.executemany('INSERT OR REPLACE INTO fts_events (rowid, content) VALUES (?, ?)',
+                                  [(row['id'], extract_note_text(row['content'])) for row in rows])
+                set_meta(admin, 'fts_last_id', max_id)
+                admin.commit()
+                scanned += max_id - last_id
+        finally:
+            conn.close()
+            admin.close()
+    return scanned
+
+def fts_forget(conn, admin, where_clause, params):
+    """Removes the events matching where_clause from the index. Call before deleting them."""
+    if not fts_ready:
+        return
+    kinds = ','.join(str(k) for k in FTS_KINDS)
+    doomed = conn.execute(f'SELECT id FROM event WHERE ({where_clause}) AND kind IN ({kinds})', tuple(params))
+    admin.executemany('DELETE FROM fts_events WHERE rowid = ?', doomed)
+
+def fts_rebuild():
+    with fts_lock:
+        admin = get_admin_db_connection()
+        try:
+            admin.execute('DELETE FROM fts_events')
+            set_meta(admin, 'fts_last_id', 0)
+            admin.commit()
+        finally:
+            admin.close()
+    return fts_advance()
+
+def fts_lag(conn, admin):
+    return max(0, (conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0) - get_meta(admin, 'fts_last_id'))
+
+def fts_match_query(text):
+    """Turns user input into a safe FTS5 query: "quoted phrases" and word* prefixes are kept, everything is AND-ed."""
+    terms = []
+    for token in re.findall(r'"[^"]*"|\S+', text):
+        word = token.strip('"').replace('"', '')
+        if not word.strip('*'):
+            continue
+        if token.startswith('"'):
+            terms.append(f'"{word}"')
+        elif word.endswith('*'):
+            terms.append(f'"{word.rstrip("*")}"*')
+        else:
+            terms.append(f'"{word}"')
+    return ' '.join(terms)
+
+def fts_search(conn, admin, text, limit, offset=0):
+    """Returns relay events matching text, best bm25 rank first."""
+    match = fts_match_query(text)
+    if not match:
+        return []
+    ids = [row[0] for row in admin.execute('SELECT rowid FROM fts_events WHERE fts_events MATCH ? ORDER BY rank LIMIT ? OFFSET ?', (match, limit, offset))]
+    if not ids:
+        return []
+    placeholders = ','.join('?' * len(ids))
+    found = {row['id']: dict(row) for row in conn.execute(f'{EVENT_SELECT} WHERE id IN ({placeholders})', ids)}
+    stale = [(i,) for i in ids if i not in found]
+    if stale:
+        admin.executemany('DELETE FROM fts_events WHERE rowid = ?', stale)
+        admin.commit()
+    return [found[i] for i in ids if i in found]
+
+def fts_worker():
+    while True:
+        try:
+            behind = fts_advance(max_rows=FTS_BATCH_SIZE * 20) > 0
+        except Exception as e:
+            print(f"Error updating full-text index: {e}")
+            behind = False
+        # Keep going in short steps while catching up, otherwise poll like the stats worker
+        time.sleep(0.5 if behind else STATS_REFRESH_INTERVAL)
+
+# --- Spam-Erkennung ---
+# Scores authors by what they did recently: event rate, kind mix and how much of
+# their text is a near-duplicate of other recent events (MinHash over word
+# shingles, bucketed into LSH bands). Like the statistics, the pass runs
+# incrementally from a rowid high-water mark and only keeps SPAM_RETENTION of
+# history, bucketed by first_seen (the relay's receive time, which authors
+# cannot backdate). Deleted events are not subtracted, as with the timeline.
+
+SPAM_BATCH_SIZE = 20000
+SPAM_BUCKET_SECONDS = 300
+SPAM_RETENTION = 24 * 3600
+SPAM_REFRESH_INTERVAL = 60
+SPAM_TEXT_KINDS = (0, 1, 42, 30023)
+SPAM_MIN_TEXT_LENGTH = 16
+# Events per hour at which the rate component is maxed out, and the sample size below which scores are damped
+SPAM_RATE_LIMIT = 60
+SPAM_MIN_EVENTS = 5
+# 12 MinHash values in 4 bands of 3: texts with a Jaccard similarity of ~0.6 or more usually share a band
+MINHASH_BANDS, MINHASH_ROWS = 4, 3
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_SEEDS = [((i * 0x9E3779B97F4A7C15 + 0x632BE59BD9B4E019) % MINHASH_PRIME | 1, (i * 0xBF58476D1CE4E5B9 + 0x94D049BB133111EB) % MINHASH_PRIME)
+                 for i in range(MINHASH_BANDS * MINHASH_ROWS)]
+SPAM_WINDOWS = {'1h': 3600, '6h': 6 * 3600, '24h': 24 * 3600}
+spam_lock = threading.Lock()
+
+def content_shingles(text):
+    """Word 3-grams of the normalized text (character 5-grams for short texts), as 32-bit hashes."""
+    text = re.sub(r'https?://\S+', ' url ', text.lower())
+    words = re.findall(r'\w+', text)
+    if len(words) >= 5:
+        grams = (' '.join(words[i:i + 3]) for i in range(len(words) - 2))
+    else:
+        joined = ' '.join(words)
+        grams = (joined[i:i + 5] for i in range(max(1, len(joined) - 4)))
+    return {zlib.crc32(gram.encode()) for gram in grams}
+
+def minhash_bands(text):
+    """LSH band keys of a text; two texts sharing any key are treated as near-duplicates."""
+    shingles = content_shingles(text)
+    if not shingles:
+        return []
+    signature = [min((a * h + b) % MINHASH_PRIME for h in shingles) for a, b in MINHASH_SEEDS]
+    keys = []
+    for band in range(MINHASH_BANDS):
+        values = signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]
+        digest = hashlib.blake2b(repr((band, values)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+def spam_advance(max_rows=None):
+    """Folds events added since the last run into the per-author activity. Returns the number of rows processed."""
+    processed = 0
+    text_kinds = set(SPAM_TEXT_KINDS)
+    with spam_lock:
+        conn, admin = get_db_connection(), get_admin_db_connection()
+        try:
+            now = int(time.time())
+            horizon = now - SPAM_RETENTION
+            if get_meta(admin, 'spam_last_id', None) is None:
+                # First run: start at the last day of events instead of scanning history (created_at_index range)
+                first_id = conn.execute('SELECT MIN(id) FROM event WHERE created_at >= ?', (horizon,)).fetchone()[0]
+                set_meta(admin, 'spam_last_id', (first_id or (conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0) + 1) - 1)
+                admin.commit()
+            while max_rows is None or processed < max_rows:
+                admin.execute('BEGIN IMMEDIATE')
+                last_id = get_meta(admin, 'spam_last_id')
+                rows = conn.execute('SELECT id, author, kind, first_seen, content FROM event WHERE id > ? ORDER BY id LIMIT ?', (last_id, SPAM_BATCH_SIZE)).fetchall()
+                if not rows:
+                    admin.rollback()
+                    break
+
+                activity, fingerprints = {}, {}
+                for row in rows:
+                    if row['first_seen'] < horizon:
+                        continue
+                    bucket = row['first_seen'] // SPAM_BUCKET_SECONDS
+                    duplicate = 0
+                    if row['kind'] in text_kinds:
+                        text = extract_note_text(row['content'])
+                        if len(text) >= SPAM_MIN_TEXT_LENGTH:
+                            keys = minhash_bands(text)
+                            seen = [key for key in keys if key in fingerprints]
+                            unseen = [key for key in keys if key not in fingerprints]
+                            if unseen:
+                                placeholders = ','.join('?' * len(unseen))
+                                seen += [r[0] for r in admin.execute(f'SELECT band FROM spam_fingerprints WHERE band IN ({placeholders})', unseen)]
+                            duplicate = 1 if seen else 0
+                            for key in keys:
+                                fingerprints[key] = bucket
+                    counts = activity.setdefault((bucket, row['author'], row['kind']), [0, 0])
+                    counts[0] += 1
+                    counts[1] += duplicate
+
+                admin.executemany('''INSERT INTO spam_activity (bucket, author, kind, events, duplicates) VALUES (?, ?, ?, ?, ?)
+                                     ON CONFLICT(bucket, author, kind) DO UPDATE SET events = events + excluded.events, duplicates = duplicates + excluded.duplicates''',
+                                  [(*key, events, duplicates) for key, (events, duplicates) in activity.items()])
+                admin.executemany('''INSERT INTO spam_fingerprints (band, bucket) VALUES (?, ?)
+                                     ON CONFLICT(band) DO UPDATE SET bucket = MAX(bucket, excluded.bucket)''', fingerprints.items())
+                set_meta(admin, 'spam_last_id', rows[-1]['id'])
+                admin.commit()
+                processed += len(rows)
+
+            cutoff = horizon // SPAM_BUCKET_SECONDS
+            admin.execute('DELETE FROM spam_activity WHERE bucket < ?', (cutoff,))
+            admin.execute('DELETE FROM spam_fingerprints WHERE bucket < ?', (cutoff,))
+            set_meta(admin, 'spam_updated_at', now)
+            admin.commit()
+        finally:
+            conn.close()
+            admin.close()
+    if processed:
+        invalidate_cache('suspects')
+    return processed
+
+def spam_score(events, duplicates, top_kind_share, peak_hour_events):
+    """0-100. The busiest hour's rate dominates, so a burst stands out in a long window too;
+    duplicates and a one-kind diet add to it; few events damp everything."""
+    rate = min(1.0, peak_hour_events / SPAM_RATE_LIMIT)
+    volume = min(1.0, events / SPAM_MIN_EVENTS)
+    return round(100 * volume * (0.5 * rate + 0.35 * duplicates / events + 0.15 * top_kind_share * rate), 1)
+
+def spam_suspects(admin, window_seconds, limit, include_banned=False):
+    since_bucket = (int(time.time()) - window_seconds) // SPAM_BUCKET_SECONDS
+    buckets_per_hour = 3600 // SPAM_BUCKET_SECONDS
+    authors = {}
+    for author_key, kind, hour, events, duplicates in admin.execute(
+            'SELECT author, kind, bucket / ? AS hour, SUM(events), SUM(duplicates) FROM spam_activity WHERE bucket >= ? GROUP BY author, kind, hour',
+            (buckets_per_hour, since_bucket)):
+        author = authors.setdefault(author_key, {"events": 0, "duplicates": 0, "kinds": {}, "hours": {}})
+        author["events"] += events
+        author["duplicates"] += duplicates
+        author["kinds"][kind] = author["kinds"].get(kind, 0) + events
+        author["hours"][hour] = author["hours"].get(hour, 0) + events
+    suspects = []
+    for author, data in authors.items():
+        pubkey = author.hex()
+        banned = pubkey in ban_registry
+        if banned and not include_banned:
+            continue
+        top_kind_share = max(data["kinds"].values()) / data["events"]
+        suspects.append({
+            "pubkey": pubkey,
+            "score": spam_score(data["events"], data["duplicates"], top_kind_share, max(data["hours"].values())),
+            "events": data["events"],
+            "events_per_hour": round(data["events"] * 3600 / window_seconds, 1),
+            "peak_hour_events": max(data["hours"].values()),
+            "duplicates": data["duplicates"],
+            "duplicate_ratio": round(data["duplicates"] / data["events"], 3),
+            "kinds": data["kinds"],
+            "top_kind_share": round(top_kind_share, 3),
+            "banned": banned,
+        })
+    suspects.sort(key=lambda s: (s["score"], s["events"]), reverse=True)
+    return suspects[:limit]
+
+def spam_worker():
+    while True:
+        try:
+            behind = spam_advance(max_rows=SPAM_BATCH_SIZE * 10) >= SPAM_BATCH_SIZE * 10
+        except Exception as e:
+            print(f"Error scoring spam: {e}")
+            behind = False
+        time.sleep(0.5 if behind else SPAM_REFRESH_INTERVAL)
+
+# --- Event-Suche ---
+# Pubkey and event id lookups are turned into BLOB comparisons so they can use
+# the relay's author/event_hash indexes instead of hex-encoding every row.
+
+BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+HEX_RE = re.compile(r'[0-9a-fA-F]+')
+MIN_HEX_PREFIX = 8
+
+def bech32_polymod(values):
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            if (top >> i) & 1:
+                chk ^= generator[i]
+    return chk
+
+def bech32_decode(value):
+    """Returns (hrp, payload bytes) for a valid bech32 string, otherwise None."""
+    value = value.lower()
+    pos = value.rfind('1')
+    if pos < 1 or pos + 7 > len(value) or any(c not in BECH32_CHARSET for c in value[pos + 1:]):
+        return None
+    hrp, data = value[:pos], [BECH32_CHARSET.index(c) for c in value[pos + 1:]]
+    if bech32_polymod([ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp] + data) != 1:
+        return None
+    acc, bits, payload = 0, 0, bytearray()
+    for v in data[:-6]:
+        acc = (acc << 5) | v
+        bits += 5
+        if bits >= 8:
+            bits -= 8
+            payload.append((acc >> bits) & 0xff)
+    return hrp, bytes(payload)
+
+def nip19_decode(value):
+    """Decodes npub/nprofile/note/nevent into ('pubkey' | 'event', 32 bytes), otherwise None."""
+    decoded = bech32_decode(value)
+    if not decoded:
+        return None
+    hrp, payload = decoded
+    if hrp in ('nprofile', 'nevent'):
+        # TLV encoded; type 0 carries the pubkey / event id
+        pos = 0
+        while pos + 2 <= len(payload):
+            tlv_type, length = payload[pos], payload[pos + 1]
+            if tlv_type == 0 and length == 32:
+                payload = payload[pos + 2:pos + 34]
+                break
+            pos += 2 + length
+        else:
+            return None
+    if len(payload) != 32:
+        return None
+    return {'npub': 'pubkey', 'nprofile': 'pubkey', 'note': 'event', 'nevent': 'event'}.get(hrp), payload
+
+def hex_prefix_range(prefix):
+    """BLOB bounds [lo, hi) covering every 32-byte value that starts with the hex prefix."""
+    pad = '0' * (len(prefix) % 2)
+    lo = bytes.fromhex(prefix + pad)
+    upper = int(prefix, 16) + 1
+    if upper >> (4 * len(prefix)):
+        # ff... prefix: any 33-byte 0xff blob sorts after every 32-byte key
+        return lo, b'\xff' * 33
+    return lo, bytes.fromhex(format(upper, f'0{len(prefix)}x') + pad)
+
+def plan_event_search(query):
+    """Classifies a search string. Returns ([(where_clause, params), ...], plan_name); the branches are OR-ed."""
+    query = query.strip()
+    decoded = nip19_decode(query)
+    if decoded and decoded[0]:
+        field, value = decoded
+        return [('author = ?' if field == 'pubkey' else 'event_hash = ?', (value,))], f'{field}-bech32'
+    if HEX_RE.fullmatch(query):
+        if len(query) == 64:
+            value = bytes.fromhex(query)
+            return [('author = ?', (value,)), ('event_hash = ?', (value,))], 'hex-exact'
+        if len(query) >= MIN_HEX_PREFIX:
+            lo, hi = hex_prefix_range(query.lower())
+            prefix = [('author >= ? AND author < ?', (lo, hi)), ('event_hash >= ? AND event_hash < ?', (lo, hi))]
+            # Only digits is as likely a number in a note (an amount, a phone number) as the start of an id
+            if query.isdigit():
+                return prefix + [content_search_branch(query)], 'hex-prefix-or-content'
+            return prefix, 'hex-prefix'
+    return [content_search_branch(query)], 'content-scan'
+
+def content_search_branch(query):
+    pattern = '%' + re.sub(r'([\\%_])', r'\\\1', query) + '%'
+    return ("content LIKE ? ESCAPE '\\'", (pattern,))
+
+EVENT_SELECT = 'SELECT id, lower(hex(author)) as pubkey, kind, content, created_at, lower(hex(event_hash)) as event_id FROM event'
+
+MAX_PAGE_SIZE = 500
+
+def parse_pubkey(value):
+    """Accepts a hex pubkey or npub/nprofile and returns the 32 raw bytes. Raises ValueError otherwise."""
+    value = value.strip()
+    decoded = nip19_decode(value)
+    if decoded and decoded[0] == 'pubkey':
+        return decoded[1]
+    if len(value) == 64 and HEX_RE.fullmatch(value):
+        return bytes.fromhex(value)
+    raise ValueError(f"Invalid pubkey: {value[:70]}")
+
+def parse_cursor(value):
+    """Cursors are '<created_at>:<id>' of the last row a client has seen."""
+    created_at, _, event_id = value.partition(':')
+    return int(created_at), int(event_id)
+
+def format_cursor(event):
+    return f"{event['created_at']}:{event['id']}"
+
+def parse_event_filters(args):
+    """Turns the kind/author/since/until query parameters into (where_clause, params) pairs. Raises ValueError."""
+    filters = []
+    if args.get('kind'):
+        kinds = [int(k) for k in args['kind'].split(',')]
+        filters.append((f"kind IN ({','.join('?' * len(kinds))})", tuple(kinds)))
+    if args.get('author'):
+        filters.append(('author = ?', (parse_pubkey(args['author']),)))
+    if args.get('since'):
+        filters.append(('created_at >= ?', (int(args['since']),)))
+    if args.get('until'):
+        filters.append(('created_at <= ?', (int(args['until']),)))
+    return filters
+
+def fetch_events(conn, branches, limit, filters=(), before=None, after=None):
+    """Runs every branch as its own ordered, limited query (one index each) and merges them newest first.
+
+    before/after are (created_at, id) keyset cursors, so every page is an index seek
+    plus at most `limit` rows per branch, however deep the client pages.
+    """
+    clauses, params = [], []
+    for where_clause, filter_params in filters:
+        clauses.append(where_clause)
+        params += filter_params
+    # Written as a range on created_at plus a tie-breaker so the index bound stays usable
+    if before:
+        clauses.append('created_at <= ? AND (created_at < ? OR id < ?)')
+        params += [before[0], before[0], before[1]]
+    if after:
+        clauses.append('created_at >= ? AND (created_at > ? OR id > ?)')
+        params += [after[0], after[0], after[1]]
+    order = 'ASC' if after and not before else 'DESC'
+
+    events = {}
+    for where_clause, branch_params in branches:
+        where = ' AND '.join([f'({where_clause})'] + clauses)
+        for row in conn.execute(f'{EVENT_SELECT} WHERE {where} ORDER BY created_at {order}, id {order} LIMIT ?', (*branch_params, *params, limit)):
+            events[row['id']] = dict(row)
+    page = sorted(events.values(), key=lambda e: (e['created_at'], e['id']), reverse=(order == 'DESC'))[:limit]
+    return page if order == 'DESC' else page[::-1]
+
+# --- Live-Stream ---
+# Producers publish events into one bounded ring buffer; every connected browser
+# reads from it over Server-Sent Events with its own filters. Late joiners
+# backfill from memory instead of asking the relay to replay history.
+
+STREAM_BUFFER_SIZE = 5000
+STREAM_BACKFILL_SECONDS = 24 * 3600
+STREAM_HEARTBEAT_SECONDS = 15
+stream_condition = threading.Condition()
+stream_buffer = collections.deque(maxlen=STREAM_BUFFER_SIZE)
+stream_buffered_ids = set()
+stream_state = {"seq": 0, "clients": 0, "connected": False, "source": None}
+stream_start_lock = threading.Lock()
+
+def stream_mode():
+    if LIVE_STREAM_MODE == 'relay' and websocket is None:
+        return 'browser'
+    return LIVE_STREAM_MODE
+
+def stream_publish(events):
+    """Appends events (oldest first) to the ring buffer, skipping ones already buffered, and wakes all clients."""
+    with stream_condition:
+        for event in events:
+            if event.get('id') in stream_buffered_ids:
+                continue
+            if len(stream_buffer) == stream_buffer.maxlen:
+                stream_buffered_ids.discard(stream_buffer[0][1].get('id'))
+            stream_state["seq"] += 1
+            stream_buffer.append((stream_state["seq"], event))
+            stream_buffered_ids.add(event.get('id'))
+        stream_condition.notify_all()
+
+def stream_filter(kinds=None, author=None):
+    def match(event):
+        return (not kinds or event.get('kind') in kinds) and (not author or event.get('pubkey') == author)
+    return match
+
+def stream_client(since_ts, match):
+    """SSE generator: backfill from the buffer, then follow new events until the client disconnects."""
+    with stream_condition:
+        stream_state["clients"] += 1
+        backlog = [event for _, event in stream_buffer if event.get('created_at', 0) >= since_ts]
+        last_seq = stream_state["seq"]
     try:
-        count_query = f"SELECT COUNT(*) FROM event WHERE {' AND '.join(where_clauses)}"
-        deleted_count = conn.execute(count_query, tuple(params)).fetchone()[0]
-        delete_query = f"DELETE FROM event WHERE {' AND '.join(where_clauses)}"
-        conn.execute(delete_query, tuple(params))
-        conn.commit()
-        return jsonify({"status": "success", "deleted_count": deleted_count})
-    except sqlite3.Error as e:
-        return jsonify({"error": str(e)}), 500
+        for event in backlog:
+            if match(event):
+                yield f"data: {json.dumps(event)}\n\n"
+        while True:
+            with stream_condition:
+                stream_condition.wait_for(lambda: stream_state["seq"] > last_seq, timeout=STREAM_HEARTBEAT_SECONDS)
+                fresh = []
+                for seq, event in reversed(stream_buffer):
+                    if seq <= last_seq:
+                        break
+                    fresh.append(event)
+                last_seq = stream_state["seq"]
+            if not fresh:
+                yield ": ping\n\n"
+            for event in reversed(fresh):
+                if match(event):
+                    yield f"data: {json.dumps(event)}\n\n"
     finally:
-        if conn: conn.close()
+        with stream_condition:
+            stream_state["clients"] -= 1
 
-@app.route('/api/events')
-def get_events():
-    query = request.args.get('q', '')
-    limit = int(request.args.get('limit', 100))
-    conn = get_db_connection()
+def relay_tap_worker():
+    """Holds one REQ subscription to the relay and feeds the ring buffer, reconnecting with backoff."""
+    since, backoff = int(time.time()) - STREAM_BACKFILL_SECONDS, 1
+    while True:
+        ws = None
+        try:
+            ws = websocket.create_connection(RELAY_WEBSOCKET_URL, timeout=60)
+            ws.send(json.dumps(["REQ", "admin-panel-tap", {"since": since, "limit": STREAM_BUFFER_SIZE}]))
+            stream_state["connected"], backoff = True, 1
+            backfill, live = [], False
+            while True:
+                try:
+                    message = json.loads(ws.recv())
+                except websocket.WebSocketTimeoutException:
+                    ws.ping()
+                    continue
+                if message[0] == 'EVENT' and len(message) >= 3 and isinstance(message[2], dict):
+                    event = message[2]
+                    # Resume point for reconnects; future-dated events must not move it past now
+                    since = max(since, min(event.get('created_at', 0), int(time.time())))
+                    if live:
+                        stream_publish([event])
+                    else:
+                        backfill.append(event)
+                elif message[0] == 'EOSE':
+                    # Stored events arrive newest first
+                    stream_publish(sorted(backfill, key=lambda e: e.get('created_at', 0)))
+                    backfill, live = [], True
+                elif message[0] == 'CLOSED':
+                    raise ConnectionError(f"subscription closed by relay: {message[2:]}")
+        except Exception as e:
+            print(f"Relay tap disconnected: {e}")
+        finally:
+            stream_state["connected"] = False
+            if ws:
+                ws.close()
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+        since -= 60
+
+STREAM_TAIL_BATCH = 1000
+STREAM_TAIL_MIN_INTERVAL = 0.25
+STREAM_TAIL_MAX_INTERVAL = 5.0
+
+def row_to_event(row):
+    """The relay keeps the serialized event in `content`; rebuild a minimal one from the columns if it does not parse."""
     try:
-        select_clause = 'SELECT id, lower(hex(author)) as pubkey, kind, content, created_at, lower(hex(event_hash)) as event_id FROM event'
-        if query:
-            search_query_hex = f'%{query}%'
-            cursor = conn.execute(
-                f'{select_clause} WHERE pubkey LIKE ? OR event_id LIKE ? OR content LIKE ? ORDER BY created_at DESC LIMIT ?',
-                (search_query_hex, search_query_hex, query, limit)
-            )
+        event = json.loads(row['content'])
+    except ValueError:
+        event = None
+    if not isinstance(event, dict):
+        event = {"id": row['event_hash'].hex(), "pubkey": row['author'].hex(), "created_at": row['created_at'],
+                 "kind": row['kind'], "tags": [], "content": row['content']}
+    return event
+
+def db_tail_worker():
+    """Follows the event table by rowid: one range query per tick, however many viewers are connected.
+    Polls quickly while events arrive and backs off while the relay is idle."""
+    interval, last_id = STREAM_TAIL_MIN_INTERVAL, None
+    while True:
+        conn = None
+        try:
+            conn = get_db_connection()
+            if last_id is None:
+                # Backfill the buffer with the newest stored events
+                rows = conn.execute('SELECT id, event_hash, author, kind, created_at, content FROM event ORDER BY id DESC LIMIT ?', (STREAM_BUFFER_SIZE,)).fetchall()[::-1]
+                last_id = rows[-1]['id'] if rows else 0
+                stream_publish([row_to_event(row) for row in rows])
+                stream_state["connected"] = True
+            rows = conn.execute('SELECT id, event_hash, author, kind, created_at, content FROM event WHERE id > ? ORDER BY id LIMIT ?', (last_id, STREAM_TAIL_BATCH)).fetchall()
+            if rows:
+                last_id = rows[-1]['id']
+                stream_publish([row_to_event(row) for row in rows])
+                interval = 0 if len(rows) == STREAM_TAIL_BATCH else STREAM_TAIL_MIN_INTERVAL
+            else:
+                interval = min(max(interval, STREAM_TAIL_MIN_INTERVAL) * 1.5, STREAM_TAIL_MAX_INTERVAL)
+        except Exception as e:
+            print(f"Database tail failed: {e}")
+            stream_state["connected"] = False
+            interval = STREAM_TAIL_MAX_INTERVAL
+        finally:
+            if conn: conn.close()
+        time.sleep(interval)
+
+def ensure_stream_source():
+    with stream_start_lock:
+        if stream_state["source"] is not None:
+            return
+        if stream_mode() == 'relay':
+            threading.Thread(target=relay_tap_worker, name='relay-tap', daemon=True).start()
+        elif stream_mode() == 'database':
+            threading.Thread(target=db_tail_worker, name='db-tail', daemon=True).start()
         else:
-            cursor = conn.execute(f'{select_clause} ORDER BY created_at DESC LIMIT ?', (limit,))
-        events = [dict(row) for row in cursor.fetchall()]
-    except sqlite3.Error as e:
-        return jsonify({"error": str(e)}), 500
+            return
+        stream_state["source"] = stream_mode()
+
+# --- Export ---
+# Streams events as NDJSON, one NIP-01 event per line, for backups and for handing
+# samples to other operators. Rows are read in id order, EXPORT_CHUNK_SIZE at a
+# time, each chunk on a freshly acquired read connection: memory use does not grow
+# with the export, and a slow download neither holds a pooled connection nor keeps
+# a read transaction open that would stop the relay's WAL from being checkpointed.
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_SELECT = 'SELECT id, event_hash, author, created_at, kind, content FROM event'
+
+def export_event_line(conn, row):
+    """The relay stores the serialized event (tags and signature included) in `content`; it
+    is passed through as is. Rows that don't hold one get their tags back from the tag table."""
+    content = row['content']
+    # Compact JSON never contains a raw newline, so the line stays one record
+    if content[:1] == '{' and '\n' not in content:
+        return content
+    event = row_to_event(row)
+    if not event['tags']:
+        event['tags'] = [[name, value] for name, value in conn.execute('SELECT name, value FROM tag WHERE event_id = ? ORDER BY id', (row['id'],))]
+    return json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+
+def export_events(filters, limit=None):
+    """Yields the matching events as NDJSON, one encoded chunk of lines at a time."""
+    where = ' AND '.join(['id > ?'] + [clause for clause, _ in filters])
+    params = [param for _, filter_params in filters for param in filter_params]
+    last_id, sent = 0, 0
+    while limit is None or sent < limit:
+        chunk = EXPORT_CHUNK_SIZE if limit is None else min(EXPORT_CHUNK_SIZE, limit - sent)
+        conn = get_db_connection()
+        try:
+            rows = conn.execute(f'{EXPORT_SELECT} WHERE {where} ORDER BY id LIMIT ?', (last_id, *params, chunk)).fetchall()
+            lines = [export_event_line(conn, row) for row in rows]
+        finally:
+            conn.close()
+        if not rows:
+            break
+        last_id, sent = rows[-1]['id'], sent + len(rows)
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+def gzip_stream(chunks, level=6):
+    """Compresses a stream of byte chunks into a single gzip member on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# --- Sperrliste ---
+# The ban list lives in memory. config.toml (what the relay enforces) and the
+# banned_pubkeys table (ban dates for the UI) are written behind it: changes are
+# coalesced and flushed together at most once per BAN_FLUSH_INTERVAL, the TOML
+# file atomically via a temp file and rename. config.toml is the source of truth
+# when the two disagree at startup.
+
+BAN_FLUSH_INTERVAL = 2.0
+# Responses that show the ban list or depend on it
+BAN_CACHE_GROUPS = ('banned', 'stats', 'suspects', 'config')
+
+def read_config_blacklist():
+    with open(CONFIG_PATH, 'r') as f:
+        config_data = toml.load(f)
+    return config_data, list(config_data.get('verification', {}).get('pubkey_blacklist', []))
+
+def write_config_atomic(config_data):
+    write_config_text(toml.dumps(config_data))
+
+def write_config_text(content):
+    """Replaces config.toml in one step, so the relay never reads a half-written file."""
+    directory = os.path.dirname(os.path.abspath(CONFIG_PATH))
+    tmp_path = os.path.join(directory, f".{os.path.basename(CONFIG_PATH)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(CONFIG_PATH):
+            os.chmod(tmp_path, os.stat(CONFIG_PATH).st_mode & 0o7777)
+        os.replace(tmp_path, CONFIG_PATH)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+class BanRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Serializes flushes; held while config.toml and the table are written
+        # (reentrant, so replace_config can hold it across flush and load)
+        self.flush_lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.banned = {}
+        self.pending_add = set()
+        self.pending_remove = set()
+        self.loaded = False
+        self.flusher = None
+        self.metrics = {"flushes": 0, "last_flush": None, "last_error": None}
+
+    def load(self):
+        """Reads config.toml and reconciles the banned_pubkeys table with it. Bans and unbans
+        not flushed yet stay pending and are applied on top of the file."""
+        with self.flush_lock:
+            _, blacklist = read_config_blacklist()
+            conn = get_db_connection_rw()
+            try:
+                known = {row['pubkey']: row['banned_at'] for row in conn.execute('SELECT pubkey, banned_at FROM banned_pubkeys')}
+                wanted = {pk.lower() for pk in blacklist if len(pk) == 64 and HEX_RE.fullmatch(pk)}
+                missing = wanted - known.keys()
+                stale = known.keys() - wanted
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany('INSERT OR IGNORE INTO banned_pubkeys (pubkey) VALUES (?)', [(pk,) for pk in missing])
+                conn.executemany('DELETE FROM banned_pubkeys WHERE pubkey = ?', [(pk,) for pk in stale])
+                conn.commit()
+                now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                with self.lock:
+                    banned = {pk: known.get(pk) or now for pk in wanted}
+                    for pk in self.pending_add:
+                        banned[pk] = self.banned.get(pk, now)
+                    for pk in self.pending_remove:
+                        banned.pop(pk, None)
+                    self.banned = banned
+                    self.loaded = True
+            finally:
+                conn.close()
+        invalidate_cache(*BAN_CACHE_GROUPS)
+        invalid = [pk for pk in blacklist if not (len(pk) == 64 and HEX_RE.fullmatch(pk))]
+        return {"banned": len(wanted), "added_to_table": len(missing), "removed_from_table": len(stale), "invalid_in_config": len(invalid)}
+
+    def replace_config(self, content):
+        """Saves an edited config.toml: pending changes are flushed first, then the file becomes the
+        ban list. Bans arriving meanwhile stay pending (see load) and reach the new file with the next flush."""
+        with self.flush_lock:
+            if self.loaded:
+                self.flush()
+            write_config_text(content)
+            return self.load()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def ensure_flusher(self):
+        with self.lock:
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(target=self.flush_worker, name='ban-flush', daemon=True)
+                self.flusher.start()
+
+    def __contains__(self, pubkey):
+        self.ensure_loaded()
+        return pubkey in self.banned
+
+    def __len__(self):
+        self.ensure_loaded()
+        return len(self.banned)
+
+    def listing(self):
+        """Pubkeys, most recently banned first."""
+        with self.lock:
+            return [pk for pk, _ in sorted(self.banned.items(), key=lambda item: item[1], reverse=True)]
+
+    def ban(self, pubkeys):
+        """Bans hex pubkeys (already validated). Returns the ones that were not banned before."""
+        self.ensure_loaded()
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        added = []
+        with self.lock:
+            for pubkey in pubkeys:
+                if pubkey not in self.banned:
+                    self.banned[pubkey] = now
+                    self.pending_add.add(pubkey)
+                    self.pending_remove.discard(pubkey)
+                    added.append(pubkey)
+        if added:
+            self.schedule_flush()
+        return added
+
+    def unban(self, pubkeys):
+        self.ensure_loaded()
+        removed = []
+        with self.lock:
+            for pubkey in pubkeys:
+                if self.banned.pop(pubkey, None) is not None:
+                    self.pending_remove.add(pubkey)
+                    self.pending_add.discard(pubkey)
+                    removed.append(pubkey)
+        if removed:
+            self.schedule_flush()
+        return removed
+
+    def schedule_flush(self):
+        # The pending change is visible in the listing right away; config.toml follows with the flush
+        invalidate_cache(*BAN_CACHE_GROUPS)
+        self.ensure_flusher()
+        self.wakeup.set()
+
+    def flush(self):
+        """Writes pending changes: config.toml first, then the table, so a crash in between is repaired by load()."""
+        with self.flush_lock:
+            with self.lock:
+                if not (self.pending_add or self.pending_remove):
+                    return 0
+                added, removed = self.pending_add, self.pending_remove
+                self.pending_add, self.pending_remove = set(), set()
+            try:
+                config_data, current = read_config_blacklist()
+                # Entries we don't know as valid pubkeys (e.g. typed into the editor) are kept as they are
+                keep = [pk for pk in current if not (len(pk) == 64 and HEX_RE.fullmatch(pk))]
+                in_file = {pk.lower() for pk in current if len(pk) == 64 and HEX_RE.fullmatch(pk)}
+                # The file as it is now plus our changes: keys added or removed by hand since the
+                # last load() are kept that way, unless a pending change of ours says otherwise
+                wanted = (in_file | added) - removed
+                now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                with self.lock:
+                    adopted = wanted - self.banned.keys() - self.pending_remove
+                    dropped = {pk for pk in self.banned if pk not in wanted and pk not in self.pending_add}
+                    for pk in adopted:
+                        self.banned[pk] = now
+                    for pk in dropped:
+                        del self.banned[pk]
+                    banned_at = {pk: self.banned[pk] for pk in added | adopted if pk in self.banned}
+                verification = config_data.setdefault('verification', {})
+                if wanted or keep:
+                    verification['pubkey_blacklist'] = keep + sorted(wanted)
+                else:
+                    verification.pop('pubkey_blacklist', None)
+                write_config_atomic(config_data)
+
+                conn = get_db_connection_rw()
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany('INSERT OR IGNORE INTO banned_pubkeys (pubkey, banned_at) VALUES (?, ?)', banned_at.items())
+                    conn.executemany('DELETE FROM banned_pubkeys WHERE pubkey = ?', [(pk,) for pk in removed | dropped])
+                    conn.commit()
+                finally:
+                    conn.close()
+                if adopted or dropped:
+                    invalidate_cache(*BAN_CACHE_GROUPS)
+            except Exception as e:
+                # Put the changes back so the next flush retries them
+                with self.lock:
+                    self.pending_add |= {pk for pk in added if pk in self.banned}
+                    self.pending_remove |= {pk for pk in removed if pk not in self.banned}
+                    self.metrics["last_error"] = str(e)
+                raise
+            with self.lock:
+                self.metrics["flushes"] += 1
+                self.metrics["last_flush"] = int(time.time())
+                self.metrics["last_error"] = None
+            return len(added) + len(removed)
+
+    def flush_worker(self):
+        while True:
+            self.wakeup.wait()
+            # Give a burst of bans time to arrive so it ends up in one write
+            time.sleep(BAN_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ban list flush failed: {e}")
+                self.wakeup.set()
+
+    def status(self):
+        with self.lock:
+            return {"banned": len(self.banned), "pending": len(self.pending_add) + len(self.pending_remove), **self.metrics}
+
+ban_registry = BanRegistry()
+
+BULK_BAN_SYNC_LIMIT = 5000
+BULK_SEARCH_MAX_AUTHORS = 10000
+BULK_MAX_REPORTED = 1000
+
+def split_pubkey_list(text):
+    """Splits an uploaded list on newlines, commas and whitespace; '#' starts a comment."""
+    return [entry for line in text.splitlines() for entry in re.split(r'[\s,]+', line.split('#', 1)[0]) if entry]
+
+def apply_bulk_bans(entries, action, flush=True):
+    """Bans or unbans a list of hex/npub strings in one registry update and one flush.
+    Returns per-entry results and a summary of their statuses."""
+    results, seen, pubkeys = [], set(), []
+    for entry in entries:
+        try:
+            pubkey = parse_pubkey(str(entry)).hex()
+        except ValueError:
+            results.append({"input": entry, "status": "invalid"})
+            continue
+        if pubkey in seen:
+            results.append({"input": entry, "pubkey": pubkey, "status": "duplicate"})
+            continue
+        seen.add(pubkey)
+        pubkeys.append(pubkey)
+        results.append({"input": entry, "pubkey": pubkey})
+    changed = set(ban_registry.ban(pubkeys) if action == 'ban' else ban_registry.unban(pubkeys))
+    labels = ('banned', 'already_banned') if action == 'ban' else ('unbanned', 'not_banned')
+    for result in results:
+        if 'status' not in result:
+            result['status'] = labels[0] if result['pubkey'] in changed else labels[1]
+    if flush and changed:
+        ban_registry.flush()
+    return results, dict(collections.Counter(result['status'] for result in results))
+
+def valid_pubkeys(entries):
+    """The distinct hex pubkeys in a list of hex/npub strings, invalid entries dropped."""
+    pubkeys = {}
+    for entry in entries:
+        try:
+            pubkeys[parse_pubkey(str(entry)).hex()] = True
+        except ValueError:
+            pass
+    return list(pubkeys)
+
+def search_authors(args, limit=BULK_SEARCH_MAX_AUTHORS):
+    """Distinct authors of the events an /api/events search (q plus filters) would return."""
+    query = args.get('q', '')
+    filters = parse_event_filters(args)
+    # An empty search would match every recent author; a ban by search must name what it bans
+    if not query.strip() and not filters:
+        raise ValueError("search needs a query or filter")
+    conn = get_db_connection()
+    admin = None
+    try:
+        branches, plan = plan_event_search(query)
+        if plan == 'content-scan' and fts_ready and not filters:
+            admin = get_admin_db_connection()
+            return list(dict.fromkeys(e['pubkey'] for e in fts_search(conn, admin, query, limit)))[:limit]
+        authors = {}
+        for where_clause, branch_params in branches:
+            clauses = [f'({where_clause})'] + [clause for clause, _ in filters]
+            params = [*branch_params, *(param for _, filter_params in filters for param in filter_params)]
+            for row in conn.execute(f"SELECT DISTINCT lower(hex(author)) FROM event WHERE {' AND '.join(clauses)} LIMIT ?", (*params, limit)):
+                authors[row[0]] = True
+        return list(authors)[:limit]
+    finally:
+        conn.close()
+        if admin: admin.close()
+
+
+@atexit.register
+def flush_bans_on_exit():
+    if ban_registry.loaded:
+        try:
+            ban_registry.flush()
+        except Exception as e:
+            print(f"Ban list flush failed: {e}")
+
+# --- Relay-Hook (Event-Zulassung) ---
+# nostr-rs-relay can ask an external gRPC service whether to accept each event
+# ([grpc] event_admission_server in its config.toml). The panel answers from the
+# in-memory ban list, so bans and unbans take effect on the next event instead of
+# after a relay restart. The two nauthz messages involved are tiny, so they are
+# encoded by hand rather than pulling in generated protobuf code.
+
+ADMISSION_SERVICE = 'nauthz.Authorization'
+ADMISSION_WORKERS = 8
+ADMISSION_PERMIT, ADMISSION_DENY = 1, 2
+admission_state = {"server": None, "checked": 0, "denied": 0, "errors": 0}
+admission_lock = threading.Lock()
+
+def proto_read_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+def proto_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def proto_fields(data):
+    """Yields (field_number, value) for every field of a protobuf message."""
+    pos = 0
+    while pos < len(data):
+        key, pos = proto_read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = proto_read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = proto_read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield field, value
+
+def proto_field(field, value):
+    if isinstance(value, int):
+        return proto_varint(field << 3) + proto_varint(value)
+    return proto_varint(field << 3 | 2) + proto_varint(len(value)) + value
+
+def decode_admission_request(data):
+    """EventRequest{1: Event{1: id, 2: pubkey, 4: kind}, 2: ip_addr}"""
+    request = {"id": None, "pubkey": None, "kind": None, "ip_addr": None}
+    for field, value in proto_fields(data):
+        if field == 1:
+            for event_field, event_value in proto_fields(value):
+                if event_field == 1:
+                    request['id'] = event_value.hex()
+                elif event_field == 2:
+                    request['pubkey'] = event_value.hex()
+                elif event_field == 4:
+                    request['kind'] = event_value
+        elif field == 2:
+            request['ip_addr'] = value.decode('utf-8', errors='replace')
+    return request
+
+def encode_admission_request(request):
+    event = proto_field(1, bytes.fromhex(request['id'])) + proto_field(2, bytes.fromhex(request['pubkey'])) + proto_field(4, request['kind'])
+    return proto_field(1, event)
+
+def encode_admission_reply(reply):
+    """EventReply{1: decision, 2: message}"""
+    decision, message = reply
+    return proto_field(1, decision) + (proto_field(2, message.encode()) if message else b'')
+
+def decode_admission_reply(data):
+    fields = dict(proto_fields(data))
+    return fields.get(1, 0), fields[2].decode() if 2 in fields else None
+
+def admission_decide(request, context=None, registry=None):
+    try:
+        banned = request['pubkey'] in (ban_registry if registry is None else registry)
+    except Exception as e:
+        # Fail open: a panel that cannot read its ban list must not stop the relay from accepting events
+        print(f"Admission check failed: {e}")
+        with admission_lock:
+            admission_state["errors"] += 1
+        return ADMISSION_PERMIT, None
+    with admission_lock:
+        admission_state["checked"] += 1
+        admission_state["denied"] += banned
+    if banned:
+        return ADMISSION_DENY, "blocked: pubkey is banned on this relay"
+    return ADMISSION_PERMIT, None
+
+def admission_enabled():
+    return bool(ADMISSION_GRPC_ADDRESS) and grpc is not None
+
+def serve_admission(address, registry=None):
+    """Starts an admission server answering from `registry` (default: the ban list). Returns (server, port);
+    port 0 in the address picks a free one."""
+    decide = admission_decide if registry is None else functools.partial(admission_decide, registry=registry)
+    server = grpc.server(ThreadPoolExecutor(max_workers=ADMISSION_WORKERS))
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(ADMISSION_SERVICE, {
+        'EventAdmit': grpc.unary_unary_rpc_method_handler(decide, request_deserializer=decode_admission_request,
+                                                          response_serializer=encode_admission_reply),
+    }),))
+    port = server.add_insecure_port(address)
+    server.start()
+    return server, port
+
+def start_admission_server():
+    if not admission_enabled() or admission_state["server"] is not None:
+        return
+    admission_state["server"], _ = serve_admission(ADMISSION_GRPC_ADDRESS)
+
+def admission_check(pubkey, kind=1, address=None):
+    """Plays the relay's side of the hook: asks the admission server about an event by `pubkey`.
+    Returns (decision, message, seconds)."""
+    channel = grpc.insecure_channel(address or ADMISSION_GRPC_ADDRESS)
+    try:
+        event_admit = channel.unary_unary(f'/{ADMISSION_SERVICE}/EventAdmit', request_serializer=encode_admission_request,
+                                          response_deserializer=decode_admission_reply)
+        started = time.perf_counter()
+        decision, message = event_admit({"id": os.urandom(32).hex(), "pubkey": pubkey, "kind": kind}, timeout=5)
+        return decision, message, time.perf_counter() - started
+    finally:
+        channel.close()
+
+class StandInBanList:
+    """Ban list for admission_selftest: a set that records every lookup and can be made unreadable."""
+    def __init__(self):
+        self.banned, self.lookups, self.unreadable = set(), [], False
+
+    def __contains__(self, pubkey):
+        self.lookups.append(pubkey)
+        if self.unreadable:
+            raise OSError("ban list unreadable")
+        return pubkey in self.banned
+
+def admission_selftest():
+    """Runs an admission server in-process on a free local port and drives it the way the relay does,
+    through the hand-encoded messages in both directions: ban -> DENY, unban -> PERMIT, unreadable
+    ban list -> PERMIT (fail open). Uses a stand-in ban list, so config.toml is not touched.
+    Returns [(step, passed, detail), ...]."""
+    bans = StandInBanList()
+    server, port = serve_admission('127.0.0.1:0', bans)
+    pubkey, steps = os.urandom(32).hex(), []
+
+    def step(name, expected):
+        errors = admission_state["errors"]
+        try:
+            decision, message, seconds = admission_check(pubkey, kind=7, address=f'127.0.0.1:{port}')
+        except grpc.RpcError as e:
+            # What the relay would see if the panel raised instead of failing open
+            steps.append((name, False, f"RPC failed: {e.code()} {e.details()}"))
+            return
+        # The server must have decoded the pubkey the client encoded, and a DENY carries a reason
+        seen = bans.lookups[-1] if bans.lookups else None
+        failed_open = admission_state["errors"] == errors + 1
+        passed = decision == expected and seen == pubkey and (message is not None) == (expected == ADMISSION_DENY) and failed_open == bans.unreadable
+        steps.append((name, passed, f"decision {decision}, message {message!r}, pubkey {'decoded' if seen == pubkey else f'mismatch: {seen}'}, "
+                                    f"{seconds * 1000:.1f} ms"))
+
+    try:
+        step("unknown pubkey -> PERMIT", ADMISSION_PERMIT)
+        bans.banned.add(pubkey)
+        step("banned -> DENY", ADMISSION_DENY)
+        bans.banned.discard(pubkey)
+        step("unbanned -> PERMIT", ADMISSION_PERMIT)
+        bans.unreadable = True
+        step("ban list unreadable -> PERMIT (fail open)", ADMISSION_PERMIT)
+    finally:
+        server.stop(None)
+    return steps
+
+# --- Hintergrund-Jobs ---
+# Long-running work (batch deletes, ...) is queued in the admin DB and executed
+# by a single worker thread in small, separately committed chunks. A job's
+# position is persisted after every chunk, so an interrupted job resumes where
+# it stopped when the panel starts again.
+
+JOB_CHUNK_SIZE = 500
+JOB_SCAN_WINDOW = 50000
+JOB_CHUNK_PAUSE = 0.05
+JOB_HANDLERS = {}
+job_wakeup = threading.Event()
+
+def create_job(job_type, params, start_position=0, end_position=0):
+    admin = get_admin_db_connection()
+    try:
+        job_id = admin.execute('''INSERT INTO jobs (type, params, position, start_position, end_position, created_at)
+                                 VALUES (?, ?, ?, ?, ?, ?)''', (job_type, json.dumps(params), start_position, start_position, end_position, int(time.time()))).lastrowid
+        admin.commit()
+    finally:
+        admin.close()
+    job_wakeup.set()
+    return job_id
+
+def job_to_dict(row):
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    # Bulk jobs can carry tens of thousands of keys; report how many instead
+    if isinstance(job['params'].get('pubkeys'), list):
+        job['params']['pubkeys'] = len(job['params']['pubkeys'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    span = job['end_position'] - job['start_position']
+    done = job['position'] - job['start_position']
+    job['percent'] = round(100 * done / span, 1) if span > 0 else (100.0 if job['status'] == 'done' else 0.0)
+    job['eta_seconds'] = None
+    if job['status'] == 'running' and job['started_at'] and 0 < done < span:
+        elapsed = (job['updated_at'] or job['started_at']) - job['started_at']
+        job['eta_seconds'] = int(elapsed * (span - done) / done)
+    return job
+
+def job_checkpoint(admin, job_id, position, progress, partial_result=None):
+    """Records how far a job got (optionally with its result so far). Returns False once the job has been cancelled."""
+    admin.execute('UPDATE jobs SET position = ?, progress = ?, result = COALESCE(?, result), updated_at = ? WHERE id = ?',
+                  (position, progress, json.dumps(partial_result) if partial_result is not None else None, int(time.time()), job_id))
+    admin.commit()
+    return admin.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()[0] == 'running'
+
+def delete_event_rows(conn, admin, ids, totals=None):
+    """Deletes events by id together with their tag rows, keeping the aggregates and
+    the full-text index in step. Commits both databases.
+
+    If a `totals` dict is passed, the removed tag rows and payload bytes are added to it."""
+    placeholders = ','.join('?' * len(ids))
+    where_clause = f'id IN ({placeholders})'
+    with stats_lock:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if totals is not None:
+                event_bytes = conn.execute(f'SELECT COALESCE(SUM(length(content) + length(event_hash) + length(author)), 0) FROM event WHERE {where_clause}', ids).fetchone()[0]
+                tag_bytes = conn.execute(f'SELECT COALESCE(SUM(length(name) + length(value)), 0) FROM tag WHERE event_id IN ({placeholders})', ids).fetchone()[0]
+            stats_forget(conn, admin, where_clause, ids)
+            fts_forget(conn, admin, where_clause, ids)
+            # The relay's ON DELETE CASCADE only fires with foreign_keys enabled, so remove tags explicitly
+            tags = conn.execute(f'DELETE FROM tag WHERE event_id IN ({placeholders})', ids).rowcount
+            deleted = conn.execute(f'DELETE FROM event WHERE {where_clause}', ids).rowcount
+            if totals is not None:
+                totals['tag_rows'] = totals.get('tag_rows', 0) + tags
+                totals['payload_bytes'] = totals.get('payload_bytes', 0) + event_bytes + tag_bytes
+            conn.commit()
+            admin.commit()
+        except Exception:
+            conn.rollback()
+            admin.rollback()
+            raise
+    invalidate_cache('stats')
+    return deleted
+
+def delete_events_chunked(job_id, where_clause, params):
+    """Walks the job's rowid range and deletes matching events in short transactions.
+    Returns the number of deleted events, or None if the job was cancelled."""
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        job = admin.execute('SELECT position, end_position, progress FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        position, end_position, deleted = job['position'], job['end_position'], job['progress']
+        while position < end_position:
+            window_end = min(position + JOB_SCAN_WINDOW, end_position)
+            ids = [row[0] for row in conn.execute(f'SELECT id FROM event WHERE id > ? AND id <= ? AND ({where_clause}) ORDER BY id LIMIT ?',
+                                                  (position, window_end, *params, JOB_CHUNK_SIZE))]
+            if ids:
+                # Check the writer out per chunk so bans and single deletes can interleave
+                writer = get_db_connection_rw()
+                try:
+                    deleted += delete_event_rows(writer, admin, ids)
+                finally:
+                    writer.close()
+            position = ids[-1] if len(ids) == JOB_CHUNK_SIZE else window_end
+            if not job_checkpoint(admin, job_id, position, deleted):
+                return None
+            # Let the relay take the write lock between chunks
+            time.sleep(JOB_CHUNK_PAUSE)
+        return deleted
+    finally:
+        conn.close()
+        admin.close()
+
+def batch_delete_criteria(params):
+    where_clauses, where_params = [], []
+    if params.get('before_ts') is not None:
+        where_clauses.append('created_at < ?')
+        where_params.append(params['before_ts'])
+    if params.get('kind') is not None:
+        where_clauses.append('kind = ?')
+        where_params.append(params['kind'])
+    return ' AND '.join(where_clauses), where_params
+
+def run_batch_delete_job(job_id, params):
+    where_clause, where_params = batch_delete_criteria(params)
+    deleted = delete_events_chunked(job_id, where_clause, where_params)
+    return None if deleted is None else {"deleted_count": deleted}
+
+JOB_HANDLERS['batch-delete'] = run_batch_delete_job
+
+def purge_authors(job_id, pubkeys):
+    """Deletes all stored events of the given authors, one author and one chunk at a time
+    via the author index. Authors that were unbanned in the meantime are skipped."""
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        job = admin.execute('SELECT position, progress, result FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        position, deleted = job['position'], job['progress']
+        totals = json.loads(job['result']) if job['result'] else {"tag_rows": 0, "payload_bytes": 0, "authors_skipped": 0}
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        while position < len(pubkeys):
+            pubkey = pubkeys[position]
+            if pubkey not in ban_registry:
+                totals['authors_skipped'] += 1
+            else:
+                author = bytes.fromhex(pubkey)
+                while True:
+                    ids = [row[0] for row in conn.execute('SELECT id FROM event WHERE author = ? LIMIT ?', (author, JOB_CHUNK_SIZE))]
+                    if not ids:
+                        break
+                    writer = get_db_connection_rw()
+                    try:
+                        deleted += delete_event_rows(writer, admin, ids, totals)
+                    finally:
+                        writer.close()
+                    if not job_checkpoint(admin, job_id, position, deleted, totals):
+                        return None
+                    time.sleep(JOB_CHUNK_PAUSE)
+            position += 1
+            if not job_checkpoint(admin, job_id, position, deleted, totals):
+                return None
+        # Pages freed by the purge; they are reused by the relay or returned by a VACUUM
+        totals['freed_pages_bytes'] = max(0, conn.execute('PRAGMA freelist_count').fetchone()[0] - free_pages) * page_size
+        return {"deleted_count": deleted, **totals}
+    finally:
+        conn.close()
+        admin.close()
+
+def run_purge_authors_job(job_id, params):
+    return purge_authors(job_id, params['pubkeys'])
+
+JOB_HANDLERS['purge-authors'] = run_purge_authors_job
+
+def create_purge_job(pubkeys):
+    return create_job('purge-authors', {"pubkeys": pubkeys}, 0, len(pubkeys))
+
+def run_bulk_ban_job(job_id, params):
+    admin = get_admin_db_connection()
+    try:
+        entries = params['pubkeys']
+        job = admin.execute('SELECT position, result FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        position = job['position']
+        # A resumed job continues the counts stored with its last checkpoint; re-applying a chunk is harmless
+        saved = json.loads(job['result']) if job['result'] else {}
+        summary = collections.Counter(saved.get('summary', {}))
+        invalid = saved.get('invalid', [])
+        while position < len(entries):
+            chunk = entries[position:position + JOB_CHUNK_SIZE]
+            results, chunk_summary = apply_bulk_bans(chunk, params['action'], flush=False)
+            summary.update(chunk_summary)
+            invalid += [r['input'] for r in results if r['status'] == 'invalid'][:BULK_MAX_REPORTED - len(invalid)]
+            position += len(chunk)
+            if not job_checkpoint(admin, job_id, position, position, {"summary": dict(summary), "invalid": invalid}):
+                ban_registry.flush()
+                return None
+        ban_registry.flush()
+        result = {"summary": dict(summary), "invalid": invalid}
+        if params.get('purge') and params['action'] == 'ban':
+            result['purge_job_id'] = create_purge_job(valid_pubkeys(entries))
+        return result
+    finally:
+        admin.close()
+
+JOB_HANDLERS['bulk-ban'] = run_bulk_ban_job
+
+def run_next_job():
+    """Runs the oldest unfinished job to completion. Returns False if there was nothing to do."""
+    admin = get_admin_db_connection()
+    try:
+        row = admin.execute("SELECT * FROM jobs WHERE status IN ('running', 'queued') ORDER BY status = 'queued', id LIMIT 1").fetchone()
+        if row is None:
+            return False
+        job_id, now = row['id'], int(time.time())
+        # Conditional, so a cancel that lands between the SELECT and here is not overwritten
+        claimed = admin.execute("UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                                (now, now, job_id)).rowcount
+        admin.commit()
+        if not claimed:
+            return True
+        try:
+            result = JOB_HANDLERS[row['type']](job_id, json.loads(row['params']))
+            if result is not None:
+                admin.execute("UPDATE jobs SET status = 'done', position = end_position, result = ?, finished_at = ? WHERE id = ?",
+                              (json.dumps(result), int(time.time()), job_id))
+            else:
+                admin.execute("UPDATE jobs SET finished_at = ? WHERE id = ?", (int(time.time()), job_id))
+        except Exception as e:
+            print(f"Job {job_id} ({row['type']}) failed: {e}")
+            admin.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?", (str(e), int(time.time()), job_id))
+        admin.commit()
+        return True
+    finally:
+        admin.close()
+
+def job_worker():
+    while True:
+        job_wakeup.clear()
+        try:
+            busy = run_next_job()
+        except Exception as e:
+            print(f"Error running jobs: {e}")
+            busy = False
+        if not busy:
+            job_wakeup.wait(STATS_REFRESH_INTERVAL)
+
+def stats_worker():
+    while True:
+        try:
+            # Sampled first, so the write rate is known early even while a first stats build runs long
+            record_write_sample()
+            stats_advance()
+            queue_storage_report()
+            queue_retention_run()
+            sweep_import_uploads()
+        except Exception as e:
+            print(f"Error advancing stats: {e}")
+        time.sleep(STATS_REFRESH_INTERVAL)
+
+def start_background_workers():
+    threading.Thread(target=stats_worker, name='stats-worker', daemon=True).start()
+    threading.Thread(target=job_worker, name='job-worker', daemon=True).start()
+    threading.Thread(target=spam_worker, name='spam-worker', daemon=True).start()
+    if fts_ready:
+        threading.Thread(target=fts_worker, name='fts-worker', daemon=True).start()
+    ensure_stream_source()
+    start_admission_server()
+
+# --- Speicheranalyse ---
+# Where the relay's disk space goes: bytes per kind, per author and by age (in the
+# brackets the batch delete offers), file and WAL sizes, free pages and per-index
+# sizes from dbstat. Built as a background job; above STORAGE_SAMPLE_THRESHOLD
+# events it reads one random rowid window in each of STORAGE_SAMPLES equal slices
+# of the id range and extrapolates instead of reading every row. An interrupted
+# report starts over (on the same windows, they are drawn from the job id).
+
+STORAGE_SAMPLE_THRESHOLD = 1000000
+STORAGE_SAMPLES = 500
+STORAGE_SAMPLE_ROWS = 200
+STORAGE_REPORT_INTERVAL = 6 * 3600
+STORAGE_REPORTS_KEPT = 30
+STORAGE_TOP_AUTHORS = 20
+STORAGE_AGE_DAYS = (90, 180, 365)
+# event_hash and author blobs plus the integer columns of an event row
+STORAGE_ROW_OVERHEAD = 96
+
+def storage_files():
+    return {name: os.path.getsize(DATABASE_PATH + suffix) if os.path.exists(DATABASE_PATH + suffix) else 0
+            for name, suffix in (('db', ''), ('wal', '-wal'), ('shm', '-shm'))}
+
+def storage_objects(conn):
+    """Size of every table and index from the dbstat virtual table, or None if SQLite lacks it."""
+    kinds = {row[0]: (row[1], row[2]) for row in conn.execute('SELECT name, type, tbl_name FROM sqlite_master')}
+    try:
+        rows = conn.execute('SELECT name, pageno, pgsize, payload, unused FROM dbstat WHERE aggregate = TRUE').fetchall()
+    except sqlite3.OperationalError:
+        try:
+            # SQLite < 3.31 has no aggregate mode
+            rows = conn.execute('SELECT name, COUNT(*), SUM(pgsize), SUM(payload), SUM(unused) FROM dbstat GROUP BY name').fetchall()
+        except sqlite3.OperationalError:
+            return None
+    objects = []
+    for name, pages, size, payload, unused in rows:
+        object_type, table = kinds.get(name, ('table', name))
+        objects.append({"name": name, "type": object_type, "table": table, "pages": pages, "bytes": size,
+                        "payload_bytes": payload, "unused_bytes": unused, "fill_ratio": round(payload / size, 3) if size else None})
+    objects.sort(key=lambda o: o["bytes"], reverse=True)
+    return objects
+
+def storage_scan(conn, rows, totals, now):
+    """Adds a contiguous run of event rows (and their tags) to the running totals."""
+    if not rows:
+        return
+    tag_bytes = dict(conn.execute('SELECT event_id, SUM(length(name) + length(value)) FROM tag WHERE event_id >= ? AND event_id <= ? GROUP BY event_id',
+                                  (rows[0]['id'], rows[-1]['id'])).fetchall())
+    for row in rows:
+        content, tags = row['size'], tag_bytes.get(row['id'], 0) or 0
+        size = content + tags + STORAGE_ROW_OVERHEAD
+        kind = totals['kinds'].setdefault(row['kind'], [0, 0, 0])
+        kind[0] += 1
+        kind[1] += content
+        kind[2] += tags
+        author = totals['authors'].setdefault(row['author'], [0, 0])
+        author[0] += 1
+        author[1] += size
+        for days in STORAGE_AGE_DAYS:
+            if row['created_at'] < now - days * 86400:
+                age = totals['ages'][days]
+                age[0] += 1
+                age[1] += size
+        totals['rows'] += 1
+
+STORAGE_ROW_SELECT = 'SELECT id, kind, author, created_at, length(content) AS size FROM event'
+
+def build_storage_report(job_id):
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        started, now = time.time(), int(time.time())
+        min_id, max_id = conn.execute('SELECT MIN(id), MAX(id) FROM event').fetchone()
+        min_id, max_id = min_id or 0, max_id or 0
+        total_events = get_meta(admin, 'stats_total_events') or max_id - min_id + 1
+        sampled = total_events > STORAGE_SAMPLE_THRESHOLD
+        end = STORAGE_SAMPLES if sampled else max_id
+        admin.execute('UPDATE jobs SET position = ?, start_position = ?, end_position = ?, progress = 0 WHERE id = ?',
+                      (0 if sampled else min_id - 1, 0 if sampled else min_id - 1, end, job_id))
+        admin.commit()
+
+        totals = {"kinds": {}, "authors": {}, "ages": {days: [0, 0] for days in STORAGE_AGE_DAYS}, "rows": 0}
+        if sampled:
+            # One window per slice, cut off at the slice's end, so no row is counted twice.
+            # Each is one index seek plus at most STORAGE_SAMPLE_ROWS rows
+            rng = random.Random(job_id)
+            span = max_id - min_id + 1
+            for i in range(STORAGE_SAMPLES):
+                low, high = min_id + i * span // STORAGE_SAMPLES, min_id + (i + 1) * span // STORAGE_SAMPLES
+                start = rng.randint(low, max(low, high - STORAGE_SAMPLE_ROWS))
+                storage_scan(conn, conn.execute(f'{STORAGE_ROW_SELECT} WHERE id >= ? AND id < ? ORDER BY id LIMIT ?',
+                                                (start, high, STORAGE_SAMPLE_ROWS)).fetchall(), totals, now)
+                if i % 20 == 19 and not job_checkpoint(admin, job_id, i + 1, totals['rows']):
+                    return None
+        else:
+            position = min_id - 1
+            while position < max_id:
+                window_end = min(position + JOB_SCAN_WINDOW, max_id)
+                storage_scan(conn, conn.execute(f'{STORAGE_ROW_SELECT} WHERE id > ? AND id <= ? ORDER BY id', (position, window_end)).fetchall(), totals, now)
+                position = window_end
+                if not job_checkpoint(admin, job_id, position, totals['rows']):
+                    return None
+        scale = total_events / totals['rows'] if sampled and totals['rows'] else 1.0
+
+        def scaled(value):
+            return int(round(value * scale))
+
+        event_bytes = sum(content + tags + count * STORAGE_ROW_OVERHEAD for count, content, tags in totals['kinds'].values())
+        kinds = [{"kind": kind, "events": scaled(count), "content_bytes": scaled(content), "tag_bytes": scaled(tags),
+                  "bytes": scaled(content + tags + count * STORAGE_ROW_OVERHEAD),
+                  "share": round((content + tags + count * STORAGE_ROW_OVERHEAD) / event_bytes, 4) if event_bytes else 0}
+                 for kind, (count, content, tags) in totals['kinds'].items()]
+        kinds.sort(key=lambda k: k["bytes"], reverse=True)
+        authors = sorted(totals['authors'].items(), key=lambda item: item[1][1], reverse=True)[:STORAGE_TOP_AUTHORS]
+
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        objects = storage_objects(conn)
+        report = {
+            "generated_at": now,
+            "duration_seconds": round(time.time() - started, 1),
+            "sampled": sampled,
+            "rows_scanned": totals['rows'],
+            "total_events": total_events,
+            "files": storage_files(),
+            "pages": {"page_size": page_size, "page_count": page_count, "freelist_count": freelist,
+                      "free_bytes": freelist * page_size, "free_ratio": round(freelist / page_count, 4) if page_count else 0},
+            "event_bytes": scaled(event_bytes),
+            "kinds": kinds,
+            "top_authors": [{"pubkey": author.hex(), "events": scaled(count), "bytes": scaled(size)} for author, (count, size) in authors],
+            "older_than_days": {str(days): {"events": scaled(count), "bytes": scaled(size)} for days, (count, size) in totals['ages'].items()},
+            "objects": objects,
+        }
+        if objects is not None:
+            used = sum(o["bytes"] for o in objects)
+            report["pages"]["unused_in_pages_bytes"] = sum(o["unused_bytes"] for o in objects)
+            report["pages"]["fragmentation_ratio"] = round((report["pages"]["unused_in_pages_bytes"] + freelist * page_size) / (used + freelist * page_size), 4) if used else 0
+        report_id = admin.execute('INSERT INTO storage_reports (created_at, report) VALUES (?, ?)', (now, json.dumps(report))).lastrowid
+        admin.execute('DELETE FROM storage_reports WHERE id <= ?', (report_id - STORAGE_REPORTS_KEPT,))
+        admin.commit()
+        invalidate_cache('storage')
+        return {"report_id": report_id, "rows_scanned": totals['rows'], "sampled": sampled}
+    finally:
+        conn.close()
+        admin.close()
+
+def run_storage_report_job(job_id, params):
+    return build_storage_report(job_id)
+
+JOB_HANDLERS['storage-report'] = run_storage_report_job
+
+def queue_storage_report(force=False):
+    """Queues a report unless one is pending or (without force) the last one is recent. Returns the job id or None."""
+    admin = get_admin_db_connection()
+    try:
+        pending = admin.execute("SELECT id FROM jobs WHERE type = 'storage-report' AND status IN ('queued', 'running')").fetchone()
+        if pending:
+            return pending[0]
+        last = admin.execute('SELECT MAX(created_at) FROM storage_reports').fetchone()[0]
+    finally:
+        admin.close()
+    if not force and last and last > time.time() - STORAGE_REPORT_INTERVAL:
+        return None
+    job_id = create_job('storage-report', {})
+    invalidate_cache('storage')
+    return job_id
+
+# --- Aufbewahrungsregeln ---
+# Declarative retention: "kind 7 older than 30 days", "at most 5000 events per
+# author", or both combined with a kind. A scheduler queues a 'retention' job at
+# most once per RETENTION_INTERVAL inside the quiet hours; the job deletes in
+# throttled chunks and stops when the quiet hours end, so the next window picks
+# up where it left off. Every rule run is written to retention_history.
+
+RETENTION_INTERVAL = 3600
+RETENTION_CHUNK_PAUSE = 0.2
+# Local hours [start, end) in which rules are enforced; start == end means at any time
+RETENTION_QUIET_HOURS = (2, 6)
+
+def retention_quiet_hours(admin):
+    return get_meta(admin, 'retention_quiet_start', RETENTION_QUIET_HOURS[0]), get_meta(admin, 'retention_quiet_end', RETENTION_QUIET_HOURS[1])
+
+def in_quiet_hours(start, end, now=None):
+    hour = (now or datetime.now()).hour
+    if start == end:
+        return True
+    return start <= hour < end if start < end else hour >= start or hour < end
+
+def retention_rule_to_dict(row):
+    rule = dict(row)
+    rule['enabled'] = bool(rule['enabled'])
+    parts = [f"kind {rule['kind']}" if rule['kind'] is not None else "all kinds"]
+    if rule['max_age_days']:
+        parts.append(f"older than {rule['max_age_days']}d")
+    if rule['author_cap']:
+        parts.append(f"beyond {rule['author_cap']} per author")
+    rule['description'] = ', '.join(parts)
+    return rule
+
+def parse_retention_rule(data):
+    """Validates a rule from JSON. Returns (kind, max_age_days, author_cap); raises ValueError."""
+    def optional_int(key, minimum):
+        value = data.get(key)
+        if value is None or value == '':
+            return None
+        value = int(value)
+        if value < minimum:
+            raise ValueError(f"{key} must be at least {minimum}")
+        return value
+    kind, max_age_days, author_cap = optional_int('kind', 0), optional_int('max_age_days', 1), optional_int('author_cap', 1)
+    if max_age_days is None and author_cap is None:
+        raise ValueError("A rule needs max_age_days and/or author_cap")
+    return kind, max_age_days, author_cap
+
+def retention_age_clause(rule, now):
+    clauses, params = [], []
+    if rule['max_age_days']:
+        clauses.append('created_at < ?')
+        params.append(now - rule['max_age_days'] * 86400)
+    if rule['kind'] is not None:
+        clauses.append('kind = ?')
+        params.append(rule['kind'])
+    return ' AND '.join(clauses), params
+
+def retention_capped_authors(conn, admin, rule):
+    """(author, events over the cap) for every author above a rule's cap. stats_authors narrows
+    the candidates via its count index; kind-specific caps are re-counted on author_kind_index."""
+    over = []
+    for author, total in admin.execute('SELECT author, count FROM stats_authors WHERE count > ?', (rule['author_cap'],)):
+        if rule['kind'] is not None:
+            total = conn.execute('SELECT COUNT(*) FROM event WHERE author = ? AND kind = ?', (author, rule['kind'])).fetchone()[0]
+        if total > rule['author_cap']:
+            over.append((author, total - rule['author_cap']))
+    return over
+
+def retention_cap_clause(conn, rule, author, now):
+    """Where clause for an author's events beyond the cap (oldest first), optionally also limited by age."""
+    kind_clause, kind_params = ('AND kind = ?', [rule['kind']]) if rule['kind'] is not None else ('', [])
+    # The newest `author_cap` events are kept; everything at or before the next one goes (author_created_at_index)
+    cutoff = conn.execute(f'SELECT created_at, id FROM event WHERE author = ? {kind_clause} ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?',
+                          (author, *kind_params, rule['author_cap'])).fetchone()
+    if cutoff is None:
+        return None, None
+    clause = f'author = ? {kind_clause} AND created_at <= ? AND (created_at < ? OR id <= ?)'
+    params = [author, *kind_params, cutoff[0], cutoff[0], cutoff[1]]
+    if rule['max_age_days']:
+        clause += ' AND created_at < ?'
+        params.append(now - rule['max_age_days'] * 86400)
+    return clause, params
+
+def retention_estimate(conn, admin, rule, now):
+    """Dry run: how many events a rule would delete right now."""
+    if rule['author_cap']:
+        total = 0
+        for author, _ in retention_capped_authors(conn, admin, rule):
+            clause, params = retention_cap_clause(conn, rule, author, now)
+            if clause:
+                total += conn.execute(f'SELECT COUNT(*) FROM event WHERE {clause}', params).fetchone()[0]
+        return total
+    clause, params = retention_age_clause(rule, now)
+    return conn.execute(f'SELECT COUNT(*) FROM event WHERE {clause}', params).fetchone()[0]
+
+def retention_delete(conn, admin, clause, params, deleted, keep_going):
+    """Deletes everything matching clause in throttled chunks. Returns (deleted, finished)."""
+    while True:
+        ids = [row[0] for row in conn.execute(f'SELECT id FROM event WHERE {clause} LIMIT ?', (*params, JOB_CHUNK_SIZE))]
+        if not ids:
+            return deleted, True
+        writer = get_db_connection_rw()
+        try:
+            deleted += delete_event_rows(writer, admin, ids)
+        finally:
+            writer.close()
+        if not keep_going(deleted):
+            return deleted, False
+        time.sleep(RETENTION_CHUNK_PAUSE)
+
+def run_retention_job(job_id, params):
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        rules = [dict(row) for row in admin.execute('SELECT * FROM retention_rules WHERE enabled = 1 ORDER BY id')]
+        admin.execute('UPDATE jobs SET position = 0, start_position = 0, end_position = ? WHERE id = ?', (len(rules), job_id))
+        admin.commit()
+        quiet = retention_quiet_hours(admin)
+        status = {"stopped": None}
+
+        def keep_going(deleted):
+            if not job_checkpoint(admin, job_id, position, total + deleted):
+                status["stopped"] = 'cancelled'
+            elif not params.get('force') and not in_quiet_hours(*quiet):
+                status["stopped"] = 'quiet hours ended'
+            return status["stopped"] is None
+
+        total, runs = 0, []
+        for position, rule in enumerate(rules):
+            if not params.get('force') and not in_quiet_hours(*quiet):
+                status["stopped"] = 'outside quiet hours'
+                break
+            started, now, deleted = time.time(), int(time.time()), 0
+            if rule['author_cap']:
+                for author, _ in retention_capped_authors(conn, admin, rule):
+                    clause, clause_params = retention_cap_clause(conn, rule, author, now)
+                    if clause:
+                        deleted, finished = retention_delete(conn, admin, clause, clause_params, deleted, keep_going)
+                        if not finished:
+                            break
+            else:
+                clause, clause_params = retention_age_clause(rule, now)
+                deleted, _ = retention_delete(conn, admin, clause, clause_params, deleted, keep_going)
+            total += deleted
+            admin.execute('''INSERT INTO retention_history (job_id, rule_id, description, started_at, duration_seconds, deleted, status)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)''', (job_id, rule['id'], retention_rule_to_dict(rule)['description'], int(started),
+                                                               round(time.time() - started, 1), deleted, status["stopped"] or 'done'))
+            admin.execute('UPDATE retention_rules SET last_run_at = ? WHERE id = ?', (now, rule['id']))
+            admin.commit()
+            runs.append({"rule_id": rule['id'], "deleted": deleted})
+            if status["stopped"] == 'cancelled':
+                return None
+            if status["stopped"]:
+                break
+            job_checkpoint(admin, job_id, position + 1, total)
+        set_meta(admin, 'retention_last_run', int(time.time()))
+        admin.commit()
+        return {"deleted_count": total, "rules": runs, "stopped": status["stopped"]}
+    finally:
+        conn.close()
+        admin.close()
+
+JOB_HANDLERS['retention'] = run_retention_job
+
+def queue_retention_run():
+    """Called by the scheduler: queues a retention job inside the quiet hours, at most once per RETENTION_INTERVAL."""
+    admin = get_admin_db_connection()
+    try:
+        if not admin.execute('SELECT 1 FROM retention_rules WHERE enabled = 1 LIMIT 1').fetchone():
+            return None
+        if not in_quiet_hours(*retention_quiet_hours(admin)):
+            return None
+        if get_meta(admin, 'retention_last_run') > time.time() - RETENTION_INTERVAL:
+            return None
+        if admin.execute("SELECT 1 FROM jobs WHERE type = 'retention' AND status IN ('queued', 'running')").fetchone():
+            return None
+    finally:
+        admin.close()
+    return create_job('retention', {})
+
+# --- Wartung ---
+# Maintenance tasks on the relay's database, run as background jobs: returning
+# free pages to the file system with incremental_vacuum, refreshing the query
+# planner statistics (ANALYZE / PRAGMA optimize), checkpointing the WAL, and
+# writing a compacted copy with VACUUM INTO. The relay's write rate is sampled
+# from MAX(id); a task is refused above MAINTENANCE_MAX_WRITE_RATE, and stepwise
+# tasks stop between steps when the load rises. Jobs run one at a time, so a
+# maintenance task never overlaps a batch delete or a purge.
+
+MAINTENANCE_MAX_WRITE_RATE = 20.0
+MAINTENANCE_RATE_WINDOW = 60
+MAINTENANCE_VACUUM_STEP_PAGES = 2000
+MAINTENANCE_STEP_PAUSE = 0.2
+MAINTENANCE_ANALYSIS_LIMIT = 1000
+MAINTENANCE_TASKS = ('incremental_vacuum', 'analyze', 'optimize', 'checkpoint', 'vacuum_into')
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+write_samples = collections.deque(maxlen=256)
+write_samples_lock = threading.Lock()
+
+def record_write_sample():
+    """Remembers the relay's current MAX(id) (a rowid lookup). Called by the stats worker."""
+    conn = get_db_connection()
+    try:
+        max_id = conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0
+    finally:
+        conn.close()
+    with write_samples_lock:
+        write_samples.append((time.monotonic(), max_id))
+
+def relay_write_rate():
+    """Events per second the relay stored over the last MAINTENANCE_RATE_WINDOW seconds,
+    or None while there is no sample at least a second older than this one (fresh start)."""
+    record_write_sample()
+    with write_samples_lock:
+        newest = write_samples[-1]
+        oldest = next(s for s in write_samples if s[0] >= newest[0] - MAINTENANCE_RATE_WINDOW)
+    if newest[0] - oldest[0] < 1:
+        return None
+    return max(0, newest[1] - oldest[1]) / (newest[0] - oldest[0])
+
+def maintenance_load_error():
+    """An error message if the relay is too busy for maintenance (or its load is not known yet), else None."""
+    rate = relay_write_rate()
+    if rate is None:
+        return "Relay write load is still being measured, try again in a few seconds"
+    if rate > MAINTENANCE_MAX_WRITE_RATE:
+        return f"Relay write load is {rate:.1f} events/s (limit {MAINTENANCE_MAX_WRITE_RATE:g}), try again later"
+    return None
+
+def maintenance_pages(conn):
+    return {name: conn.execute(f'PRAGMA {name}').fetchone()[0] for name in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')}
+
+def vacuum_target_path():
+    base, ext = os.path.splitext(DATABASE_PATH)
+    return f"{base}-vacuumed-{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext or '.db'}"
+
+def maintenance_status():
+    conn = get_db_connection()
+    try:
+        pages = maintenance_pages(conn)
+    finally:
+        conn.close()
+    free_bytes = pages['freelist_count'] * pages['page_size']
+    files = storage_files()
+    rate = relay_write_rate()
+    admin = get_admin_db_connection()
+    try:
+        job = admin.execute("SELECT id FROM jobs WHERE type = 'maintenance' AND status IN ('queued', 'running')").fetchone()
+    finally:
+        admin.close()
+    return {
+        "auto_vacuum": AUTO_VACUUM_MODES.get(pages['auto_vacuum'], pages['auto_vacuum']),
+        "page_size": pages['page_size'],
+        "page_count": pages['page_count'],
+        "freelist_count": pages['freelist_count'],
+        "files": files,
+        # What each task would give back to the file system right now
+        "reclaimable_bytes": {
+            "incremental_vacuum": free_bytes if pages['auto_vacuum'] == 2 else 0,
+            "checkpoint": files['wal'],
+            "vacuum_into": free_bytes,
+        },
+        "vacuum_into_estimated_bytes": (pages['page_count'] - pages['freelist_count']) * pages['page_size'],
+        "disk_free_bytes": shutil.disk_usage(os.path.dirname(os.path.abspath(DATABASE_PATH))).free,
+        "write_rate": round(rate, 2) if rate is not None else None,
+        "max_write_rate": MAINTENANCE_MAX_WRITE_RATE,
+        "allowed": rate is not None and rate <= MAINTENANCE_MAX_WRITE_RATE,
+        "job_id": job[0] if job else None,
+    }
+
+def maintenance_incremental_vacuum(job_id, admin, params):
+    conn = get_db_connection()
+    try:
+        pages = maintenance_pages(conn)
+    finally:
+        conn.close()
+    if pages['auto_vacuum'] != 2:
+        # Without auto_vacuum = INCREMENTAL the file keeps no pointer map and cannot shrink in place
+        return {"reclaimed_bytes": 0, "stopped": f"auto_vacuum is {AUTO_VACUUM_MODES.get(pages['auto_vacuum'])}, use vacuum_into with incremental to switch"}
+    start = pages['freelist_count']
+    admin.execute('UPDATE jobs SET position = 0, start_position = 0, end_position = ? WHERE id = ?', (start, job_id))
+    admin.commit()
+    freelist, stopped = start, None
+    while freelist > 0:
+        stopped = maintenance_load_error()
+        if stopped:
+            break
+        writer = get_db_connection_rw()
+        try:
+            # Each step holds the write lock only for MAINTENANCE_VACUUM_STEP_PAGES pages
+            writer.execute(f'PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_STEP_PAGES})').fetchall()
+            remaining = writer.execute('PRAGMA freelist_count').fetchone()[0]
+        finally:
+            writer.close()
+        if remaining >= freelist:
+            break
+        freelist = remaining
+        if not job_checkpoint(admin, job_id, start - freelist, start - freelist):
+            return None
+        time.sleep(MAINTENANCE_STEP_PAUSE)
+    return {"reclaimed_bytes": (start - freelist) * pages['page_size'], "pages_freed": start - freelist, "stopped": stopped}
+
+def maintenance_analyze(job_id, admin, params):
+    conn = get_db_connection()
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    finally:
+        conn.close()
+    admin.execute('UPDATE jobs SET position = 0, start_position = 0, end_position = ? WHERE id = ?', (len(tables), job_id))
+    admin.commit()
+    limit = params.get('limit', MAINTENANCE_ANALYSIS_LIMIT)
+    analyzed, stopped = [], None
+    for position, table in enumerate(tables):
+        stopped = maintenance_load_error()
+        if stopped:
+            break
+        writer = get_db_connection_rw()
+        try:
+            # analysis_limit samples each index instead of reading it completely (0 = full scan)
+            writer.execute(f'PRAGMA analysis_limit = {limit}')
+            writer.execute(f'ANALYZE "{table}"')
+            writer.commit()
+        finally:
+            writer.close()
+        analyzed.append(table)
+        if not job_checkpoint(admin, job_id, position + 1, 0):
+            return None
+        time.sleep(MAINTENANCE_STEP_PAUSE)
+    return {"tables": analyzed, "analysis_limit": limit, "stopped": stopped}
+
+def maintenance_optimize(job_id, admin, params):
+    stopped = maintenance_load_error()
+    if stopped:
+        return {"stopped": stopped}
+    writer = get_db_connection_rw()
+    try:
+        writer.execute(f'PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}')
+        writer.execute('PRAGMA optimize')
+        writer.commit()
+    finally:
+        writer.close()
+    return {"stopped": None}
+
+def maintenance_checkpoint(job_id, admin, params):
+    stopped = maintenance_load_error()
+    if stopped:
+        return {"reclaimed_bytes": 0, "stopped": stopped}
+    mode = params.get('mode', 'TRUNCATE')
+    wal_before = storage_files()['wal']
+    writer = get_db_connection_rw()
+    try:
+        busy, log_frames, checkpointed = writer.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+    finally:
+        writer.close()
+    wal_after = storage_files()['wal']
+    return {"mode": mode, "busy": bool(busy), "wal_frames": log_frames, "checkpointed_frames": checkpointed,
+            "wal_bytes_before": wal_before, "wal_bytes_after": wal_after, "reclaimed_bytes": max(0, wal_before - wal_after),
+            "stopped": "readers or writers kept the checkpoint from completing" if busy else None}
+
+def maintenance_vacuum_into(job_id, admin, params):
+    stopped = maintenance_load_error()
+    if stopped:
+        return {"reclaimed_bytes": 0, "stopped": stopped}
+    target = vacuum_target_path()
+    # A plain read-only connection: VACUUM INTO is refused under query_only, and it
+    # should not hold one of the pooled connections for minutes
+    conn = sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, check_same_thread=False)
+    try:
+        conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+        pages = maintenance_pages(conn)
+        expected = pages['page_count'] - pages['freelist_count']
+        if shutil.disk_usage(os.path.dirname(target)).free < expected * pages['page_size']:
+            raise RuntimeError(f"Not enough free disk space for {target}")
+        admin.execute('UPDATE jobs SET position = 0, start_position = 0, end_position = ? WHERE id = ?', (expected, job_id))
+        admin.commit()
+        if params.get('incremental'):
+            # Applies to the copy only; afterwards incremental_vacuum can shrink it in place
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        last = [time.monotonic(), True]
+
+        def progress():
+            if time.monotonic() - last[0] >= 1:
+                last[0] = time.monotonic()
+                written = os.path.getsize(target) // pages['page_size'] if os.path.exists(target) else 0
+                last[1] = job_checkpoint(admin, job_id, min(written, expected), written)
+            return 0 if last[1] else 1
+
+        conn.set_progress_handler(progress, 10000)
+        started = time.time()
+        try:
+            conn.execute('VACUUM INTO ?', (target,))
+        except sqlite3.OperationalError:
+            if os.path.exists(target):
+                os.remove(target)
+            if not last[1]:
+                return None
+            raise
+    finally:
+        conn.close()
+    original = storage_files()
+    size = os.path.getsize(target)
+    return {"path": target, "bytes": size, "original_bytes": original['db'] + original['wal'],
+            "reclaimed_bytes": max(0, original['db'] + original['wal'] - size), "duration_seconds": round(time.time() - started, 1),
+            "auto_vacuum": 'incremental' if params.get('incremental') else AUTO_VACUUM_MODES.get(pages['auto_vacuum']), "stopped": None}
+
+MAINTENANCE_HANDLERS = {
+    'incremental_vacuum': maintenance_incremental_vacuum,
+    'analyze': maintenance_analyze,
+    'optimize': maintenance_optimize,
+    'checkpoint': maintenance_checkpoint,
+    'vacuum_into': maintenance_vacuum_into,
+}
+
+def run_maintenance_job(job_id, params):
+    admin = get_admin_db_connection()
+    try:
+        result = MAINTENANCE_HANDLERS[params['task']](job_id, admin, params)
+        return None if result is None else {"task": params['task'], **result}
+    finally:
+        admin.close()
+
+JOB_HANDLERS['maintenance'] = run_maintenance_job
+
+# --- Import ---
+# Restores or migrates events from NDJSON/JSONL, e.g. a file from /api/events/export.
+# Lines are parsed and their ids (optionally their signatures) verified on a pool
+# of worker processes, then stored the way nostr-rs-relay stores events, one
+# transaction per IMPORT_BATCH_SIZE events. Duplicates (by event_hash), authors on
+# the ban list, ephemeral and expired events, and replaceable events older than
+# the stored version are skipped. An interrupted import job resumes after the last
+# committed batch; lines read twice are recognized as duplicates.
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_CHUNK_LINES = 1000
+IMPORT_SYNC_BYTES = 1 << 20
+# Processes that parse and verify lines; None = one per CPU
+IMPORT_WORKERS = None
+IMPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(ADMIN_DATABASE_PATH)), 'imports')
+# Uploads no unfinished job refers to are removed once they are this old (younger ones may still be in use)
+IMPORT_ORPHAN_SECONDS = 3600
+# A failed import keeps its upload this long after failing, so it can be retried (POST /api/jobs/<id>/retry)
+IMPORT_FAILED_KEEP_SECONDS = 7 * 86400
+IMPORT_COUNTERS = ('lines', 'inserted', 'duplicate', 'banned', 'invalid_json', 'invalid_event', 'invalid_id',
+                   'invalid_sig', 'ephemeral', 'expired', 'superseded', 'hidden')
+LOWER_HEX64_RE = re.compile(r'[0-9a-f]{64}')
+LOWER_HEX128_RE = re.compile(r'[0-9a-f]{128}')
+
+def event_id_hash(event):
+    """NIP-01 event id: sha256 of the compact JSON array [0, pubkey, created_at, kind, tags, content]."""
+    serialized = json.dumps([0, event['pubkey'], event['created_at'], event['kind'], event['tags'], event['content']],
+                            ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+def valid_event_shape(event):
+    return (isinstance(event, dict)
+            and isinstance(event.get('id'), str) and LOWER_HEX64_RE.fullmatch(event['id'])
+            and isinstance(event.get('pubkey'), str) and LOWER_HEX64_RE.fullmatch(event['pubkey'])
+            and isinstance(event.get('sig'), str) and LOWER_HEX128_RE.fullmatch(event['sig'])
+            and type(event.get('created_at')) is int and type(event.get('kind')) is int and 0 <= event['kind'] <= 65535
+            and isinstance(event.get('content'), str) and isinstance(event.get('tags'), list)
+            and all(isinstance(tag, list) and all(isinstance(v, str) for v in tag) for tag in event['tags']))
+
+def verify_import_lines(lines, check_signatures):
+    """Parses and checks a chunk of lines (runs in a worker process). Returns (counters, events);
+    each event is (id, pubkey, created_at, kind, tags, serialized event as the relay stores it)."""
+    counters, events = dict.fromkeys(IMPORT_COUNTERS, 0), []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        counters['lines'] += 1
+        try:
+            event = json.loads(line)
+        except ValueError:
+            counters['invalid_json'] += 1
+            continue
+        if not valid_event_shape(event):
+            counters['invalid_event'] += 1
+        elif event_id_hash(event) != event['id']:
+            counters['invalid_id'] += 1
+        elif check_signatures and not schnorr_valid(event):
+            counters['invalid_sig'] += 1
+        else:
+            stored = {key: event[key] for key in ('id', 'pubkey', 'created_at', 'kind', 'tags', 'content', 'sig')}
+            events.append((event['id'], event['pubkey'], event['created_at'], event['kind'], event['tags'],
+                           json.dumps(stored, ensure_ascii=False, separators=(',', ':'))))
+    return counters, events
+
+def schnorr_valid(event):
+    try:
+        return coincurve.PublicKeyXOnly(bytes.fromhex(event['pubkey'])).verify(bytes.fromhex(event['sig']), bytes.fromhex(event['id']))
+    except ValueError:
+        return False
+
+def tag_value(tags, name):
+    return next((tag[1] for tag in tags if len(tag) >= 2 and tag[0] == name), None)
+
+def insert_import_batch(events, totals):
+    """Stores verified events in one transaction, following the relay's rules for replaceable
+    events, expiration and NIP-09 deletions."""
+    now = int(time.time())
+    # Loading the ban list writes to the relay database, so it can't happen inside the transaction
+    ban_registry.ensure_loaded()
+    writer = get_db_connection_rw()
+    try:
+        writer.execute('BEGIN IMMEDIATE')
+        for event_id, pubkey, created_at, kind, tags, serialized in events:
+            if pubkey in ban_registry:
+                totals['banned'] += 1
+                continue
+            if 20000 <= kind < 30000:
+                totals['ephemeral'] += 1
+                continue
+            expiration = tag_value(tags, 'expiration')
+            expires_at = int(expiration) if expiration and expiration.isdigit() else None
+            if expires_at is not None and expires_at <= now:
+                totals['expired'] += 1
+                continue
+            author, event_hash = bytes.fromhex(pubkey), bytes.fromhex(event_id)
+            if is_replaceable_kind(kind):
+                if writer.execute('SELECT 1 FROM event WHERE event_hash = ?', (event_hash,)).fetchone():
+                    totals['duplicate'] += 1
+                    continue
+                # Same author and kind (and d tag for 30000-39999) identify the replaceable slot
+                if 30000 <= kind < 40000:
+                    slot, slot_params = ("id IN (SELECT event_id FROM tag WHERE name = 'd' AND kind = ? AND value = ?) AND author = ? AND kind = ?",
+                                         (kind, tag_value(tags, 'd') or '', author, kind))
+                else:
+                    slot, slot_params = 'author = ? AND kind = ?', (author, kind)
+                # +created_at keeps the planner on author_kind_index instead of walking all of the author's newer events
+                if writer.execute(f'SELECT 1 FROM event WHERE {slot} AND +created_at >= ? LIMIT 1', (*slot_params, created_at)).fetchone():
+                    totals['superseded'] += 1
+                    continue
+            cursor = writer.execute('''INSERT OR IGNORE INTO event (event_hash, created_at, expires_at, kind, author, delegated_by, first_seen, hidden, content)
+                                       VALUES (?, ?, ?, ?, ?, NULL, ?, 0, ?)''', (event_hash, created_at, expires_at, kind, author, now, serialized))
+            if cursor.rowcount == 0:
+                totals['duplicate'] += 1
+                continue
+            row_id = cursor.lastrowid
+            # Like the relay, only single-letter tags are indexed
+            writer.executemany('INSERT INTO tag (event_id, name, value, created_at, kind) VALUES (?, ?, ?, ?, ?)',
+                               [(row_id, tag[0], tag[1], created_at, kind) for tag in tags if len(tag) >= 2 and len(tag[0]) == 1])
+            if is_replaceable_kind(kind):
+                older = [row[0] for row in writer.execute(f'SELECT id FROM event WHERE {slot} AND id != ?', (*slot_params, row_id))]
+                if older:
+                    placeholders = ','.join('?' * len(older))
+                    writer.execute(f'DELETE FROM tag WHERE event_id IN ({placeholders})', older)
+                    writer.execute(f'DELETE FROM event WHERE id IN ({placeholders})', older)
+                    totals['superseded'] += len(older)
+            if kind == 5:
+                targets = [bytes.fromhex(tag[1]) for tag in tags if len(tag) >= 2 and tag[0] == 'e' and LOWER_HEX64_RE.fullmatch(tag[1])]
+                if targets:
+                    totals['hidden'] += writer.execute(f"UPDATE event SET hidden = 1 WHERE author = ? AND kind != 5 AND event_hash IN ({','.join('?' * len(targets))})",
+                                                       (author, *targets)).rowcount
+            totals['inserted'] += 1
+        writer.commit()
+    except Exception:
+        writer.rollback()
+        raise
+    finally:
+        writer.close()
+
+def read_import_chunks(stream, offset):
+    """Yields (lines, offset after them) in chunks of IMPORT_CHUNK_LINES lines."""
+    lines = []
+    for line in stream:
+        offset += len(line)
+        lines.append(line)
+        if len(lines) >= IMPORT_CHUNK_LINES:
+            yield lines, offset
+            lines = []
+    if lines:
+        yield lines, offset
+
+def open_import_stream(raw):
+    """Transparently decompresses gzip input (e.g. an export with gzip=1)."""
+    return gzip.GzipFile(fileobj=raw) if raw.peek(2)[:2] == b'\x1f\x8b' else raw
+
+def import_events(stream, verify_signatures=False, workers=None, offset=0, totals=None, on_batch=None):
+    """Imports NDJSON events from a binary stream. on_batch(totals, offset) runs after every committed
+    batch and may return False to stop. Returns (totals, finished)."""
+    if verify_signatures and coincurve is None:
+        raise RuntimeError("Signature checks need `pip install coincurve`")
+    totals = totals or {**dict.fromkeys(IMPORT_COUNTERS, 0), "seconds": 0.0}
+    workers = workers or os.cpu_count() or 1
+    # spawn rather than fork: the panel has threads (and their locks) running
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    started, base_seconds = time.time(), totals['seconds']
+
+    def verified():
+        if pool is None:
+            for lines, end in read_import_chunks(stream, offset):
+                yield verify_import_lines(lines, verify_signatures), end
+            return
+        pending = collections.deque()
+        for lines, end in read_import_chunks(stream, offset):
+            pending.append((pool.submit(verify_import_lines, lines, verify_signatures), end))
+            if len(pending) >= workers * 2:
+                future, chunk_end = pending.popleft()
+                yield future.result(), chunk_end
+        while pending:
+            future, chunk_end = pending.popleft()
+            yield future.result(), chunk_end
+
+    def commit(batch, end):
+        insert_import_batch(batch, totals)
+        totals['seconds'] = round(base_seconds + time.time() - started, 1)
+        totals['lines_per_second'] = int(totals['lines'] / totals['seconds']) if totals['seconds'] else None
+        return on_batch is None or on_batch(totals, end) is not False
+
+    batch, end = [], offset
+    try:
+        for (counters, events), end in verified():
+            for key, count in counters.items():
+                totals[key] += count
+            batch.extend(events)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                if not commit(batch, end):
+                    return totals, False
+                batch = []
+        return totals, commit(batch, end)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def save_import_upload(upload):
+    """Stores an uploaded (possibly gzipped) file decompressed in IMPORT_DIR, so a job can seek in it. Returns the path."""
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='import-', suffix='.ndjson', dir=IMPORT_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(upload, out, 1 << 20)
+        with open(path, 'rb') as raw:
+            source = open_import_stream(raw)
+            if source is not raw:
+                with open(path + '.tmp', 'wb') as out:
+                    shutil.copyfileobj(source, out, 1 << 20)
+        if os.path.exists(path + '.tmp'):
+            os.replace(path + '.tmp', path)
+    except Exception:
+        for leftover in (path, path + '.tmp'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return path
+
+def run_import_job(job_id, params):
+    admin = get_admin_db_connection()
+    try:
+        job = admin.execute('SELECT position, result FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+        def checkpoint(totals, end):
+            return job_checkpoint(admin, job_id, end, totals['inserted'], totals)
+
+        with open(params['path'], 'rb') as stream:
+            stream.seek(job['position'])
+            totals, finished = import_events(stream, params.get('verify_signatures'), IMPORT_WORKERS, job['position'],
+                                             json.loads(job['result']) if job['result'] else None, checkpoint)
+        # Done or cancelled. A failed job keeps its upload for a retry; sweep_import_uploads ages it out
+        os.remove(params['path'])
+        return totals if finished else None
+    finally:
+        admin.close()
+
+def sweep_import_uploads():
+    """Removes uploads no queued, running or recently failed import job refers to, e.g. of jobs
+    cancelled before they started. Returns the number of files removed."""
+    try:
+        names = os.listdir(IMPORT_DIR)
+    except FileNotFoundError:
+        return 0
+    admin = get_admin_db_connection()
+    try:
+        in_use = {json.loads(row[0]).get('path') for row in admin.execute(
+            "SELECT params FROM jobs WHERE type = 'import' AND (status IN ('queued', 'running') OR (status = 'failed' AND finished_at > ?))",
+            (int(time.time()) - IMPORT_FAILED_KEEP_SECONDS,))}
+    finally:
+        admin.close()
+    cutoff, removed = time.time() - IMPORT_ORPHAN_SECONDS, 0
+    for name in names:
+        path = os.path.join(IMPORT_DIR, name)
+        try:
+            if path not in in_use and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+JOB_HANDLERS['import'] = run_import_job
+
+# --- API Endpunkte ---
+
+@app.route('/api/stats')
+@cached_response('stats', STATS_REFRESH_INTERVAL)
+@bounded_query
+def get_stats():
+    conn, admin = None, None
+    stats = {}
+    try:
+        conn = get_db_connection()
+        admin = get_admin_db_connection()
+        now_ts = int(datetime.now().timestamp())
+        ts_24h_ago = now_ts - (24 * 3600)
+        ts_1h_ago = now_ts - 3600
+
+        # Totals, kinds and authors come from the incremental aggregates (see stats_advance)
+        stats['total_events'] = get_meta(admin, 'stats_total_events')
+        stats['distinct_pubkeys'] = get_meta(admin, 'stats_distinct_authors')
+        stats['events_24h'], stats['new_users_24h'] = timeline_sum(admin, ts_24h_ago)
+        stats['events_1h'], _ = timeline_sum(admin, ts_1h_ago)
+        stats['top_kinds'] = [dict(row) for row in admin.execute("SELECT kind, count FROM stats_kinds ORDER BY count DESC LIMIT 5").fetchall()]
+        dm_row = admin.execute("SELECT count FROM stats_kinds WHERE kind = 4").fetchone()
+        dm_count = dm_row[0] if dm_row else 0
+        stats['dm_percentage'] = round((dm_count / stats['total_events']) * 100, 2) if stats['total_events'] > 0 else 0
+        top_users_query = admin.execute("SELECT lower(hex(author)) as pubkey, count FROM stats_authors ORDER BY count DESC LIMIT 5").fetchall()
+        stats['top_users'] = [dict(row) for row in top_users_query]
+        oldest_event_ts = get_meta(admin, 'stats_oldest_event', None)
+        stats['oldest_event_date'] = datetime.fromtimestamp(oldest_event_ts).strftime('%d. %b %Y') if oldest_event_ts else "N/A"
+        stats['stats_updated_at'] = get_meta(admin, 'stats_updated_at', None)
+        # MAX(id) is a rowid lookup; a non-zero value means the aggregates are still catching up
+        stats['stats_pending'] = max(0, (conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0) - get_meta(admin, 'stats_last_id'))
+
+        stats['banned_pubkeys'] = len(ban_registry)
+        
+        # The WAL can hold a large part of the data between checkpoints, so it counts towards the size
+        stats['db_size'] = format_db_size(sum(storage_files().values())) if os.path.exists(DATABASE_PATH) else "N/A"
+    except Exception as e:
+        print(f"Error fetching stats: {e}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn: conn.close()
+        if admin: admin.close()
+    return jsonify(stats)
+
+TIMESERIES_WINDOWS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400, '30d': 30 * 86400}
+TIMESERIES_STEPS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '6h': 6 * 3600, '1d': 86400}
+
+@app.route('/api/stats/timeseries')
+@cached_response('timeseries', STATS_REFRESH_INTERVAL)
+@bounded_query
+def get_stats_timeseries():
+    window_name, step_name = request.args.get('window', '24h'), request.args.get('step', '1h')
+    window, step = TIMESERIES_WINDOWS.get(window_name), TIMESERIES_STEPS.get(step_name)
+    if not window or not step:
+        return jsonify({"error": f"window must be one of {list(TIMESERIES_WINDOWS)}, step one of {list(TIMESERIES_STEPS)}"}), 400
+    if step > window:
+        return jsonify({"error": "step must not be larger than window"}), 400
+    # Read the coarsest stored resolution that still lines up with the requested step
+    source = 3600 if step % 3600 == 0 else 60
+    if window > TIMELINE_RETENTION[source]:
+        return jsonify({"error": f"step {step_name} is too fine for window {window_name}"}), 400
+    kind = request.args.get('kind')
+
+    now = int(time.time())
+    end = now - now % step + step
+    start = end - window
+    admin = get_admin_db_connection()
+    try:
+        if kind not in (None, ''):
+            rows = admin.execute('''SELECT bucket - (bucket % ?) AS t, SUM(count) AS events, 0 AS new_authors FROM stats_timeline_kinds
+                                    WHERE step = ? AND kind = ? AND bucket >= ? AND bucket < ? GROUP BY t''', (step, source, int(kind), start, end))
+        else:
+            rows = admin.execute('''SELECT bucket - (bucket % ?) AS t, SUM(events) AS events, SUM(new_authors) AS new_authors FROM stats_timeline
+                                    WHERE step = ? AND bucket >= ? AND bucket < ? GROUP BY t''', (step, source, start, end))
+        buckets = {row['t']: row for row in rows.fetchall()}
+    except ValueError:
+        return jsonify({"error": "Invalid kind value"}), 400
+    except sqlite3.Error as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        admin.close()
+    points = [{"t": t, "events": buckets[t]['events'] if t in buckets else 0, "new_authors": buckets[t]['new_authors'] if t in buckets else 0}
+              for t in range(start, end, step)]
+    return jsonify({"window": window_name, "step": step_name, "start": start, "end": end, "points": points})
+
+@app.route('/api/suspects')
+@cached_response('suspects', SPAM_REFRESH_INTERVAL)
+@bounded_query
+def get_suspects():
+    window = request.args.get('window', '1h')
+    if window not in SPAM_WINDOWS:
+        return jsonify({"error": f"window must be one of {', '.join(SPAM_WINDOWS)}"}), 400
+    try:
+        limit = min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        suspects = spam_suspects(admin, SPAM_WINDOWS[window], limit, request.args.get('include_banned') == '1')
+        pending = max(0, (conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0) - get_meta(admin, 'spam_last_id'))
+        return jsonify({"window": window, "updated_at": get_meta(admin, 'spam_updated_at', None), "pending": pending, "suspects": suspects})
+    except sqlite3.Error as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+        admin.close()
+
+@app.route('/api/storage', methods=['GET', 'POST'])
+@cached_response('storage', 30)
+def handle_storage_report():
+    if request.method == 'POST':
+        return jsonify({"status": "queued", "job_id": queue_storage_report(force=True)}), 202
+    admin = get_admin_db_connection()
+    try:
+        row = admin.execute('SELECT report FROM storage_reports ORDER BY id DESC LIMIT 1').fetchone()
+        job = admin.execute("SELECT id FROM jobs WHERE type = 'storage-report' AND status IN ('queued', 'running')").fetchone()
+    finally:
+        admin.close()
+    report = json.loads(row[0]) if row else None
+    if report:
+        # Current file sizes are cheap, the rest is as of the report
+        report["files_now"] = storage_files()
+    return jsonify({"report": report, "job_id": job[0] if job else None})
+
+@app.route('/api/retention')
+def get_retention():
+    admin = get_admin_db_connection()
+    try:
+        start, end = retention_quiet_hours(admin)
+        rules = [retention_rule_to_dict(row) for row in admin.execute('SELECT * FROM retention_rules ORDER BY id')]
+        history = [dict(row) for row in admin.execute('SELECT * FROM retention_history ORDER BY id DESC LIMIT 50')]
+        job = admin.execute("SELECT id FROM jobs WHERE type = 'retention' AND status IN ('queued', 'running')").fetchone()
+    finally:
+        admin.close()
+    return jsonify({"rules": rules, "quiet_hours": {"start": start, "end": end, "active": in_quiet_hours(start, end)},
+                    "history": history, "job_id": job[0] if job else None})
+
+@app.route('/api/retention/rules', methods=['POST'])
+def create_retention_rule():
+    try:
+        kind, max_age_days, author_cap = parse_retention_rule(request.get_json() or {})
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid rule: {e}"}), 400
+    admin = get_admin_db_connection()
+    try:
+        rule_id = admin.execute('INSERT INTO retention_rules (kind, max_age_days, author_cap, created_at) VALUES (?, ?, ?, ?)',
+                                (kind, max_age_days, author_cap, int(time.time()))).lastrowid
+        admin.commit()
+        return jsonify(retention_rule_to_dict(admin.execute('SELECT * FROM retention_rules WHERE id = ?', (rule_id,)).fetchone())), 201
+    finally:
+        admin.close()
+
+@app.route('/api/retention/rules/<int:rule_id>', methods=['PATCH', 'DELETE'])
+def handle_retention_rule(rule_id):
+    admin = get_admin_db_connection()
+    try:
+        if request.method == 'DELETE':
+            changed = admin.execute('DELETE FROM retention_rules WHERE id = ?', (rule_id,)).rowcount
+        else:
+            changed = admin.execute('UPDATE retention_rules SET enabled = ? WHERE id = ?', (1 if (request.get_json() or {}).get('enabled') else 0, rule_id)).rowcount
+        admin.commit()
+    finally:
+        admin.close()
+    if not changed:
+        return jsonify({"status": "error", "message": "Rule not found."}), 404
+    return jsonify({"status": "success"})
+
+@app.route('/api/retention/estimate')
+@bounded_query
+def estimate_retention():
+    """Dry run of every rule (enabled or not): the number of events it would delete now."""
+    conn, admin = get_db_connection(), get_admin_db_connection()
+    try:
+        now = int(time.time())
+        rules = [dict(row) for row in admin.execute('SELECT * FROM retention_rules ORDER BY id')]
+        return jsonify({str(rule['id']): retention_estimate(conn, admin, rule, now) for rule in rules})
+    except sqlite3.Error as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+        admin.close()
+
+@app.route('/api/retention/run', methods=['POST'])
+def run_retention_now():
+    """Queues a retention run now; outside the quiet hours only with force."""
+    force = bool((request.get_json(silent=True) or {}).get('force'))
+    return jsonify({"status": "queued", "job_id": create_job('retention', {"force": force})}), 202
+
+@app.route('/api/retention/quiet-hours', methods=['PUT'])
+def set_retention_quiet_hours():
+    data = request.get_json() or {}
+    try:
+        start, end = int(data['start']), int(data['end'])
+        if not (0 <= start <= 23 and 0 <= end <= 23):
+            raise ValueError("hours must be between 0 and 23")
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid quiet hours: {e}"}), 400
+    admin = get_admin_db_connection()
+    try:
+        set_meta(admin, 'retention_quiet_start', start)
+        set_meta(admin, 'retention_quiet_end', end)
+        admin.commit()
+    finally:
+        admin.close()
+    return jsonify({"status": "success", "start": start, "end": end, "active": in_quiet_hours(start, end)})
+
+@app.route('/api/maintenance', methods=['GET', 'POST'])
+def handle_maintenance():
+    if request.method == 'GET':
+        return jsonify(maintenance_status())
+    data = request.get_json(silent=True) or {}
+    task = data.get('task')
+    if task not in MAINTENANCE_TASKS:
+        return jsonify({"error": f"Unknown task, expected one of {', '.join(MAINTENANCE_TASKS)}"}), 400
+    params = {"task": task}
+    if task == 'checkpoint':
+        params['mode'] = str(data.get('mode', 'TRUNCATE')).upper()
+        if params['mode'] not in CHECKPOINT_MODES:
+            return jsonify({"error": f"Invalid checkpoint mode, expected one of {', '.join(CHECKPOINT_MODES)}"}), 400
+    elif task == 'analyze':
+        try:
+            params['limit'] = max(0, int(data.get('limit', MAINTENANCE_ANALYSIS_LIMIT)))
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid limit value"}), 400
+    elif task == 'vacuum_into':
+        # Reads the whole database and needs as much free disk space again
+        if data.get('confirm') is not True:
+            return jsonify({"error": "VACUUM INTO writes a full copy of the database, repeat the request with \"confirm\": true"}), 400
+        params['incremental'] = bool(data.get('incremental'))
+    load_error = maintenance_load_error()
+    if load_error:
+        return jsonify({"error": load_error}), 409
+    return jsonify({"status": "queued", "job_id": create_job('maintenance', params)}), 202
+
+@app.route('/api/events/batch-delete', methods=['POST'])
+def batch_delete_events():
+    data = request.get_json()
+    age_days = data.get('age_days')
+    kind = data.get('kind')
+    params = {}
+    if age_days:
+        try:
+            params['before_ts'] = int((datetime.now() - timedelta(days=int(age_days))).timestamp())
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid age_days value"}), 400
+    if kind != None and kind != '':
+        try:
+            params['kind'] = int(kind)
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid kind value"}), 400
+    if not params:
+        return jsonify({"error": "No delete criteria specified"}), 400
+
+    # Only rows that exist now are targeted; MIN/MAX(id) are rowid lookups
+    conn = get_db_connection()
+    try:
+        min_id, max_id = conn.execute('SELECT MIN(id), MAX(id) FROM event').fetchone()
+    finally:
+        conn.close()
+    job_id = create_job('batch-delete', params, (min_id or 1) - 1, max_id or 0)
+    return jsonify({"status": "queued", "job_id": job_id}), 202
+
+@app.route('/api/events')
+@bounded_query
+def get_events():
+    query = request.args.get('q', '')
+    try:
+        limit = min(int(request.args.get('limit', 100)), MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+        before = parse_cursor(request.args['before']) if request.args.get('before') else None
+        after = parse_cursor(request.args['after']) if request.args.get('after') else None
+        filters = parse_event_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    conn = get_db_connection()
+    admin, index_lag, next_cursor, next_offset = None, None, None, None
+    try:
+        branches, plan = plan_event_search(query) if query.strip() else ([('1', ())], 'recent')
+        if plan == 'content-scan' and fts_ready and not filters:
+            # Free text goes to the full-text index: ranked, so it pages by offset instead of cursor
+            plan, admin = 'fulltext', get_admin_db_connection()
+            events = fts_search(conn, admin, query, limit, offset)
+            index_lag = fts_lag(conn, admin)
+            if len(events) == limit:
+                next_offset = offset + limit
+        else:
+            events = fetch_events(conn, branches, limit, filters, before, after)
+            if events and (len(events) == limit or after):
+                next_cursor = format_cursor(events[-1])
+    except sqlite3.Error as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if conn: conn.close()
+        if admin: admin.close()
+    response = jsonify(events)
+    response.headers['X-Search-Plan'] = plan
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if events and plan != 'fulltext':
+        response.headers['X-Prev-Cursor'] = format_cursor(events[0])
+    if next_offset is not None:
+        response.headers['X-Next-Offset'] = str(next_offset)
+    if index_lag is not None:
+        response.headers['X-Index-Lag'] = str(index_lag)
+    return response
+
+@app.route('/api/events/export')
+def export_events_ndjson():
+    """kind/author/since/until as for /api/events, plus limit and gzip=1. The search term q is not supported."""
+    try:
+        filters = parse_event_filters(request.args)
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    filename = f"events-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson"
+    body, mimetype = export_events(filters, limit), 'application/x-ndjson'
+    if request.args.get('gzip') == '1':
+        body, mimetype, filename = gzip_stream(body), 'application/gzip', filename + '.gz'
+    response = Response(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/events/import', methods=['POST'])
+def import_events_upload():
+    """NDJSON events (gzipped or not) as multipart field 'file' or as the request body; verify_signatures=1
+    also checks signatures. Small uploads are imported right away, larger ones by a background job."""
+    verify = str(request.values.get('verify_signatures', '')).lower() in ('1', 'true')
+    if verify and coincurve is None:
+        return jsonify({"status": "error", "message": "Signature checks need `pip install coincurve` on the server."}), 400
+    try:
+        path = save_import_upload(request.files['file'].stream if 'file' in request.files else request.stream)
+    except (OSError, EOFError, zlib.error) as e:
+        return jsonify({"status": "error", "message": f"Could not read the upload: {e}"}), 400
+    size = os.path.getsize(path)
+    if size == 0:
+        os.remove(path)
+        return jsonify({"status": "error", "message": "The upload is empty."}), 400
+    if size > IMPORT_SYNC_BYTES:
+        return jsonify({"status": "queued", "job_id": create_job('import', {"path": path, "verify_signatures": verify}, 0, size)}), 202
+    try:
+        with open(path, 'rb') as stream:
+            totals, _ = import_events(stream, verify, workers=1)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Import failed: {e}"}), 500
     finally:
-        if conn: conn.close()
-    return jsonify(events)
+        os.remove(path)
+    return jsonify({"status": "success", "result": totals})
 
 @app.route('/api/events/<int:event_db_id>', methods=['DELETE'])
 def delete_event(event_db_id):
     conn = get_db_connection_rw()
+    admin = get_admin_db_connection()
     try:
-        conn.execute('DELETE FROM event WHERE id = ?', (event_db_id,))
-        conn.commit()
+        delete_event_rows(conn, admin, [event_db_id])
     finally:
         conn.close()
+        admin.close()
     return jsonify({"status": "success"})
 
-@app.route('/api/banned', methods=['GET', 'POST'])
-def handle_banned_users():
-    if request.method == 'POST':
-        pubkey = request.json.get('pubkey')
-        if not (pubkey and len(pubkey) == 64):
-            return jsonify({"status": "error", "message": "Invalid pubkey."}), 400
+@app.route('/api/stream')
+def get_stream():
+    if stream_mode() == 'browser':
+        return jsonify({"error": "The live stream runs in browser mode (LIVE_STREAM_MODE)"}), 404
+    try:
+        since_ts = int(request.args.get('since', int(time.time())))
+        kinds = {int(k) for k in request.args['kind'].split(',')} if request.args.get('kind') else None
+        author = parse_pubkey(request.args['author']).hex() if request.args.get('author') else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+    ensure_stream_source()
+    response = Response(stream_with_context(stream_client(since_ts, stream_filter(kinds, author))), mimetype='text/event-stream')
+    # Keep reverse proxies from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-        # Step 1: Update the relay's config.toml file
-        try:
-            with open(CONFIG_PATH, 'r') as f:
-                config_data = toml.load(f)
-
-            if 'verification' not in config_data:
-                config_data['verification'] = {}
-            if 'pubkey_blacklist' not in config_data['verification']:
-                config_data['verification']['pubkey_blacklist'] = []
-            
-            if pubkey not in config_data['verification']['pubkey_blacklist']:
-                config_data['verification']['pubkey_blacklist'].append(pubkey)
-                with open(CONFIG_PATH, 'w') as f:
-                    toml.dump(config_data, f)
-        except Exception as e:
-            return jsonify({"status": "error", "message": f"Error updating config.toml: {e}"}), 500
+@app.route('/api/stream/status')
+def get_stream_status():
+    with stream_condition:
+        return jsonify({"mode": stream_mode(), "connected": stream_state["connected"], "clients": stream_state["clients"], "buffered": len(stream_buffer)})
 
-        # Step 2: Update the admin panel's own DB for the UI
-        conn_rw = get_db_connection_rw()
-        try:
-            conn_rw.execute('INSERT OR IGNORE INTO banned_pubkeys (pubkey) VALUES (?)', (pubkey,))
-            conn_rw.commit()
-            return jsonify({"status": "success", "message": f"Pubkey {pubkey[:8]}... banned. Relay restart required."})
-        except sqlite3.Error as e:
-            return jsonify({"status": "error", "message": f"Error updating UI DB: {str(e)}"}), 500
-        finally:
-            conn_rw.close()
-    
-    # GET Request: Return list of banned users from our local DB
+@app.route('/api/pool')
+def get_pool_metrics():
+    return jsonify({**pool_metrics(), "query": query_pool_stats()})
+
+def top_kind_samples(rows, labels=None):
+    """(kind, count) rows, largest first, as samples: the top METRICS_TOP_KINDS plus one kind="other"."""
+    rows = sorted(rows, key=lambda row: row[1], reverse=True)
+    samples = [({**(labels or {}), "kind": kind}, count) for kind, count in rows[:METRICS_TOP_KINDS]]
+    if len(rows) > METRICS_TOP_KINDS:
+        samples.append(({**(labels or {}), "kind": "other"}, sum(count for _, count in rows[METRICS_TOP_KINDS:])))
+    return samples
+
+def collect_metrics():
     conn = get_db_connection()
+    admin = get_admin_db_connection()
     try:
-        cursor = conn.execute('SELECT pubkey FROM banned_pubkeys ORDER BY banned_at DESC')
-        return jsonify([row['pubkey'] for row in cursor.fetchall()])
-    except sqlite3.Error as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        max_id = conn.execute('SELECT MAX(id) FROM event').fetchone()[0] or 0
+        kinds = admin.execute('SELECT kind, count FROM stats_kinds').fetchall()
+        recent = admin.execute('SELECT kind, SUM(count) FROM stats_timeline_kinds WHERE step = 60 AND bucket > ? GROUP BY kind',
+                               (int(time.time()) - 3600 - 60,)).fetchall()
+        jobs = admin.execute('SELECT type, status, COUNT(*) FROM jobs GROUP BY type, status').fetchall()
+        total_events, authors = get_meta(admin, 'stats_total_events'), get_meta(admin, 'stats_distinct_authors')
+        stats_last_id, stats_updated_at = get_meta(admin, 'stats_last_id'), get_meta(admin, 'stats_updated_at')
     finally:
         conn.close()
+        admin.close()
+    files = [({"db": "relay", "file": name}, size) for name, size in storage_files().items()]
+    files += [({"db": "admin", "file": name}, os.path.getsize(ADMIN_DATABASE_PATH + suffix))
+              for name, suffix in (('db', ''), ('wal', '-wal')) if os.path.exists(ADMIN_DATABASE_PATH + suffix)]
+    pools = pool_metrics()
+    query = query_pool_stats()
+    cache = response_cache.stats()
+    bans = ban_registry.status()
+    with stream_condition:
+        stream = {**stream_state, "buffered": len(stream_buffer)}
+    with admission_lock:
+        admission = dict(admission_state)
+
+    lines = []
+    lines += metric_family('nostr_relay_events', 'gauge', 'Events stored by the relay (incremental statistics).', [({}, total_events)])
+    lines += metric_family('nostr_relay_events_by_kind', 'gauge', 'Events stored by the relay per kind.', top_kind_samples(kinds))
+    lines += metric_family('nostr_relay_events_last_hour', 'gauge', 'Events created in the last hour per kind.', top_kind_samples(recent))
+    lines += metric_family('nostr_relay_authors', 'gauge', 'Distinct authors with stored events.', [({}, authors)])
+    lines += metric_family('nostr_relay_event_rows_total', 'counter', 'Highest event row id; its rate is the relay\'s insert rate.', [({}, max_id)])
+    lines += metric_family('panel_stats_lag_events', 'gauge', 'Event rows the incremental statistics have not processed yet.', [({}, max(0, max_id - stats_last_id))])
+    lines += metric_family('panel_stats_updated_timestamp_seconds', 'gauge', 'When the statistics were last advanced.', [({}, stats_updated_at)])
+    lines += metric_family('sqlite_file_bytes', 'gauge', 'Size of the database files, WAL included.', files)
+    lines += metric_family('nostr_relay_banned_pubkeys', 'gauge', 'Pubkeys on the ban list.', [({}, bans["banned"])])
+    lines += metric_family('panel_ban_pending_changes', 'gauge', 'Bans and unbans not yet written to config.toml.', [({}, bans["pending"])])
+    lines += metric_family('panel_ban_flushes_total', 'counter', 'Writes of the ban list to config.toml.', [({}, bans["flushes"])])
+    lines += metric_family('panel_admission_requests_total', 'counter', 'Event admission requests answered for the relay.',
+                           [({"result": "checked"}, admission["checked"]), ({"result": "denied"}, admission["denied"]), ({"result": "error"}, admission["errors"])])
+    lines += metric_family('panel_db_pool_checkouts_total', 'counter', 'Connections handed out per pool.', [({"pool": name}, s["checkouts"]) for name, s in pools.items()])
+    lines += metric_family('panel_db_pool_connections_created_total', 'counter', 'Connections opened per pool.', [({"pool": name}, s["created"]) for name, s in pools.items()])
+    lines += metric_family('panel_db_pool_in_use', 'gauge', 'Connections currently checked out per pool.', [({"pool": name}, s["in_use"]) for name, s in pools.items()])
+    lines += metric_family('panel_db_pool_idle', 'gauge', 'Idle connections per pool.', [({"pool": name}, s["idle"]) for name, s in pools.items()])
+    lines += metric_family('panel_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for the exclusive writer connection.',
+                           [({"pool": name}, float(s["wait_seconds_total"])) for name, s in pools.items()])
+    lines += metric_family('panel_query_pool_queued', 'gauge', 'Bounded queries waiting for a query thread.', [({}, query["queued"])])
+    lines += metric_family('panel_query_pool_running', 'gauge', 'Bounded queries running.', [({}, query["running"])])
+    lines += metric_family('panel_query_pool_completed_total', 'counter', 'Bounded queries finished.', [({}, query["completed"])])
+    lines += metric_family('panel_query_timeouts_total', 'counter', 'Requests answered with 504 after QUERY_TIMEOUT.', [({}, query["timeouts"])])
+    lines += metric_family('panel_response_cache_requests_total', 'counter', 'Cached endpoint requests by outcome.',
+                           [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"]), ({"result": "not_modified"}, cache["not_modified"])])
+    lines += metric_family('panel_response_cache_invalidations_total', 'counter', 'Cache invalidations.', [({}, cache["invalidations"])])
+    lines += metric_family('panel_response_cache_entries', 'gauge', 'Responses held in the cache.', [({}, cache["entries"])])
+    lines += metric_family('panel_jobs', 'gauge', 'Background jobs per type and status.', [({"type": t, "status": s}, n) for t, s, n in jobs])
+    lines += metric_family('panel_stream_clients', 'gauge', 'Browsers connected to the live stream.', [({}, stream["clients"])])
+    lines += metric_family('panel_stream_source_connected', 'gauge', 'Whether the live stream source is connected (1) or not (0).', [({}, int(bool(stream["connected"])))])
+    lines += metric_family('panel_stream_buffered_events', 'gauge', 'Events in the live stream buffer.', [({}, stream["buffered"])])
+    lines += metric_family('panel_stream_events_total', 'counter', 'Events published to the live stream.', [({}, stream["seq"])])
+    lines += request_latency.render()
+    lines += query_latency.render()
+    return '\n'.join(lines) + '\n'
+
+@app.route('/api/performance', methods=['GET', 'DELETE'])
+def handle_performance():
+    if request.method == 'DELETE':
+        profile_reset()
+        return jsonify({"status": "success"})
+    limit = max(1, min(request.args.get('limit', 50, type=int), PROFILE_MAX_STATEMENTS))
+    return jsonify(profile_report(request.args.get('order', 'total'), limit))
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(collect_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/jobs')
+def list_jobs():
+    admin = get_admin_db_connection()
+    try:
+        # Clamped below too: SQLite reads a negative LIMIT as no limit
+        limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+        rows = admin.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return jsonify([job_to_dict(row) for row in rows])
+    finally:
+        admin.close()
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET', 'DELETE'])
+def handle_job(job_id):
+    admin = get_admin_db_connection()
+    try:
+        if request.method == 'DELETE':
+            # The worker notices the status change at its next checkpoint
+            admin.execute("UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status IN ('queued', 'running')", (int(time.time()), job_id))
+            admin.commit()
+        row = admin.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return jsonify({"status": "error", "message": "Job not found."}), 404
+        return jsonify(job_to_dict(row))
+    finally:
+        admin.close()
+
+@app.route('/api/jobs/<int:job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Queues a failed job again; it resumes from its last checkpoint."""
+    admin = get_admin_db_connection()
+    try:
+        row = admin.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return jsonify({"status": "error", "message": "Job not found."}), 404
+        if row['status'] != 'failed':
+            return jsonify({"status": "error", "message": "Only failed jobs can be retried."}), 409
+        if row['type'] == 'import' and not os.path.exists(json.loads(row['params'])['path']):
+            return jsonify({"status": "error", "message": "The upload of this import has been removed, upload the file again."}), 409
+        admin.execute("UPDATE jobs SET status = 'queued', error = NULL, finished_at = NULL, updated_at = ? WHERE id = ? AND status = 'failed'",
+                      (int(time.time()), job_id))
+        admin.commit()
+        row = admin.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        admin.close()
+    job_wakeup.set()
+    return jsonify(job_to_dict(row))
+
+@app.route('/api/banned', methods=['GET', 'POST'])
+@cached_response('banned', 300)
+def handle_banned_users():
+    try:
+        if request.method == 'POST':
+            try:
+                pubkey = parse_pubkey(request.json.get('pubkey') or '').hex()
+            except ValueError:
+                return jsonify({"status": "error", "message": "Invalid pubkey."}), 400
+            # Written to config.toml and banned_pubkeys by the next flush (see BanRegistry)
+            ban_registry.ban([pubkey])
+            response = {"status": "success", "message": f"Pubkey {pubkey[:8]}... banned. " + ("Active immediately." if admission_state["server"] else "Relay restart required.")}
+            if request.json.get('purge'):
+                response['purge_job_id'] = create_purge_job([pubkey])
+            return jsonify(response)
+
+        return jsonify(ban_registry.listing())
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error loading ban list: {e}"}), 500
 
 
 @app.route('/api/banned/<pubkey>', methods=['DELETE'])
 def unban_user(pubkey):
-    # Step 1: Update the relay's config.toml file
     try:
-        with open(CONFIG_PATH, 'r') as f:
-            config_data = toml.load(f)
+        ban_registry.unban([pubkey.lower()])
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error loading ban list: {e}"}), 500
+    return jsonify({"status": "success"})
 
-        if 'verification' in config_data and 'pubkey_blacklist' in config_data.get('verification', {}):
-            if pubkey in config_data['verification'].get('pubkey_blacklist', []):
-                config_data['verification']['pubkey_blacklist'].remove(pubkey)
-                # For cleanliness, remove the list if it's now empty
-                if not config_data['verification']['pubkey_blacklist']:
-                    del config_data['verification']['pubkey_blacklist']
-                
-                with open(CONFIG_PATH, 'w') as f:
-                    toml.dump(config_data, f)
+@app.route('/api/banned/bulk', methods=['POST'])
+@bounded_query
+def bulk_ban():
+    """Accepts {"pubkeys": [...]} or {"search": {...}} as JSON, a newline-separated
+    text body, or a multipart upload in field 'file'. action=ban|unban."""
+    payload = request.get_json(silent=True) if request.is_json else None
+    if payload is not None and not isinstance(payload, dict):
+        return jsonify({"status": "error", "message": "The JSON body must be an object."}), 400
+    if payload is not None:
+        action = payload.get('action', 'ban')
+    else:
+        action = request.values.get('action', 'ban')
+    if action not in ('ban', 'unban'):
+        return jsonify({"status": "error", "message": "action must be 'ban' or 'unban'."}), 400
+
+    try:
+        if payload is not None and payload.get('search') is not None:
+            search = payload['search']
+            # The same parameters as /api/events, which arrive there as strings
+            if not isinstance(search, dict) or not all(isinstance(value, (str, int)) and not isinstance(value, bool) for value in search.values()):
+                return jsonify({"status": "error", "message": "search must be an object of string or number values."}), 400
+            entries = search_authors({key: str(value) for key, value in search.items()})
+            if payload.get('dry_run'):
+                return jsonify({"status": "success", "pubkeys": entries, "limit_reached": len(entries) >= BULK_SEARCH_MAX_AUTHORS})
+        elif payload is not None:
+            entries = payload.get('pubkeys')
+            if not isinstance(entries, list):
+                return jsonify({"status": "error", "message": "pubkeys must be a list."}), 400
+        elif 'file' in request.files:
+            entries = split_pubkey_list(request.files['file'].read().decode('utf-8', errors='replace'))
+        else:
+            entries = split_pubkey_list(request.get_data(as_text=True))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid search parameter: {e}"}), 400
+    except sqlite3.Error as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    if not entries:
+        return jsonify({"status": "error", "message": "No pubkeys given."}), 400
+
+    purge = action == 'ban' and str(payload.get('purge') if payload is not None else request.values.get('purge', '')).lower() in ('1', 'true')
+    if len(entries) > BULK_BAN_SYNC_LIMIT:
+        job_id = create_job('bulk-ban', {"action": action, "pubkeys": entries, "purge": purge}, 0, len(entries))
+        return jsonify({"status": "queued", "job_id": job_id}), 202
+    try:
+        results, summary = apply_bulk_bans(entries, action)
     except Exception as e:
-        return jsonify({"status": "error", "message": f"Error updating config.toml: {e}"}), 500
-    
-    # Step 2: Update the admin panel's own DB for the UI
-    conn = get_db_connection_rw()
+        return jsonify({"status": "error", "message": f"Error updating the ban list: {e}"}), 500
+    response = {"status": "success", "summary": summary, "results": results}
+    if purge:
+        response['purge_job_id'] = create_purge_job([r['pubkey'] for r in results if r['status'] in ('banned', 'already_banned')])
+    return jsonify(response)
+
+@app.route('/api/banned/purge', methods=['POST'])
+def purge_banned():
+    """Deletes the stored events of banned authors: the given pubkeys, or the whole ban list."""
+    payload = request.get_json(silent=True) or {}
     try:
-        conn.execute('DELETE FROM banned_pubkeys WHERE pubkey = ?', (pubkey,))
-        conn.commit()
-    finally:
-        conn.close()
-    return jsonify({"status": "success"})
+        pubkeys = valid_pubkeys(payload['pubkeys']) if payload.get('pubkeys') else ban_registry.listing()
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error loading ban list: {e}"}), 500
+    pubkeys = [pk for pk in pubkeys if pk in ban_registry]
+    if not pubkeys:
+        return jsonify({"status": "error", "message": "No banned pubkeys to purge."}), 400
+    return jsonify({"status": "queued", "job_id": create_purge_job(pubkeys)}), 202
+
+@app.route('/api/banned/status')
+def get_ban_status():
+    with admission_lock:
+        admission = {key: value for key, value in admission_state.items() if key != 'server'}
+    admission.update(enabled=admission_enabled(), running=admission_state["server"] is not None, address=ADMISSION_GRPC_ADDRESS)
+    return jsonify({**ban_registry.status(), "admission": admission})
+
+def config_mtime():
+    try:
+        return os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError:
+        return None
 
 @app.route('/api/config', methods=['GET', 'POST'])
+@cached_response('config', 300, vary=config_mtime)
 def handle_config():
     try:
         if request.method == 'POST':
-            with open(CONFIG_PATH, 'w') as f:
-                f.write(request.json.get('content', ''))
+            content = (request.get_json(silent=True) or {}).get('content', '')
+            # A file the relay (and load() below) cannot parse is never written
+            try:
+                toml.loads(content)
+            except toml.TomlDecodeError as e:
+                return jsonify({"status": "error", "message": f"Invalid TOML: {e}"}), 400
+            ban_registry.replace_config(content)
             return jsonify({"status": "success"})
         else:
+            # Pending bans reach the file through the flush worker; a read does not force them out
             with open(CONFIG_PATH, 'r') as f:
                 return jsonify({"content": f.read()})
     except Exception as e:
@@ -258,7 +3919,8 @@ def handle_config():
 
 @app.route("/")
 def index():
-    return render_template_string(HTML_TEMPLATE, relay_websocket_url=RELAY_WEBSOCKET_URL)
+    return render_template_string(HTML_TEMPLATE, relay_websocket_url=RELAY_WEBSOCKET_URL, stream_mode=stream_mode(),
+                                  bans_live='true' if admission_state["server"] is not None else 'false')
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -316,6 +3978,9 @@ HTML_TEMPLATE = """
         .stat-card .value { font-size: 2rem; font-weight: bold; color: var(--primary); }
         .stat-card .label { font-size: 0.9rem; color: var(--secondary); margin-top: 0.5rem; }
         .dashboard-section { margin-top: 2.5rem; }
+        .activity-header { display: flex; flex-wrap: wrap; justify-content: space-between; align-items: center; gap: 1rem; }
+        #activity-sparkline { width: 100%; height: 80px; background: var(--card-bg); border-radius: 8px; box-shadow: 0 2px 4px var(--shadow); }
+        #activity-summary { font-size: 0.9rem; color: var(--secondary); margin-top: 0.5rem; }
         
         table { width: 100%; border-collapse: collapse; margin-top: 1rem; table-layout: fixed; }
         th, td { padding: 12px; text-align: left; border-bottom: 1px solid var(--border); word-break: break-word; vertical-align: top; }
@@ -339,7 +4004,7 @@ HTML_TEMPLATE = """
         .form-control { min-height: auto; }
         .batch-delete-card, .stream-controls { background: var(--card-bg); padding: 1.5rem; border: 1px solid var(--border); border-radius: 8px; margin-bottom: 2rem; box-shadow: 0 2px 4px var(--shadow); }
         .controls-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 1rem; align-items: flex-end; }
-        .stream-filter-btn.active { background-color: var(--primary); color: var(--card-bg); border-color: var(--primary); }
+        .stream-filter-btn.active, .timeline-window-btn.active, .suspects-window-btn.active { background-color: var(--primary); color: var(--card-bg); border-color: var(--primary); }
         .stream-controls .controls-grid { align-items: center; }
         
         footer { padding: 1rem; text-align: center; border-top: 1px solid var(--border); margin-top: 2rem; font-size: 0.9em; color: var(--secondary); }
@@ -374,8 +4039,10 @@ HTML_TEMPLATE = """
             <button class="tab-button active" data-tab="dashboard" data-i18n="tabDashboard"></button>
             <button class="tab-button" data-tab="events" data-i18n="tabEvents"></button>
             <button class="tab-button" data-tab="stream" data-i18n="tabStream"></button>
+            <button class="tab-button" data-tab="suspects" data-i18n="tabSuspects"></button>
             <button class="tab-button" data-tab="banned" data-i18n="tabBanned"></button>
             <button class="tab-button" data-tab="config" data-i18n="tabConfig"></button>
+            <button class="tab-button" data-tab="performance" data-i18n="tabPerformance"></button>
         </nav>
         
          <div id="dashboard-content" class="tab-content active">
@@ -390,10 +4057,48 @@ HTML_TEMPLATE = """
                 <div class="stat-card"><div id="stats-db-size" class="value">...</div><div class="label" data-i18n="statDbSize"></div></div>
                 <div class="stat-card"><div id="stats-oldest-event" class="value">...</div><div class="label" data-i18n="statOldestEvent"></div></div>
             </div>
+            <div class="dashboard-section">
+                <div class="activity-header">
+                    <h3 data-i18n="titleActivity"></h3>
+                    <div>
+                        <button class="timeline-window-btn" data-window="1h">1h</button>
+                        <button class="timeline-window-btn active" data-window="24h">24h</button>
+                        <button class="timeline-window-btn" data-window="7d">7d</button>
+                        <button class="timeline-window-btn" data-window="30d">30d</button>
+                    </div>
+                </div>
+                <svg id="activity-sparkline" viewBox="0 0 600 80" preserveAspectRatio="none"></svg>
+                <div id="activity-summary"></div>
+            </div>
             <div class="stats-grid dashboard-section" style="grid-template-columns: 1fr 1fr; gap: 2rem;">
                 <div><h3 data-i18n="titleTopKinds"></h3><table id="top-kinds-table"></table></div>
                 <div><h3 data-i18n="titleTopUsers"></h3><table id="top-users-table"></table></div>
             </div>
+            <div class="dashboard-section">
+                <div class="activity-header">
+                    <h3 data-i18n="titleStorage"></h3>
+                    <div><button id="storage-refresh-btn" class="secondary" data-i18n="storageRefresh"></button></div>
+                </div>
+                <div id="storage-summary" style="margin-bottom: 1rem;"></div>
+                <div class="stats-grid" style="grid-template-columns: 1fr 1fr; gap: 2rem;">
+                    <div><h4 data-i18n="storageByKind"></h4><table id="storage-kinds-table"></table></div>
+                    <div><h4 data-i18n="storageByAuthor"></h4><table id="storage-authors-table"></table></div>
+                </div>
+                <h4 data-i18n="storageObjects"></h4><table id="storage-objects-table"></table>
+            </div>
+            <div class="dashboard-section">
+                <h3 data-i18n="maintenanceTitle"></h3>
+                <div id="maintenance-summary" style="margin-bottom: 1rem;"></div>
+                <div class="controls-grid">
+                    <button class="secondary maintenance-btn" data-task="incremental_vacuum" data-i18n="maintenanceIncrementalVacuum"></button>
+                    <button class="secondary maintenance-btn" data-task="analyze" data-i18n="maintenanceAnalyze"></button>
+                    <button class="secondary maintenance-btn" data-task="optimize" data-i18n="maintenanceOptimize"></button>
+                    <button class="secondary maintenance-btn" data-task="checkpoint" data-i18n="maintenanceCheckpoint"></button>
+                    <button class="danger maintenance-btn" data-task="vacuum_into" data-i18n="maintenanceVacuumInto"></button>
+                    <label><input type="checkbox" id="maintenance-incremental"> <span data-i18n="maintenanceIncrementalOption"></span></label>
+                </div>
+                <div id="maintenance-status" style="margin-top: 1rem; font-size: 0.9em;"></div>
+            </div>
         </div>
         
         <div id="events-content" class="tab-content">
@@ -413,8 +4118,48 @@ HTML_TEMPLATE = """
                     </div>
                     <button id="batch-delete-btn" class="danger" data-i18n="deleteAction"></button>
                 </div>
+                <div id="batch-delete-status" style="margin-top: 1rem; font-size: 0.9em;"></div>
             </div>
-             <input type="text" id="event-search" data-i18n-placeholder="eventSearchPlaceholder" style="margin-bottom: 1rem; width: 100%; box-sizing: border-box; padding: 10px;">
+            <div class="batch-delete-card">
+                <h3 data-i18n="retentionTitle"></h3>
+                <table id="retention-rules-table"></table>
+                <div class="controls-grid" style="margin-top: 1rem;">
+                    <input type="number" id="retention-kind" class="form-control" min="0" data-i18n-placeholder="retentionKindPlaceholder">
+                    <input type="number" id="retention-age" class="form-control" min="1" data-i18n-placeholder="retentionAgePlaceholder">
+                    <input type="number" id="retention-cap" class="form-control" min="1" data-i18n-placeholder="retentionCapPlaceholder">
+                    <button id="retention-add-btn" data-i18n="retentionAdd"></button>
+                </div>
+                <div class="controls-grid" style="margin-top: 1rem;">
+                    <label><span data-i18n="retentionQuietHours"></span>
+                        <input type="number" id="retention-quiet-start" min="0" max="23" style="width: 4em;"> –
+                        <input type="number" id="retention-quiet-end" min="0" max="23" style="width: 4em;"></label>
+                    <button id="retention-quiet-btn" class="secondary" data-i18n="retentionSave"></button>
+                    <button id="retention-estimate-btn" class="secondary" data-i18n="retentionEstimate"></button>
+                    <button id="retention-run-btn" class="danger" data-i18n="retentionRunNow"></button>
+                </div>
+                <div id="retention-status" style="margin-top: 1rem; font-size: 0.9em;"></div>
+                <details style="margin-top: 1rem;"><summary data-i18n="retentionHistory"></summary><table id="retention-history-table"></table></details>
+            </div>
+            <div class="batch-delete-card">
+                <h3 data-i18n="importTitle"></h3>
+                <div class="controls-grid">
+                    <input type="file" id="import-file" accept=".jsonl,.ndjson,.json,.gz,application/gzip,application/x-ndjson">
+                    <label><input type="checkbox" id="import-verify"> <span data-i18n="importVerify"></span></label>
+                    <button id="import-btn" data-i18n="importAction"></button>
+                </div>
+                <div id="import-status" style="margin-top: 1rem; font-size: 0.9em;"></div>
+            </div>
+             <input type="text" id="event-search" data-i18n-placeholder="eventSearchPlaceholder" style="margin-bottom: 0.5rem; width: 100%; box-sizing: border-box; padding: 10px;">
+            <div id="search-status" style="font-size: 0.85em; color: var(--secondary); min-height: 1.2em; margin-bottom: 0.5rem;"></div>
+            <div class="controls-grid" style="margin-bottom: 0.5rem;">
+                <input type="text" id="event-filter-kind" class="form-control event-filter" data-i18n-placeholder="filterKindPlaceholder">
+                <input type="text" id="event-filter-author" class="form-control event-filter" data-i18n-placeholder="filterAuthorPlaceholder">
+                <input type="date" id="event-filter-since" class="form-control event-filter" data-i18n-title="filterSince">
+                <input type="date" id="event-filter-until" class="form-control event-filter" data-i18n-title="filterUntil">
+                <button id="ban-search-authors-btn" class="danger" data-i18n="banSearchAuthors"></button>
+                <button id="event-export-btn" class="secondary" data-i18n="exportAction" data-i18n-title="exportHint"></button>
+            </div>
+            <div id="ban-search-status" style="font-size: 0.9em; margin-bottom: 0.5rem;"></div>
             <table id="events-table"></table>
         </div>
         <div id="stream-content" class="tab-content">
@@ -424,11 +4169,61 @@ HTML_TEMPLATE = """
                      <button class="stream-filter-btn active" data-since="3600" data-i18n="streamLastHour"></button>
                      <button class="stream-filter-btn" data-since="86400" data-i18n="streamLast24h"></button>
                      <button class="stream-filter-btn" data-since="0" data-i18n="streamLiveOnly"></button>
+                     <input type="text" id="stream-filter-kind" class="form-control stream-filter" data-i18n-placeholder="filterKindPlaceholder">
+                     <input type="text" id="stream-filter-author" class="form-control stream-filter" data-i18n-placeholder="filterAuthorPlaceholder">
+                     <button id="stream-pause-btn" class="secondary"></button>
                 </div>
             </div>
             <h3 data-i18n="streamTitle"></h3><table id="stream-table"></table>
         </div>
-        <div id="banned-content" class="tab-content"><h3 data-i18n="bannedListTitle"></h3><ul id="banned-list"></ul></div>
+        <div id="suspects-content" class="tab-content">
+            <div class="activity-header">
+                <h3 data-i18n="suspectsTitle"></h3>
+                <div>
+                    <button class="suspects-window-btn active" data-window="1h">1h</button>
+                    <button class="suspects-window-btn" data-window="6h">6h</button>
+                    <button class="suspects-window-btn" data-window="24h">24h</button>
+                </div>
+            </div>
+            <div id="suspects-status" style="font-size: 0.85em; color: var(--secondary); margin-bottom: 0.5rem;"></div>
+            <table id="suspects-table"></table>
+        </div>
+        <div id="banned-content" class="tab-content">
+            <div class="batch-delete-card">
+                <h3 data-i18n="bulkBanTitle"></h3>
+                <textarea id="bulk-ban-input" class="form-control" rows="5" data-i18n-placeholder="bulkBanPlaceholder" style="width: 100%; box-sizing: border-box; font-family: monospace;"></textarea>
+                <div class="controls-grid" style="margin-top: 0.5rem;">
+                    <input type="file" id="bulk-ban-file" accept=".txt,.json,text/plain,application/json">
+                    <button id="bulk-ban-btn" class="danger" data-i18n="banAction"></button>
+                    <button id="bulk-unban-btn" class="secondary" data-i18n="unbanAction"></button>
+                    <label><input type="checkbox" id="bulk-ban-purge"> <span data-i18n="purgeEventsOption"></span></label>
+                </div>
+                <div id="bulk-ban-status" style="margin-top: 1rem; font-size: 0.9em;"></div>
+                <div class="controls-grid" style="margin-top: 1rem;">
+                    <button id="purge-banned-btn" class="danger" data-i18n="purgeBannedAction"></button>
+                </div>
+                <div id="purge-status" style="margin-top: 1rem; font-size: 0.9em;"></div>
+            </div>
+            <h3 data-i18n="bannedListTitle"></h3><ul id="banned-list"></ul>
+        </div>
+        <div id="performance-content" class="tab-content">
+            <div class="activity-header">
+                <h3 data-i18n="perfStatementsTitle"></h3>
+                <div>
+                    <select id="perf-order" class="form-control">
+                        <option value="total" data-i18n="perfOrder_total"></option><option value="average" data-i18n="perfOrder_average"></option>
+                        <option value="max" data-i18n="perfOrder_max"></option><option value="calls" data-i18n="perfOrder_calls"></option>
+                        <option value="steps" data-i18n="perfOrder_steps"></option>
+                    </select>
+                    <button id="perf-refresh-btn" class="secondary" data-i18n="perfRefresh"></button>
+                    <button id="perf-reset-btn" class="danger" data-i18n="perfReset"></button>
+                </div>
+            </div>
+            <table id="perf-statements-table"></table>
+            <h3 data-i18n="perfSlowTitle"></h3>
+            <div id="perf-slow-status" style="font-size: 0.85em; color: var(--secondary); margin-bottom: 0.5rem;"></div>
+            <table id="perf-slow-table"></table>
+        </div>
         <div id="config-content" class="tab-content"><h3 data-i18n="relayConfig"></h3><textarea id="config-editor"></textarea><br><button id="save-config-btn" style="margin-top:10px;" data-i18n="saveConfigButton"></button></div>
     </div>
     
@@ -438,41 +4233,112 @@ HTML_TEMPLATE = """
 <script>
     const translations = {
         de: {
-            title:"Nostr Relay Admin-Panel by relayted.de", tabDashboard:"Dashboard", tabEvents:"Events", tabStream:"Live Stream", tabBanned:"Gesperrte", tabConfig:"Konfiguration",
+            title:"Nostr Relay Admin-Panel by relayted.de", tabDashboard:"Dashboard", tabEvents:"Events", tabStream:"Live Stream", tabBanned:"Gesperrte", tabConfig:"Konfiguration", tabSuspects:"Verdächtige", tabPerformance:"Performance",
+            retentionTitle:"Aufbewahrungsregeln", retentionKindPlaceholder:"Art (leer = alle)", retentionAgePlaceholder:"Älter als (Tage)", retentionCapPlaceholder:"Max. Events pro Autor",
+            retentionAdd:"Regel hinzufügen", retentionQuietHours:"Ruhezeit (Stunden):", retentionSave:"Speichern", retentionEstimate:"Probelauf", retentionRunNow:"Jetzt ausführen",
+            retentionHistory:"Verlauf", retentionRule:"Regel", retentionEnabled:"Aktiv", retentionWouldDelete:"Würde löschen", retentionLastRun:"Zuletzt", colStatus:"Status",
+            retentionQuietActive:"Ruhezeit aktiv", retentionQuietInactive:"außerhalb der Ruhezeit", confirmRetentionRun:"Alle aktiven Regeln jetzt ausführen, auch außerhalb der Ruhezeit?",
+            titleStorage:"Speicherplatz", storageRefresh:"Neu berechnen", storageByKind:"Nach Art", storageByAuthor:"Nach Autor", storageObjects:"Tabellen und Indizes",
+            colBytes:"Größe", colShare:"Anteil", colName:"Name", colFill:"Füllgrad", storageNone:"Noch kein Bericht.", storageFree:"freie Seiten",
+            storageFragmentation:"Fragmentierung", storageOlderThan:"älter als {d} Tage", storageSampled:"Stichprobe", storageGenerated:"Stand",
+            maintenanceTitle:"Wartung", maintenanceIncrementalVacuum:"Freie Seiten freigeben", maintenanceAnalyze:"ANALYZE", maintenanceOptimize:"PRAGMA optimize",
+            maintenanceCheckpoint:"WAL-Checkpoint", maintenanceVacuumInto:"VACUUM INTO (Kopie)", maintenanceIncrementalOption:"Kopie mit auto_vacuum = INCREMENTAL",
+            maintenanceReclaimable:"freigebbar", maintenanceWriteRate:"Schreiblast {rate} Events/s (Grenze {max})", maintenanceBusy:"Relay zu ausgelastet für Wartung", maintenanceMeasuring:"Schreiblast wird gemessen …",
+            maintenanceReclaimed:"{bytes} freigegeben", maintenanceCopy:"Kopie: {path} ({bytes}). Bei gestopptem Relay gegen die Datenbank tauschen.",
+            confirmVacuumInto:"Eine verdichtete Kopie der gesamten Datenbank schreiben (ca. {bytes})?",
+            suspectsTitle:"Auffällige Autoren", colScore:"Score", colRate:"Events/h (Spitze)", colDuplicates:"Duplikate", colKinds:"Arten",
+            suspectsUpdated:"Aktualisiert {time}", suspectsPending:"{n} Events noch nicht bewertet", suspectsEmpty:"Keine Aktivität im Zeitraum.",
+            perfStatementsTitle:"SQL-Anweisungen des Panels", perfSlowTitle:"Langsame Anweisungen", perfRefresh:"Aktualisieren", perfReset:"Zurücksetzen",
+            perfOrder_total:"Gesamtzeit", perfOrder_average:"Ø Zeit", perfOrder_max:"Max. Zeit", perfOrder_calls:"Aufrufe", perfOrder_steps:"VM-Schritte",
+            colStatement:"Anweisung", colCallers:"Aufgerufen von", colCalls:"Aufrufe", colTotalMs:"Gesamt ms", colAvgMs:"Ø ms", colMaxMs:"Max. ms",
+            colRows:"Zeilen", colSteps:"VM-Schritte", colPlan:"Abfrageplan", colTime:"Zeit", perfEmpty:"Noch keine Anweisungen erfasst.",
+            perfSlowEmpty:"Keine Anweisung über {s} s.", perfSlowStatus:"Anweisungen über {s} s, neueste zuerst · {n} Anweisungen erfasst",
+            perfFullScan:"Liest die ganze Tabelle", perfSuggestion:"Vorgeschlagener Index", confirmPerfReset:"Profil und Protokoll zurücksetzen?",
             statTotalEvents:"Events Gesamt", statUniqueUsers:"Eind. Nutzer", statBannedUsers: "Gesperrte Nutzer", statEvents24h:"Events (24h)", statEvents1h:"Events (1h)",
             statNewUsers24h:"Neue Nutzer (24h)", statDmPercentage:"Verschl. DMs", statDbSize:"DB Größe", statOldestEvent:"Ältestes Event",
-            titleTopKinds:"Top 5 Event-Arten", titleTopUsers:"Top 5 Aktivste Nutzer",
+            titleTopKinds:"Top 5 Event-Arten", titleTopUsers:"Top 5 Aktivste Nutzer", titleActivity:"Aktivität", activityNewUsers:"neue Nutzer",
             batchDeleteTitle: "Events stapelweise löschen", filterByAge: "Älter als", filterByKind: "Nach Art",
             colKind:"Art", colCount:"Anzahl", colPubkey:"Pubkey", colTime: "Zeit", colContent:"Inhalt", colActions:"Aktionen", colActionsLive:"Aktionen",
             actionCopy:"Pubkey Kopieren", actionView:"Profil ansehen", deleteAction:"Löschen", banAction:"Sperren", unbanAction:"Entsperren",
             copied:"Kopiert!", error:"Fehler", success:"Erfolg", streamTitle:"Live Event Stream", bannedListTitle:"Gesperrte Nutzer",
             relayConfig: "Relay Konfiguration", saveConfigButton: "Speichern", eventSearchPlaceholder: "Suche...",
-            confirmDelete:"Event löschen?", confirmConfigSave:"Konfiguration speichern?",
+            filterKindPlaceholder:"Arten, z.B. 1,7", filterAuthorPlaceholder:"Autor (hex oder npub)", filterSince:"Von", filterUntil:"Bis", searchIndexLag:"Volltextindex: {n} Events noch nicht indiziert", searchRanked:"Volltextsuche, nach Relevanz sortiert", confirmDelete:"Event löschen?", confirmConfigSave:"Konfiguration speichern?",
             confirmBatchDelete: "Möchten Sie wirklich diese Events basierend auf den Filtern löschen?",
             confirmBanWithRestart: "Nutzer sperren?\\n\\nWICHTIG: Das Relay muss danach neu gestartet werden, damit die Sperre wirksam wird!\\n(z.B. mit 'sudo systemctl restart nostr-rs-relay')",
             confirmUnbanWithRestart: "Nutzer entsperren?\\n\\nWICHTIG: Das Relay muss danach neu gestartet werden, damit die Änderung wirksam wird!\\n(z.B. mit 'sudo systemctl restart nostr-rs-relay')",
+            confirmBanLive: "Nutzer sperren?\\n\\nDie Sperre wirkt sofort.", confirmUnbanLive: "Nutzer entsperren?\\n\\nDie Änderung wirkt sofort.",
+            jobLabel: "Job", jobAffected: "Events", jobCancel: "Abbrechen", jobStatus_queued: "wartet", jobStatus_running: "läuft",
+            jobStatus_done: "fertig", jobStatus_failed: "fehlgeschlagen", jobStatus_cancelled: "abgebrochen", 'jobAffected_bulk-ban': "Pubkeys", jobAffected_maintenance: "Seiten",
+            bulkBanTitle: "Massensperre", bulkBanPlaceholder: "Pubkeys (hex oder npub), einer pro Zeile – oder Datei wählen", banSearchAuthors: "Alle Autoren der Suche sperren",
+            confirmBanSearch: "{n} Autoren sperren?", bulkNothing: "Keine Pubkeys angegeben.", bulkStatus_banned: "gesperrt", bulkStatus_already_banned: "bereits gesperrt",
+            bulkStatus_unbanned: "entsperrt", bulkStatus_not_banned: "nicht gesperrt", bulkStatus_invalid: "ungültig", bulkStatus_duplicate: "doppelt",
+            exportAction: "Exportieren (NDJSON)", exportHint: "Lädt alle Events, die den Filtern entsprechen, als gzip-komprimiertes NDJSON herunter (ohne Suchbegriff)",
+            importTitle: "Events importieren (NDJSON, auch gzip)", importAction: "Importieren", importVerify: "Signaturen prüfen", importNothing: "Keine Datei gewählt.",
+            importCount_lines: "Zeilen", importCount_inserted: "importiert", importCount_duplicate: "bereits vorhanden", importCount_banned: "gesperrt",
+            importCount_invalid_json: "kein JSON", importCount_invalid_event: "ungültig", importCount_invalid_id: "falsche ID", importCount_invalid_sig: "falsche Signatur",
+            importCount_ephemeral: "flüchtig", importCount_expired: "abgelaufen", importCount_superseded: "überholt", importCount_hidden: "gelöscht (NIP-09)",
+            purgeEventsOption: "Gespeicherte Events ebenfalls löschen", purgeBannedAction: "Events aller gesperrten Nutzer löschen",
+            confirmPurge: "Auch alle bereits gespeicherten Events dieses Nutzers löschen?", confirmPurgeAll: "Alle gespeicherten Events sämtlicher gesperrter Nutzer löschen?",
+            purgeReclaimed: "{events} Events und {tags} Tags gelöscht, {bytes} Daten, {pages} freie Seiten",
+            streamPause: "Pause", streamResume: "Fortsetzen", streamNew: "neu",
             streamTimeFilter: "Zeitfilter:", streamLastHour: "Letzte Stunde", streamLast24h: "Letzte 24h", streamLiveOnly: "Nur Live"
         },
         en: {
-            title:"Nostr Relay Admin Panel by relayted.de", tabDashboard:"Dashboard", tabEvents:"Events", tabStream:"Live Stream", tabBanned:"Banned", tabConfig:"Configuration",
+            title:"Nostr Relay Admin Panel by relayted.de", tabDashboard:"Dashboard", tabEvents:"Events", tabStream:"Live Stream", tabBanned:"Banned", tabConfig:"Configuration", tabSuspects:"Suspects", tabPerformance:"Performance",
+            retentionTitle:"Retention rules", retentionKindPlaceholder:"Kind (empty = all)", retentionAgePlaceholder:"Older than (days)", retentionCapPlaceholder:"Max events per author",
+            retentionAdd:"Add rule", retentionQuietHours:"Quiet hours:", retentionSave:"Save", retentionEstimate:"Dry run", retentionRunNow:"Run now",
+            retentionHistory:"History", retentionRule:"Rule", retentionEnabled:"Enabled", retentionWouldDelete:"Would delete", retentionLastRun:"Last run", colStatus:"Status",
+            retentionQuietActive:"quiet hours active", retentionQuietInactive:"outside quiet hours", confirmRetentionRun:"Run all enabled rules now, even outside the quiet hours?",
+            titleStorage:"Storage", storageRefresh:"Recalculate", storageByKind:"By kind", storageByAuthor:"By author", storageObjects:"Tables and indexes",
+            colBytes:"Size", colShare:"Share", colName:"Name", colFill:"Fill", storageNone:"No report yet.", storageFree:"free pages",
+            storageFragmentation:"fragmentation", storageOlderThan:"older than {d} days", storageSampled:"sampled", storageGenerated:"As of",
+            maintenanceTitle:"Maintenance", maintenanceIncrementalVacuum:"Release free pages", maintenanceAnalyze:"ANALYZE", maintenanceOptimize:"PRAGMA optimize",
+            maintenanceCheckpoint:"WAL checkpoint", maintenanceVacuumInto:"VACUUM INTO (copy)", maintenanceIncrementalOption:"Copy with auto_vacuum = INCREMENTAL",
+            maintenanceReclaimable:"reclaimable", maintenanceWriteRate:"Write load {rate} events/s (limit {max})", maintenanceBusy:"Relay too busy for maintenance", maintenanceMeasuring:"Measuring write load …",
+            maintenanceReclaimed:"{bytes} reclaimed", maintenanceCopy:"Copy: {path} ({bytes}). Swap it in for the database while the relay is stopped.",
+            confirmVacuumInto:"Write a compacted copy of the whole database (about {bytes})?",
+            suspectsTitle:"Suspicious authors", colScore:"Score", colRate:"Events/h (peak)", colDuplicates:"Duplicates", colKinds:"Kinds",
+            suspectsUpdated:"Updated {time}", suspectsPending:"{n} events not yet scored", suspectsEmpty:"No activity in this window.",
+            perfStatementsTitle:"Panel SQL statements", perfSlowTitle:"Slow statements", perfRefresh:"Refresh", perfReset:"Reset",
+            perfOrder_total:"Total time", perfOrder_average:"Avg. time", perfOrder_max:"Max. time", perfOrder_calls:"Calls", perfOrder_steps:"VM steps",
+            colStatement:"Statement", colCallers:"Called from", colCalls:"Calls", colTotalMs:"Total ms", colAvgMs:"Avg. ms", colMaxMs:"Max. ms",
+            colRows:"Rows", colSteps:"VM steps", colPlan:"Query plan", colTime:"Time", perfEmpty:"No statements recorded yet.",
+            perfSlowEmpty:"No statement over {s} s.", perfSlowStatus:"Statements over {s} s, newest first · {n} statements tracked",
+            perfFullScan:"Reads the whole table", perfSuggestion:"Suggested index", confirmPerfReset:"Reset the profile and the log?",
             statTotalEvents:"Total Events", statUniqueUsers:"Unique Users", statBannedUsers: "Banned Users", statEvents24h:"Events (24h)", statEvents1h:"Events (1h)",
             statNewUsers24h:"New Users (24h)", statDmPercentage:"Encrypted DMs", statDbSize:"DB Size", statOldestEvent:"Oldest Event",
-            titleTopKinds:"Top 5 Event Kinds", titleTopUsers:"Top 5 Busiest Users",
+            titleTopKinds:"Top 5 Event Kinds", titleTopUsers:"Top 5 Busiest Users", titleActivity:"Activity", activityNewUsers:"new users",
             batchDeleteTitle: "Batch Delete Events", filterByAge: "Older than", filterByKind: "By Kind",
             colKind:"Kind", colCount:"Count", colPubkey:"Pubkey", colTime: "Time", colContent:"Content", colActions:"Actions", colActionsLive:"Actions",
             actionCopy:"Copy Pubkey", actionView:"View Profile", deleteAction:"Delete", banAction:"Ban", unbanAction:"Unban",
             copied:"Copied!", error:"Error", success:"Success", streamTitle:"Live Event Stream", bannedListTitle:"Banned Users",
             relayConfig: "Relay Configuration", saveConfigButton: "Save", eventSearchPlaceholder: "Search...",
-            confirmDelete:"Delete event?", confirmConfigSave:"Save configuration?",
+            filterKindPlaceholder:"Kinds, e.g. 1,7", filterAuthorPlaceholder:"Author (hex or npub)", filterSince:"From", filterUntil:"Until", searchIndexLag:"Full-text index: {n} events not yet indexed", searchRanked:"Full-text search, ranked by relevance", confirmDelete:"Delete event?", confirmConfigSave:"Save configuration?",
             confirmBatchDelete: "Are you sure you want to delete events based on these filters?",
             confirmBanWithRestart: "Ban user?\\n\\nIMPORTANT: The relay must be restarted for the ban to take effect!\\n(e.g., with 'sudo systemctl restart nostr-rs-relay')",
             confirmUnbanWithRestart: "Unban user?\\n\\nIMPORTANT: The relay must be restarted for the change to take effect!\\n(e.g., with 'sudo systemctl restart nostr-rs-relay')",
+            confirmBanLive: "Ban user?\\n\\nThe ban takes effect immediately.", confirmUnbanLive: "Unban user?\\n\\nThe change takes effect immediately.",
+            jobLabel: "Job", jobAffected: "events", jobCancel: "Cancel", jobStatus_queued: "queued", jobStatus_running: "running",
+            jobStatus_done: "done", jobStatus_failed: "failed", jobStatus_cancelled: "cancelled", 'jobAffected_bulk-ban': "pubkeys", jobAffected_maintenance: "pages",
+            bulkBanTitle: "Bulk ban", bulkBanPlaceholder: "Pubkeys (hex or npub), one per line – or choose a file", banSearchAuthors: "Ban all authors matching search",
+            confirmBanSearch: "Ban {n} authors?", bulkNothing: "No pubkeys given.", bulkStatus_banned: "banned", bulkStatus_already_banned: "already banned",
+            bulkStatus_unbanned: "unbanned", bulkStatus_not_banned: "not banned", bulkStatus_invalid: "invalid", bulkStatus_duplicate: "duplicate",
+            exportAction: "Export (NDJSON)", exportHint: "Downloads every event matching the filters as gzip-compressed NDJSON (the search term is ignored)",
+            importTitle: "Import events (NDJSON, gzip allowed)", importAction: "Import", importVerify: "Verify signatures", importNothing: "No file selected.",
+            importCount_lines: "lines", importCount_inserted: "imported", importCount_duplicate: "already stored", importCount_banned: "banned",
+            importCount_invalid_json: "not JSON", importCount_invalid_event: "malformed", importCount_invalid_id: "wrong id", importCount_invalid_sig: "bad signature",
+            importCount_ephemeral: "ephemeral", importCount_expired: "expired", importCount_superseded: "superseded", importCount_hidden: "deleted (NIP-09)",
+            purgeEventsOption: "Also delete stored events", purgeBannedAction: "Delete events of all banned users",
+            confirmPurge: "Also delete all events this user has already stored?", confirmPurgeAll: "Delete all stored events of every banned user?",
+            purgeReclaimed: "Deleted {events} events and {tags} tags, {bytes} of data, {pages} of free pages",
+            streamPause: "Pause", streamResume: "Resume", streamNew: "new",
             streamTimeFilter: "Time Filter:", streamLastHour: "Last Hour", streamLast24h: "Last 24h", streamLiveOnly: "Live Only"
         }
     };
     let currentLang = 'de';
     
     document.addEventListener('DOMContentLoaded', () => {
+        const virtualTables = [];
         const setLanguage = (lang) => {
             currentLang = lang;
             document.documentElement.lang = lang;
@@ -484,15 +4350,30 @@ HTML_TEMPLATE = """
                 const key = el.getAttribute('data-i18n-placeholder');
                 if (translations[lang]?.[key]) el.placeholder = translations[lang][key];
             });
+            document.querySelectorAll('[data-i18n-title]').forEach(el => {
+                const key = el.getAttribute('data-i18n-title');
+                if (translations[lang]?.[key]) el.title = translations[lang][key];
+            });
             document.title = translations[lang]?.title || "Nostr Admin";
+            // Re-render visible rows: their buttons are translated, and a tab may just have become visible
+            virtualTables.forEach(view => view.schedule(true));
         };
         
         const apiCall = async (endpoint, options = {}) => {
             const response = await fetch(endpoint, options);
-            if (!response.ok) throw new Error(`${response.status} ${response.statusText}`);
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw new Error(body.error || body.message || `${response.status} ${response.statusText}`);
+            }
             return response.json();
         };
         const escapeHtml = (text) => (typeof text=='string' ? text.replace(/[&<>"']/g, m=>({'&':'&amp;','<':'&lt;','>':'&gt;','\"':'&quot;',"'":'&#039;'})[m]) : '');
+        const formatBytes = (bytes) => {
+            const units = ['B', 'KB', 'MB', 'GB'];
+            let i = 0;
+            while (bytes >= 1024 && i < units.length - 1) { bytes /= 1024; i++; }
+            return `${Math.round(bytes * 10) / 10} ${units[i]}`;
+        };
         const renderNoteContent = (content) => (typeof content=='string' ? escapeHtml(content).replace(/(https?:\/\/[^\s]+\.(?:jpg|jpeg|png|gif|webp|avif))/gi, url => `<br><a href="${url}" target="_blank" rel="noopener noreferrer"><img src="${url}" loading="lazy"></a>`) : '');
         
         async function loadDashboard() {
@@ -514,11 +4395,302 @@ HTML_TEMPLATE = """
                 usersTable.innerHTML = `<thead><tr><th data-i18n="colPubkey"></th><th data-i18n="colCount"></th></tr></thead><tbody>` + stats.top_users.map(u => `<tr><td><a href="#" onclick="viewProfile('${u.pubkey}'); return false;">${u.pubkey.substring(0,15)}...</a></td><td>${u.count.toLocaleString()}</td></tr>`).join('') + `</tbody>`;
                 setLanguage(currentLang);
             } catch(e) { console.error("Dashboard Error:", e); }
+            loadActivity(document.querySelector('.timeline-window-btn.active')?.dataset.window || '24h');
+            loadStorage();
+            loadMaintenance();
+        }
+
+        let retentionEstimates = {};
+        async function loadRetention() {
+            const t = translations[currentLang];
+            try {
+                const data = await apiCall('/api/retention');
+                document.getElementById('retention-quiet-start').value = data.quiet_hours.start;
+                document.getElementById('retention-quiet-end').value = data.quiet_hours.end;
+                document.getElementById('retention-rules-table').innerHTML = `<thead><tr><th data-i18n="retentionRule"></th><th data-i18n="retentionEnabled"></th><th data-i18n="retentionWouldDelete"></th><th data-i18n="retentionLastRun"></th><th></th></tr></thead><tbody>` +
+                    data.rules.map(r => `<tr><td>${escapeHtml(r.description)}</td>
+                        <td><input type="checkbox" ${r.enabled ? 'checked' : ''} onchange="toggleRetentionRule(${r.id}, this.checked)"></td>
+                        <td>${retentionEstimates[r.id] != null ? retentionEstimates[r.id].toLocaleString() : '-'}</td>
+                        <td>${r.last_run_at ? new Date(r.last_run_at * 1000).toLocaleString() : '-'}</td>
+                        <td><button class="danger" onclick="deleteRetentionRule(${r.id})">${t.deleteAction}</button></td></tr>`).join('') + `</tbody>`;
+                document.getElementById('retention-history-table').innerHTML = `<thead><tr><th data-i18n="colTime"></th><th data-i18n="retentionRule"></th><th data-i18n="colCount"></th><th data-i18n="colStatus"></th></tr></thead><tbody>` +
+                    data.history.map(h => `<tr><td>${new Date(h.started_at * 1000).toLocaleString()}</td><td>${escapeHtml(h.description)}</td><td>${h.deleted.toLocaleString()}</td><td>${escapeHtml(h.status)}</td></tr>`).join('') + `</tbody>`;
+                const status = document.getElementById('retention-status');
+                if (data.job_id) {
+                    watchJob(data.job_id, status, () => { loadRetention(); loadDashboard(); });
+                } else {
+                    status.textContent = data.quiet_hours.active ? t.retentionQuietActive : t.retentionQuietInactive;
+                }
+                setLanguage(currentLang);
+            } catch (e) { console.error("Retention Error:", e); }
+        }
+
+        window.toggleRetentionRule = async (ruleId, enabled) => {
+            await apiCall(`/api/retention/rules/${ruleId}`, { method: 'PATCH', body: JSON.stringify({ enabled }), headers: {'Content-Type': 'application/json'} });
+        };
+        window.deleteRetentionRule = async (ruleId) => {
+            await apiCall(`/api/retention/rules/${ruleId}`, { method: 'DELETE' });
+            loadRetention();
+        };
+
+        document.getElementById('retention-add-btn').addEventListener('click', async () => {
+            const rule = {
+                kind: document.getElementById('retention-kind').value,
+                max_age_days: document.getElementById('retention-age').value,
+                author_cap: document.getElementById('retention-cap').value,
+            };
+            try {
+                await apiCall('/api/retention/rules', { method: 'POST', body: JSON.stringify(rule), headers: {'Content-Type': 'application/json'} });
+                ['retention-kind', 'retention-age', 'retention-cap'].forEach(id => { document.getElementById(id).value = ''; });
+                loadRetention();
+            } catch (e) { alert(`Error: ${e.message}`); }
+        });
+        document.getElementById('retention-quiet-btn').addEventListener('click', async () => {
+            const hours = { start: document.getElementById('retention-quiet-start').value, end: document.getElementById('retention-quiet-end').value };
+            try {
+                await apiCall('/api/retention/quiet-hours', { method: 'PUT', body: JSON.stringify(hours), headers: {'Content-Type': 'application/json'} });
+                loadRetention();
+            } catch (e) { alert(`Error: ${e.message}`); }
+        });
+        document.getElementById('retention-estimate-btn').addEventListener('click', async () => {
+            try {
+                retentionEstimates = await apiCall('/api/retention/estimate');
+                loadRetention();
+            } catch (e) { alert(`Error: ${e.message}`); }
+        });
+        document.getElementById('retention-run-btn').addEventListener('click', async () => {
+            if (!confirm(translations[currentLang].confirmRetentionRun)) return;
+            try {
+                await apiCall('/api/retention/run', { method: 'POST', body: JSON.stringify({ force: true }), headers: {'Content-Type': 'application/json'} });
+                retentionEstimates = {};
+                loadRetention();
+            } catch (e) { alert(`Error: ${e.message}`); }
+        });
+
+        async function loadStorage() {
+            const t = translations[currentLang];
+            const summary = document.getElementById('storage-summary');
+            try {
+                const data = await apiCall('/api/storage');
+                const r = data.report;
+                if (!r) { summary.textContent = t.storageNone; return; }
+                const files = r.files_now || r.files;
+                const percent = (ratio) => `${(ratio * 100).toFixed(1)}%`;
+                const ages = Object.entries(r.older_than_days).map(([days, a]) => `${t.storageOlderThan.replace('{d}', days)}: ${a.events.toLocaleString()} Events (${formatBytes(a.bytes)})`);
+                summary.innerHTML = [
+                    `DB ${formatBytes(files.db)} · WAL ${formatBytes(files.wal)}`,
+                    `${t.storageFree} ${percent(r.pages.free_ratio)} (${formatBytes(r.pages.free_bytes)})` + (r.pages.fragmentation_ratio != null ? ` · ${t.storageFragmentation} ${percent(r.pages.fragmentation_ratio)}` : ''),
+                    ages.join(' · '),
+                    `${t.storageGenerated} ${new Date(r.generated_at * 1000).toLocaleString()}${r.sampled ? ` (${t.storageSampled}, ${r.rows_scanned.toLocaleString()} Events)` : ''}`,
+                ].map(line => `<div>${line}</div>`).join('');
+                document.getElementById('storage-kinds-table').innerHTML = `<thead><tr><th data-i18n="colKind"></th><th data-i18n="colCount"></th><th data-i18n="colBytes"></th><th data-i18n="colShare"></th></tr></thead><tbody>` +
+                    r.kinds.slice(0, 10).map(k => `<tr><td>${k.kind}</td><td>${k.events.toLocaleString()}</td><td>${formatBytes(k.bytes)}</td><td>${percent(k.share)}</td></tr>`).join('') + `</tbody>`;
+                document.getElementById('storage-authors-table').innerHTML = `<thead><tr><th data-i18n="colPubkey"></th><th data-i18n="colCount"></th><th data-i18n="colBytes"></th></tr></thead><tbody>` +
+                    r.top_authors.slice(0, 10).map(a => `<tr><td><a href="#" onclick="viewProfile('${a.pubkey}'); return false;">${a.pubkey.substring(0,15)}...</a></td><td>${a.events.toLocaleString()}</td><td>${formatBytes(a.bytes)}</td></tr>`).join('') + `</tbody>`;
+                document.getElementById('storage-objects-table').innerHTML = r.objects ? `<thead><tr><th data-i18n="colName"></th><th data-i18n="colBytes"></th><th data-i18n="colFill"></th></tr></thead><tbody>` +
+                    r.objects.map(o => `<tr><td>${escapeHtml(o.name)}</td><td>${formatBytes(o.bytes)}</td><td>${o.fill_ratio != null ? percent(o.fill_ratio) : '-'}</td></tr>`).join('') + `</tbody>` : '';
+                setLanguage(currentLang);
+            } catch(e) { console.error("Storage Error:", e); }
+        }
+
+        document.getElementById('storage-refresh-btn').addEventListener('click', async () => {
+            try {
+                const result = await apiCall('/api/storage', { method: 'POST' });
+                watchJob(result.job_id, document.getElementById('storage-summary'), () => loadStorage());
+            } catch (e) { alert(`Error: ${e.message}`); }
+        });
+
+        let maintenanceStatus = null;
+        async function loadMaintenance() {
+            const t = translations[currentLang];
+            try {
+                const s = maintenanceStatus = await apiCall('/api/maintenance');
+                document.getElementById('maintenance-summary').innerHTML = [
+                    `auto_vacuum = ${escapeHtml(String(s.auto_vacuum))} · ${t.storageFree} ${formatBytes(s.freelist_count * s.page_size)} · WAL ${formatBytes(s.files.wal)}`,
+                    `${t.maintenanceReclaimable}: ${Object.entries(s.reclaimable_bytes).map(([task, bytes]) => `${task} ${formatBytes(bytes)}`).join(' · ')}`,
+                    s.write_rate == null ? t.maintenanceMeasuring
+                        : t.maintenanceWriteRate.replace('{rate}', s.write_rate).replace('{max}', s.max_write_rate) + (s.allowed ? '' : ` · <strong>${t.maintenanceBusy}</strong>`),
+                ].map(line => `<div>${line}</div>`).join('');
+                document.querySelectorAll('.maintenance-btn').forEach(btn => { btn.disabled = !s.allowed || s.job_id != null; });
+                if (s.job_id) watchMaintenance(s.job_id);
+                // Each status request takes a sample; the next one has a rate to compare against
+                if (s.write_rate == null) setTimeout(loadMaintenance, 2000);
+            } catch (e) { console.error("Maintenance Error:", e); }
+        }
+
+        const watchMaintenance = (jobId) => {
+            const status = document.getElementById('maintenance-status');
+            watchJob(jobId, status, (job) => {
+                const t = translations[currentLang];
+                const r = job.result;
+                if (r) {
+                    if (r.reclaimed_bytes != null) status.innerHTML += ' · ' + t.maintenanceReclaimed.replace('{bytes}', formatBytes(r.reclaimed_bytes));
+                    if (r.path) status.innerHTML += '<br>' + escapeHtml(t.maintenanceCopy.replace('{path}', r.path).replace('{bytes}', formatBytes(r.bytes)));
+                    if (r.stopped) status.innerHTML += ` · ${escapeHtml(r.stopped)}`;
+                }
+                loadMaintenance();
+            });
+        };
+
+        document.querySelectorAll('.maintenance-btn').forEach(btn => btn.addEventListener('click', async () => {
+            const t = translations[currentLang];
+            const body = { task: btn.dataset.task };
+            if (body.task === 'vacuum_into') {
+                if (!confirm(t.confirmVacuumInto.replace('{bytes}', formatBytes(maintenanceStatus?.vacuum_into_estimated_bytes || 0)))) return;
+                body.confirm = true;
+                body.incremental = document.getElementById('maintenance-incremental').checked;
+            }
+            try {
+                const result = await apiCall('/api/maintenance', { method: 'POST', body: JSON.stringify(body), headers: {'Content-Type': 'application/json'} });
+                document.querySelectorAll('.maintenance-btn').forEach(b => { b.disabled = true; });
+                watchMaintenance(result.job_id);
+            } catch (e) { alert(`Error: ${e.message}`); loadMaintenance(); }
+        }));
+
+        const timelineSteps = { '1h': '1m', '24h': '15m', '7d': '1h', '30d': '6h' };
+        async function loadActivity(windowName) {
+            try {
+                const data = await apiCall(`/api/stats/timeseries?window=${windowName}&step=${timelineSteps[windowName]}`);
+                const values = data.points.map(p => p.events);
+                const max = Math.max(1, ...values);
+                const points = values.map((v, i) => `${(i / Math.max(1, values.length - 1) * 600).toFixed(1)},${(78 - v / max * 76).toFixed(1)}`).join(' ');
+                document.getElementById('activity-sparkline').innerHTML = `<polyline points="${points}" fill="none" stroke="var(--primary)" stroke-width="2" vector-effect="non-scaling-stroke"/>`;
+                const totalEvents = values.reduce((a, b) => a + b, 0);
+                const newUsers = data.points.reduce((a, p) => a + p.new_authors, 0);
+                document.getElementById('activity-summary').textContent = `${totalEvents.toLocaleString()} Events · ${newUsers.toLocaleString()} ${translations[currentLang].activityNewUsers} · max ${max.toLocaleString()} / ${data.step}`;
+            } catch(e) { console.error("Activity Error:", e); }
+        }
+
+        // Renders only the rows around the viewport. Row heights are estimated until a
+        // row has been on screen once and measured; everything else is a spacer row.
+        class VirtualTable {
+            constructor(table, columns, renderCells, { estimate = 96, overscan = 6 } = {}) {
+                this.table = table;
+                this.columns = columns;
+                this.renderCells = renderCells;
+                this.estimate = estimate;
+                this.overscan = overscan;
+                this.items = [];
+                this.heights = new Map();
+                this.frame = null;
+                this.rendered = '';
+                this.message = '';
+                this.onNearEnd = null;
+                virtualTables.push(this);
+                table.innerHTML = `<thead><tr>${columns.map(c => `<th data-i18n="${c}"></th>`).join('')}</tr></thead><tbody></tbody>`;
+                this.tbody = table.querySelector('tbody');
+                // Images change row heights once they have loaded
+                this.tbody.addEventListener('load', () => this.schedule(true), true);
+                window.addEventListener('scroll', () => this.schedule(), { passive: true });
+                window.addEventListener('resize', () => this.schedule(true));
+            }
+            heightOf(item) { return this.heights.get(item.id) ?? this.estimate; }
+            setMessage(text) {
+                this.items = [];
+                this.message = text;
+                this.rendered = 'message';
+                this.tbody.innerHTML = `<tr><td colspan="${this.columns.length}" style="text-align:center;">${text}</td></tr>`;
+            }
+            setItems(items) { this.items = items; this.message = ''; this.heights.clear(); this.schedule(true); }
+            append(items) { this.items = this.items.concat(items); this.schedule(true); }
+            prepend(items, maxItems) {
+                // Keep the rows the user is looking at in place when new ones arrive above them
+                if (this.tbody.getBoundingClientRect().top < 0) {
+                    window.scrollBy(0, items.reduce((sum, item) => sum + this.heightOf(item), 0));
+                }
+                this.items = items.concat(this.items);
+                if (this.items.length > maxItems) {
+                    this.items.slice(maxItems).forEach(item => this.heights.delete(item.id));
+                    this.items.length = maxItems;
+                }
+                this.schedule(true);
+            }
+            schedule(force = false) {
+                if (force) this.rendered = '';
+                if (!this.frame) this.frame = requestAnimationFrame(() => { this.frame = null; this.render(); });
+            }
+            render() {
+                if (!this.items.length) {
+                    if (this.message) this.setMessage(this.message);
+                    else if (this.rendered !== 'empty') { this.tbody.innerHTML = ''; this.rendered = 'empty'; }
+                    return;
+                }
+                if (!this.table.offsetParent) return;
+                const viewStart = Math.max(0, -this.tbody.getBoundingClientRect().top);
+                const viewEnd = viewStart + window.innerHeight;
+                let start = 0, top = 0;
+                while (start < this.items.length && top + this.heightOf(this.items[start]) < viewStart) top += this.heightOf(this.items[start++]);
+                let end = start, bottom = top;
+                while (end < this.items.length && bottom < viewEnd) bottom += this.heightOf(this.items[end++]);
+                const from = Math.max(0, start - this.overscan), to = Math.min(this.items.length, end + this.overscan);
+                for (let i = from; i < start; i++) top -= this.heightOf(this.items[i]);
+                let rest = 0;
+                for (let i = to; i < this.items.length; i++) rest += this.heightOf(this.items[i]);
+
+                const key = `${from}:${to}:${top}:${rest}`;
+                if (key !== this.rendered) {
+                    const spacer = (h) => h > 0 ? `<tr class="vt-spacer"><td colspan="${this.columns.length}" style="height:${h}px;padding:0;border:0;"></td></tr>` : '';
+                    this.tbody.innerHTML = spacer(top) + this.items.slice(from, to).map(item => `<tr data-vid="${item.id}">${this.renderCells(item)}</tr>`).join('') + spacer(rest);
+                    this.rendered = key;
+                    let changed = false;
+                    this.tbody.querySelectorAll('tr[data-vid]').forEach(row => {
+                        const h = row.offsetHeight;
+                        if (this.heights.get(row.dataset.vid) !== h) { this.heights.set(row.dataset.vid, h); changed = true; }
+                    });
+                    if (changed) this.schedule(true);
+                }
+                if (this.onNearEnd && to >= this.items.length) this.onNearEnd();
+            }
+        }
+
+        let eventsNextPage = null, eventsLoading = false, eventsGeneration = 0;
+        const renderEventCells = (e) => `
+                        <td>${new Date(e.created_at * 1000).toLocaleString()}</td>
+                        <td>${e.pubkey.substring(0,10)}...</td>
+                        <td>${e.kind}</td>
+                        <td><div class="note-content">${renderNoteContent(e.content)}</div></td>
+                        <td class="actions-cell">
+                            <button onclick="copyPubkey(this, '${e.pubkey}')">${translations[currentLang].actionCopy}</button>
+                            <button class="secondary" onclick="viewProfile('${e.pubkey}')">${translations[currentLang].actionView}</button>
+                            <button class="danger" onclick="deleteEvent('${e.id}')">${translations[currentLang].deleteAction}</button>
+                            <button class="danger" onclick="banUser('${e.pubkey}')">${translations[currentLang].banAction}</button>
+                        </td>`;
+        const eventColumns = ['colTime', 'colPubkey', 'colKind', 'colContent', 'colActions'];
+        const eventsView = new VirtualTable(document.querySelector('#events-table'), eventColumns, renderEventCells);
+        eventsView.onNearEnd = () => loadMoreEvents();
+
+        const eventFilterParams = (query) => {
+            const params = new URLSearchParams({ q: query, limit: 100 });
+            const kind = document.getElementById('event-filter-kind').value.trim();
+            const author = document.getElementById('event-filter-author').value.trim();
+            const since = document.getElementById('event-filter-since').value;
+            const until = document.getElementById('event-filter-until').value;
+            if (kind) params.set('kind', kind);
+            if (author) params.set('author', author);
+            if (since) params.set('since', Math.floor(new Date(since).getTime() / 1000));
+            if (until) params.set('until', Math.floor(new Date(until).getTime() / 1000) + 86399);
+            return params;
+        };
+
+        // Fetches one page; the next page is requested by cursor (or offset for ranked full-text results)
+        async function fetchEventsPage(params) {
+            const response = await fetch(`/api/events?${params}`);
+            if (!response.ok) throw new Error(`${response.status} ${response.statusText}`);
+            const data = await response.json();
+            const nextCursor = response.headers.get('X-Next-Cursor');
+            const nextOffset = response.headers.get('X-Next-Offset');
+            eventsNextPage = null;
+            if (nextCursor) { eventsNextPage = new URLSearchParams(params); eventsNextPage.set('before', nextCursor); }
+            else if (nextOffset) { eventsNextPage = new URLSearchParams(params); eventsNextPage.set('offset', nextOffset); }
+            const lag = parseInt(response.headers.get('X-Index-Lag') || '0', 10);
+            document.getElementById('search-status').textContent = response.headers.get('X-Search-Plan') !== 'fulltext' ? ''
+                : (lag > 0 ? translations[currentLang].searchIndexLag.replace('{n}', lag.toLocaleString()) : translations[currentLang].searchRanked);
+            return data;
         }
 
         async function loadEvents(query = '') {
-            const table = document.querySelector('#events-table');
-            table.innerHTML = `<tbody><tr><td colspan="5" style="text-align:center;">Loading...</td></tr></tbody>`;
+            const generation = ++eventsGeneration;
+            eventsView.setMessage('Loading...');
             try {
                 const kindSelect = document.getElementById('batch-delete-kind');
                 kindSelect.innerHTML = `<option value="">--</option>
@@ -526,40 +4698,95 @@ HTML_TEMPLATE = """
                     <option value="3">Kind 3: Contacts</option><option value="4">Kind 4: Encrypted DM</option>
                     <option value="7">Kind 7: Reaction</option><option value="10002">Kind 10002: Relay List</option>`;
 
-                const data = await apiCall(`/api/events?q=${encodeURIComponent(query)}`);
-                if (data.error) throw new Error(data.error);
-                let tableHTML = `<thead><tr><th data-i18n="colTime"></th><th data-i18n="colPubkey"></th><th data-i18n="colKind"></th><th data-i18n="colContent"></th><th data-i18n="colActions"></th></tr></thead><tbody>`;
-                tableHTML += data.map(e => `
-                    <tr>
-                        <td>${new Date(e.created_at * 1000).toLocaleString()}</td>
-                        <td>${e.pubkey.substring(0,10)}...</td>
-                        <td>${e.kind}</td>
-                        <td><div class="note-content">${renderNoteContent(e.content)}</div></td>
-                        <td class="actions-cell">
-                            <button onclick="copyPubkey(this, '${e.pubkey}')" data-i18n="actionCopy"></button>
-                            <button class="secondary" onclick="viewProfile('${e.pubkey}')" data-i18n="actionView"></button>
-                            <button class="danger" onclick="deleteEvent('${e.id}')" data-i18n="deleteAction"></button>
-                            <button class="danger" onclick="banUser('${e.pubkey}')" data-i18n="banAction"></button>
-                        </td>
-                    </tr>`).join('');
-                table.innerHTML = tableHTML + `</tbody>`;
+                eventsLoading = true;
+                const data = await fetchEventsPage(eventFilterParams(query));
+                if (generation !== eventsGeneration) return;
+                eventsView.setItems(data);
             } catch (e) {
-                 table.innerHTML = `<tbody><tr><td colspan="5" style="text-align:center;">${translations[currentLang].error}</td></tr></tbody>`;
+                 if (generation !== eventsGeneration) return;
+                 eventsNextPage = null;
+                 eventsView.setMessage(translations[currentLang].error);
+            } finally {
+                if (generation === eventsGeneration) eventsLoading = false;
             }
             setLanguage(currentLang);
         }
-        
-        let liveStreamSocket;
-        function startLiveStream(sinceSeconds = 3600) {
+
+        async function loadMoreEvents() {
+            if (eventsLoading || !eventsNextPage) return;
+            const generation = eventsGeneration;
+            eventsLoading = true;
+            try {
+                const data = await fetchEventsPage(eventsNextPage);
+                if (generation !== eventsGeneration) return;
+                eventsView.append(data);
+            } catch (e) {
+                console.error("Events Error:", e);
+            } finally {
+                if (generation === eventsGeneration) eventsLoading = false;
+            }
+        }
+
+        const STREAM_MAX_ROWS = 5000;
+        const renderStreamCells = (event) => `
+                    <td>${new Date(event.created_at * 1000).toLocaleString()}</td>
+                    <td>${event.pubkey.substring(0,10)}...</td>
+                    <td>${event.kind}</td>
+                    <td><div class="note-content">${renderNoteContent(event.content)}</div></td>
+                   <td class="actions-cell">
+                        <button onclick="copyPubkey(this, '${event.pubkey}')">${translations[currentLang].actionCopy}</button>
+                        <button class="secondary" onclick="viewProfile('${event.pubkey}')">${translations[currentLang].actionView}</button>
+                        <button class="danger" onclick="banUser('${event.pubkey}')">${translations[currentLang].banAction}</button>
+                    </td>`;
+        const streamView = new VirtualTable(document.querySelector('#stream-table'), ['colTime', 'colPubkey', 'colKind', 'colContent', 'colActionsLive'], renderStreamCells);
+
+        // Incoming events are queued and rendered at most once per animation frame.
+        // While paused the queue keeps filling (bounded) and is flushed on resume.
+        let streamPending = [], streamPaused = false, streamFrame = null;
+        const updateStreamPauseButton = () => {
+            const t = translations[currentLang];
+            document.getElementById('stream-pause-btn').textContent = streamPaused
+                ? `${t.streamResume} (${streamPending.length.toLocaleString()} ${t.streamNew})` : t.streamPause;
+        };
+        const flushStream = () => {
+            streamFrame = null;
+            if (streamPaused || !streamPending.length) return;
+            const batch = streamPending.reverse();
+            streamPending = [];
+            streamView.prepend(batch, STREAM_MAX_ROWS);
+        };
+        const queueStreamEvent = (event) => {
+            if (!event || !event.pubkey || !event.id) return;
+            streamPending.push(event);
+            if (streamPending.length > STREAM_MAX_ROWS) streamPending.splice(0, streamPending.length - STREAM_MAX_ROWS);
+            if (streamPaused) {
+                updateStreamPauseButton();
+            } else if (!streamFrame) {
+                streamFrame = requestAnimationFrame(flushStream);
+            }
+        };
+
+        const streamMode = "{{ stream_mode }}";
+        // Bans are enforced through the relay's admission hook, no restart needed
+        const bansLive = {{ bans_live }};
+        let liveStreamSocket, liveStreamSource;
+        function stopLiveStream() {
             if (liveStreamSocket) {
                 liveStreamSocket.onmessage = null;
                 liveStreamSocket.close();
                 liveStreamSocket = null;
             }
+            if (liveStreamSource) {
+                liveStreamSource.close();
+                liveStreamSource = null;
+            }
+        }
 
-            const table = document.querySelector('#stream-table');
-            table.innerHTML = `<thead><tr><th data-i18n="colTime"></th><th data-i18n="colPubkey"></th><th data-i18n="colKind"></th><th data-i18n="colContent"></th><th data-i18n="colActionsLive"></th></tr></thead><tbody></tbody>`;
-            const tbody = table.querySelector('tbody');
+        function startLiveStream(sinceSeconds = 3600) {
+            stopLiveStream();
+            streamPending = [];
+            streamView.setItems([]);
+            updateStreamPauseButton();
             setLanguage(currentLang);
 
             const filter = {};
@@ -569,7 +4796,26 @@ HTML_TEMPLATE = """
             } else {
                 filter.since = now;
             }
-            
+            const kinds = document.getElementById('stream-filter-kind').value.split(',').map(k => parseInt(k, 10)).filter(k => !isNaN(k));
+            let author = document.getElementById('stream-filter-author').value.trim();
+            if (author.startsWith('npub')) {
+                try { author = NostrTools.nip19.decode(author).data; } catch(e) { /* sent as-is, rejected by the filter */ }
+            }
+
+            if (streamMode !== 'browser') {
+                // Shared server-side stream (relay subscription or DB tail), filtered per client
+                const params = new URLSearchParams({ since: filter.since });
+                if (kinds.length) params.set('kind', kinds.join(','));
+                if (author) params.set('author', author);
+                liveStreamSource = new EventSource(`/api/stream?${params}`);
+                liveStreamSource.onmessage = (msg) => {
+                    try { queueStreamEvent(JSON.parse(msg.data)); } catch(e) { /* ignore */ }
+                };
+                return;
+            }
+
+            if (kinds.length) filter.kinds = kinds;
+            if (author) filter.authors = [author];
             liveStreamSocket = new WebSocket("{{ relay_websocket_url }}");
             liveStreamSocket.onopen = () => {
                 const subId = `admin-stream-${Math.random().toString(36).substring(2, 9)}`;
@@ -578,24 +4824,78 @@ HTML_TEMPLATE = """
             liveStreamSocket.onmessage = (msg) => {
                 try {
                     const [type, , event] = JSON.parse(msg.data);
-                    if (type === "EVENT" && event && event.pubkey) {
-                        const row = tbody.insertRow(0);
-                        row.innerHTML = `
-                            <td>${new Date(event.created_at * 1000).toLocaleString()}</td>
-                            <td>${event.pubkey.substring(0,10)}...</td>
-                            <td>${event.kind}</td>
-                            <td><div class="note-content">${renderNoteContent(event.content)}</div></td>
-                           <td class="actions-cell">
-                                <button onclick="copyPubkey(this, '${event.pubkey}')">${translations[currentLang].actionCopy}</button>
-                                <button class="secondary" onclick="viewProfile('${event.pubkey}')">${translations[currentLang].actionView}</button>
-                                <button class="danger" onclick="banUser('${event.pubkey}')">${translations[currentLang].banAction}</button>
-                            </td>`;
-                        if(tbody.rows.length > 500) tbody.deleteRow(-1);
-                    }
+                    if (type === "EVENT") queueStreamEvent(event);
                 } catch(e) { /* ignore */ }
             };
         }
+
+        document.getElementById('stream-pause-btn').addEventListener('click', () => {
+            streamPaused = !streamPaused;
+            updateStreamPauseButton();
+            if (!streamPaused && !streamFrame) streamFrame = requestAnimationFrame(flushStream);
+        });
     
+        async function loadSuspects() {
+            const t = translations[currentLang];
+            const table = document.getElementById('suspects-table');
+            const status = document.getElementById('suspects-status');
+            const span = document.querySelector('.suspects-window-btn.active')?.dataset.window || '1h';
+            try {
+                const data = await apiCall(`/api/suspects?window=${span}&limit=100`);
+                const notes = [];
+                if (data.updated_at) notes.push(t.suspectsUpdated.replace('{time}', new Date(data.updated_at * 1000).toLocaleTimeString()));
+                if (data.pending > 0) notes.push(t.suspectsPending.replace('{n}', data.pending.toLocaleString()));
+                status.textContent = notes.join(' · ');
+                table.innerHTML = `<thead><tr><th data-i18n="colPubkey"></th><th data-i18n="colScore"></th><th data-i18n="colRate"></th><th data-i18n="colDuplicates"></th><th data-i18n="colKinds"></th><th data-i18n="colActions"></th></tr></thead><tbody>` +
+                    (data.suspects.length ? data.suspects.map(s => `<tr>
+                        <td><a href="#" onclick="viewProfile('${s.pubkey}'); return false;">${s.pubkey.substring(0,15)}...</a></td>
+                        <td><strong>${s.score}</strong></td>
+                        <td>${s.events_per_hour.toLocaleString()} (${s.peak_hour_events.toLocaleString()})</td>
+                        <td>${s.duplicates.toLocaleString()} (${Math.round(s.duplicate_ratio * 100)}%)</td>
+                        <td>${Object.entries(s.kinds).sort((a, b) => b[1] - a[1]).slice(0, 4).map(([kind, count]) => `${kind}: ${count.toLocaleString()}`).join(', ')}</td>
+                        <td class="actions-cell">
+                            <button onclick="copyPubkey(this, '${s.pubkey}')">${t.actionCopy}</button>
+                            <button class="danger" onclick="banUser('${s.pubkey}').then(loadSuspects)">${t.banAction}</button>
+                        </td></tr>`).join('') : `<tr><td colspan="6" style="text-align:center;">${t.suspectsEmpty}</td></tr>`) + `</tbody>`;
+            } catch (e) { table.innerHTML = `<tr><td>${t.error}: ${escapeHtml(e.message)}</td></tr>`; }
+            setLanguage(currentLang);
+        }
+
+        async function loadPerformance() {
+            const t = translations[currentLang];
+            const statements = document.getElementById('perf-statements-table');
+            const slow = document.getElementById('perf-slow-table');
+            const ms = (seconds) => (seconds * 1000).toLocaleString(undefined, { maximumFractionDigits: 2 });
+            const sql = (text) => `<code title="${escapeHtml(text)}">${escapeHtml(text.length > 160 ? text.substring(0, 160) + '…' : text)}</code>`;
+            try {
+                const data = await apiCall(`/api/performance?order=${document.getElementById('perf-order').value}&limit=100`);
+                statements.innerHTML = `<thead><tr><th data-i18n="colStatement"></th><th>DB</th><th data-i18n="colCallers"></th><th data-i18n="colCalls"></th><th data-i18n="colTotalMs"></th><th data-i18n="colAvgMs"></th><th data-i18n="colMaxMs"></th><th data-i18n="colRows"></th><th data-i18n="colSteps"></th></tr></thead><tbody>` +
+                    (data.statements.length ? data.statements.map(s => `<tr>
+                        <td>${sql(s.sql)}</td><td>${escapeHtml(s.db)}</td><td>${s.callers.map(escapeHtml).join(', ')}</td>
+                        <td>${s.calls.toLocaleString()}${s.errors ? ` (${s.errors.toLocaleString()} ${t.error})` : ''}</td>
+                        <td>${ms(s.total_seconds)}</td><td>${ms(s.average_seconds)}</td><td>${s.slow ? '<strong>' + ms(s.max_seconds) + '</strong>' : ms(s.max_seconds)}</td>
+                        <td>${s.rows.toLocaleString()}</td><td>${s.steps.toLocaleString()}</td></tr>`).join('') : `<tr><td colspan="9" style="text-align:center;">${t.perfEmpty}</td></tr>`) + `</tbody>`;
+                document.getElementById('perf-slow-status').textContent = t.perfSlowStatus.replace('{s}', data.slow_query_seconds).replace('{n}', data.tracked.toLocaleString());
+                slow.innerHTML = `<thead><tr><th data-i18n="colTime"></th><th>ms</th><th data-i18n="colCallers"></th><th data-i18n="colStatement"></th><th data-i18n="colRows"></th><th data-i18n="colPlan"></th></tr></thead><tbody>` +
+                    (data.slow_queries.length ? data.slow_queries.map(q => `<tr>
+                        <td>${new Date(q.at * 1000).toLocaleTimeString()}</td><td><strong>${ms(q.seconds)}</strong></td><td>${escapeHtml(q.db)} · ${escapeHtml(q.caller)}</td>
+                        <td>${sql(q.sql)}</td><td>${q.rows.toLocaleString()} / ${q.steps.toLocaleString()}</td>
+                        <td><pre style="margin: 0; white-space: pre-wrap;">${escapeHtml(q.plan.join('\\n'))}</pre>
+                            ${q.full_scans.length ? `<div>${t.perfFullScan}: ${q.full_scans.map(escapeHtml).join(', ')}</div>` : ''}
+                            ${q.suggestions.map(s => `<div>${t.perfSuggestion}: <code>${escapeHtml(s)}</code></div>`).join('')}</td></tr>`).join('')
+                        : `<tr><td colspan="6" style="text-align:center;">${t.perfSlowEmpty.replace('{s}', data.slow_query_seconds)}</td></tr>`) + `</tbody>`;
+            } catch (e) { statements.innerHTML = `<tr><td>${t.error}: ${escapeHtml(e.message)}</td></tr>`; }
+            setLanguage(currentLang);
+        }
+
+        document.getElementById('perf-order').addEventListener('change', loadPerformance);
+        document.getElementById('perf-refresh-btn').addEventListener('click', loadPerformance);
+        document.getElementById('perf-reset-btn').addEventListener('click', async () => {
+            if (!confirm(translations[currentLang].confirmPerfReset)) return;
+            await apiCall('/api/performance', { method: 'DELETE' });
+            loadPerformance();
+        });
+
         async function loadBannedUsers() {
             const list = document.getElementById('banned-list');
             try {
@@ -621,7 +4921,9 @@ HTML_TEMPLATE = """
         
         document.getElementById('save-config-btn').addEventListener('click', async () => {
             if (confirm(translations[currentLang].confirmConfigSave)) {
-                await apiCall('/api/config', { method: 'POST', body: JSON.stringify({ content: document.getElementById('config-editor').value }), headers: {'Content-Type': 'application/json'} });
+                try {
+                    await apiCall('/api/config', { method: 'POST', body: JSON.stringify({ content: document.getElementById('config-editor').value }), headers: {'Content-Type': 'application/json'} });
+                } catch (e) { alert(`Error: ${e.message}`); }
             }
         });
 
@@ -639,12 +4941,158 @@ HTML_TEMPLATE = """
                     const result = await apiCall('/api/events/batch-delete', {
                         method: 'POST', body: JSON.stringify(payload), headers: {'Content-Type': 'application/json'}
                     });
-                    alert(`${result.deleted_count} events deleted.`);
-                    loadEvents(); loadDashboard();
+                    watchJob(result.job_id, document.getElementById('batch-delete-status'), () => { loadEvents(); loadDashboard(); });
                 } catch (e) { alert(`Error: ${e.message}`); }
             }
         });
 
+        // Polls a background job and renders its progress into `target` until it finishes
+        async function watchJob(jobId, target, onDone) {
+            const t = translations[currentLang];
+            try {
+                const job = await apiCall(`/api/jobs/${jobId}`);
+                const eta = job.eta_seconds != null ? ` · ETA ${Math.ceil(job.eta_seconds / 60)} min` : '';
+                target.innerHTML = `${t.jobLabel} #${job.id}: ${t['jobStatus_' + job.status] || job.status} · ${job.percent}% · ${job.progress.toLocaleString()} ${t['jobAffected_' + job.type] || t.jobAffected}${eta}
+                    ${['queued', 'running'].includes(job.status) ? `<button class="secondary" onclick="cancelJob(${job.id})">${t.jobCancel}</button>` : ''}`;
+                if (['queued', 'running'].includes(job.status)) {
+                    setTimeout(() => watchJob(jobId, target, onDone), 1000);
+                } else {
+                    if (job.error) target.innerHTML += ` · ${escapeHtml(job.error)}`;
+                    if (onDone) onDone(job);
+                }
+            } catch (e) { target.textContent = `${t.error}: ${e.message}`; }
+        }
+
+        // Shows a bulk ban response: a summary per status plus the entries that were rejected
+        const renderBulkResult = (result) => {
+            const t = translations[currentLang];
+            const summary = Object.entries(result.summary || {}).map(([status, count]) => `${count.toLocaleString()} ${t['bulkStatus_' + status] || status}`).join(' · ');
+            const invalid = (result.results || []).filter(r => r.status === 'invalid').map(r => r.input).concat(result.invalid || []);
+            return escapeHtml(summary) + (invalid.length ? `<br><code>${invalid.slice(0, 20).map(i => escapeHtml(String(i))).join(' ')}</code>` : '');
+        };
+
+        // Follows a purge job and reports what it reclaimed
+        const watchPurge = (jobId, target) => {
+            const status = document.createElement('div');
+            target.appendChild(status);
+            watchJob(jobId, status, (job) => {
+                if (job.result) status.innerHTML += '<br>' + translations[currentLang].purgeReclaimed
+                    .replace('{events}', job.result.deleted_count.toLocaleString()).replace('{tags}', job.result.tag_rows.toLocaleString())
+                    .replace('{bytes}', formatBytes(job.result.payload_bytes)).replace('{pages}', formatBytes(job.result.freed_pages_bytes));
+                loadDashboard();
+            });
+        };
+
+        async function submitBulkBan(action, request, target) {
+            const result = await apiCall(`/api/banned/bulk?action=${action}`, request);
+            const refresh = () => { loadBannedUsers(); loadDashboard(); };
+            if (result.job_id) {
+                watchJob(result.job_id, target, (job) => {
+                    if (job.result) target.innerHTML += '<br>' + renderBulkResult(job.result);
+                    if (job.result?.purge_job_id) watchPurge(job.result.purge_job_id, target);
+                    refresh();
+                });
+            } else {
+                target.innerHTML = renderBulkResult(result);
+                if (result.purge_job_id) watchPurge(result.purge_job_id, target);
+                refresh();
+            }
+        }
+
+        const bulkBanFromInput = async (action) => {
+            const target = document.getElementById('bulk-ban-status');
+            const file = document.getElementById('bulk-ban-file').files[0];
+            let text = document.getElementById('bulk-ban-input').value;
+            if (file) text += '\\n' + await file.text();
+            if (!text.trim()) { target.textContent = translations[currentLang].bulkNothing; return; }
+            // A JSON array (e.g. an exported list) is sent as JSON, anything else as a plain list
+            let pubkeys = null;
+            try { const parsed = JSON.parse(text); if (Array.isArray(parsed)) pubkeys = parsed; } catch(e) { /* plain list */ }
+            const purge = action === 'ban' && document.getElementById('bulk-ban-purge').checked;
+            const request = pubkeys
+                ? { method: 'POST', body: JSON.stringify({ action, pubkeys, purge }), headers: {'Content-Type': 'application/json'} }
+                : { method: 'POST', body: text, headers: {'Content-Type': 'text/plain'} };
+            try {
+                await submitBulkBan(pubkeys ? action : `${action}&purge=${purge}`, request, target);
+            } catch (e) { target.textContent = `${translations[currentLang].error}: ${e.message}`; }
+        };
+
+        document.getElementById('bulk-ban-btn').addEventListener('click', () => {
+            if (confirm(translations[currentLang][bansLive ? 'confirmBanLive' : 'confirmBanWithRestart'])) bulkBanFromInput('ban');
+        });
+        document.getElementById('bulk-unban-btn').addEventListener('click', () => {
+            if (confirm(translations[currentLang][bansLive ? 'confirmUnbanLive' : 'confirmUnbanWithRestart'])) bulkBanFromInput('unban');
+        });
+
+        document.getElementById('purge-banned-btn').addEventListener('click', async () => {
+            if (!confirm(translations[currentLang].confirmPurgeAll)) return;
+            const target = document.getElementById('purge-status');
+            target.innerHTML = '';
+            try {
+                const result = await apiCall('/api/banned/purge', { method: 'POST', body: '{}', headers: {'Content-Type': 'application/json'} });
+                watchPurge(result.job_id, target);
+            } catch (e) { target.textContent = `${translations[currentLang].error}: ${e.message}`; }
+        });
+
+        // Resolves the authors of the current search first, so exactly the confirmed set is banned
+        document.getElementById('ban-search-authors-btn').addEventListener('click', async () => {
+            const t = translations[currentLang];
+            const target = document.getElementById('ban-search-status');
+            const search = Object.fromEntries(eventFilterParams(document.getElementById('event-search').value));
+            delete search.limit;
+            try {
+                const preview = await apiCall('/api/banned/bulk', { method: 'POST', body: JSON.stringify({ search, dry_run: true }), headers: {'Content-Type': 'application/json'} });
+                if (!preview.pubkeys.length) { target.textContent = t.bulkNothing; return; }
+                const count = preview.pubkeys.length.toLocaleString() + (preview.limit_reached ? '+' : '');
+                if (!confirm(t.confirmBanSearch.replace('{n}', count))) return;
+                await submitBulkBan('ban', { method: 'POST', body: JSON.stringify({ action: 'ban', pubkeys: preview.pubkeys }), headers: {'Content-Type': 'application/json'} }, target);
+            } catch (e) { target.textContent = `${t.error}: ${e.message}`; }
+        });
+
+        // Filters only: the export streams by id and does not run the search itself
+        document.getElementById('event-export-btn').addEventListener('click', () => {
+            const params = eventFilterParams('');
+            params.delete('q');
+            params.delete('limit');
+            params.set('gzip', '1');
+            window.location.href = `/api/events/export?${params}`;
+        });
+
+        // Shows the import counters that are not zero
+        const renderImportResult = (totals) => {
+            const t = translations[currentLang];
+            return Object.entries(totals).filter(([key, count]) => t['importCount_' + key] && count)
+                .map(([key, count]) => `${count.toLocaleString()} ${t['importCount_' + key]}`).join(' · ');
+        };
+
+        document.getElementById('import-btn').addEventListener('click', async () => {
+            const t = translations[currentLang];
+            const target = document.getElementById('import-status');
+            const file = document.getElementById('import-file').files[0];
+            if (!file) { target.textContent = t.importNothing; return; }
+            const form = new FormData();
+            form.append('file', file);
+            form.append('verify_signatures', document.getElementById('import-verify').checked ? '1' : '0');
+            target.textContent = '…';
+            try {
+                const result = await apiCall('/api/events/import', { method: 'POST', body: form });
+                const refresh = () => { loadEvents(); loadDashboard(); };
+                if (result.job_id) {
+                    watchJob(result.job_id, target, (job) => {
+                        if (job.result) target.innerHTML += '<br>' + escapeHtml(renderImportResult(job.result));
+                        refresh();
+                    });
+                } else {
+                    target.textContent = renderImportResult(result.result);
+                    refresh();
+                }
+            } catch (e) { target.textContent = `${t.error}: ${e.message}`; }
+        });
+
+        window.cancelJob = async (jobId) => {
+            await apiCall(`/api/jobs/${jobId}`, { method: 'DELETE' });
+        };
+
         window.copyPubkey = (btn, pubkey) => {
             if (navigator.clipboard?.writeText) {
                 navigator.clipboard.writeText(pubkey).then(() => {
@@ -674,15 +5122,20 @@ HTML_TEMPLATE = """
         };
 
         window.banUser = async (pubkey) => {
-            if(confirm(translations[currentLang].confirmBanWithRestart)) {
-                await apiCall('/api/banned', { method: 'POST', body: JSON.stringify({pubkey}), headers: {'Content-Type': 'application/json'} });
+            if(confirm(translations[currentLang][bansLive ? 'confirmBanLive' : 'confirmBanWithRestart'])) {
+                const purge = confirm(translations[currentLang].confirmPurge);
+                const result = await apiCall('/api/banned', { method: 'POST', body: JSON.stringify({pubkey, purge}), headers: {'Content-Type': 'application/json'} });
+                if (result.purge_job_id) {
+                    document.getElementById('purge-status').innerHTML = '';
+                    watchPurge(result.purge_job_id, document.getElementById('purge-status'));
+                }
                 if(document.getElementById('banned-content').classList.contains('active')) loadBannedUsers();
                 loadDashboard();
             }
         };
     
         window.unbanUser = async (pubkey) => {
-            if (confirm(translations[currentLang].confirmUnbanWithRestart)) {
+            if (confirm(translations[currentLang][bansLive ? 'confirmUnbanLive' : 'confirmUnbanWithRestart'])) {
                 await apiCall(`/api/banned/${pubkey}`, { method: 'DELETE' });
                 loadBannedUsers(); loadDashboard();
             }
@@ -720,19 +5173,19 @@ HTML_TEMPLATE = """
                 tabContents.forEach(c => c.classList.remove('active'));
                 document.getElementById(`${targetId}-content`).classList.add('active');
                 
-                if (liveStreamSocket && targetId !== 'stream') {
-                    liveStreamSocket.close(); liveStreamSocket = null;
-                }
+                if (targetId !== 'stream') stopLiveStream();
                 switch(targetId) {
                     case 'dashboard': loadDashboard(); break;
-                    case 'events': loadEvents(); break;
+                    case 'events': loadEvents(); loadRetention(); break;
                     case 'stream': 
                         const activeFilter = document.querySelector('#stream-content .stream-filter-btn.active');
                         const sinceSeconds = activeFilter ? parseInt(activeFilter.dataset.since, 10) : 3600;
                         startLiveStream(sinceSeconds);
                         break;
+                    case 'suspects': loadSuspects(); break;
                     case 'banned': loadBannedUsers(); break;
                     case 'config': loadConfig(); break;
+                    case 'performance': loadPerformance(); break;
                 }
                 setLanguage(currentLang);
             });
@@ -748,6 +5201,31 @@ HTML_TEMPLATE = """
         });
 
         document.getElementById('event-search').addEventListener('input', (e) => loadEvents(e.target.value));
+        document.querySelectorAll('.stream-filter').forEach(input => {
+            input.addEventListener('change', () => {
+                const activeFilter = document.querySelector('#stream-content .stream-filter-btn.active');
+                startLiveStream(activeFilter ? parseInt(activeFilter.dataset.since, 10) : 3600);
+            });
+        });
+        document.querySelectorAll('.event-filter').forEach(input => {
+            input.addEventListener('change', () => loadEvents(document.getElementById('event-search').value));
+        });
+
+        document.querySelectorAll('.suspects-window-btn').forEach(btn => {
+            btn.addEventListener('click', (e) => {
+                document.querySelectorAll('.suspects-window-btn').forEach(b => b.classList.remove('active'));
+                e.currentTarget.classList.add('active');
+                loadSuspects();
+            });
+        });
+
+        document.querySelectorAll('.timeline-window-btn').forEach(btn => {
+            btn.addEventListener('click', (e) => {
+                document.querySelectorAll('.timeline-window-btn').forEach(b => b.classList.remove('active'));
+                e.currentTarget.classList.add('active');
+                loadActivity(e.currentTarget.dataset.window);
+            });
+        });
 
         document.querySelectorAll('.lang-switch-btn').forEach(btn => {
             btn.addEventListener('click', (e) => {
@@ -777,5 +5255,101 @@ HTML_TEMPLATE = """
 
 # --- Hauptausführung ---
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Nostr relay admin panel")
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'stats-rebuild', 'stats-check', 'fts-rebuild', 'admission-check', 'admission-selftest', 'import'],
+                        help="serve the panel (default), rebuild or verify the dashboard statistics, rebuild the full-text index, "
+                             "ask the running admission hook about a pubkey the way the relay would, test the hook against a "
+                             "stand-in relay and ban list, or import events from NDJSON")
+    parser.add_argument('file', nargs='?', help="import: NDJSON file (optionally gzipped), '-' for stdin")
+    parser.add_argument('--verify-signatures', action='store_true', help="import: also check signatures (requires coincurve)")
+    parser.add_argument('--pubkey', help="admission-check: pubkey (hex or npub) of the simulated event")
+    parser.add_argument('--kind', type=int, default=1, help="admission-check: kind of the simulated event")
+    parser.add_argument('--host', default='0.0.0.0', help="serve: address to listen on")
+    parser.add_argument('--port', type=int, default=5111, help="serve: port to listen on")
+    parser.add_argument('--workers', type=int, help=f"serve: threads for expensive database queries (default {QUERY_WORKERS}); "
+                                                     "import: processes verifying events (default: one per CPU)")
+    parser.add_argument('--query-timeout', type=float, default=QUERY_TIMEOUT, help="serve: seconds after which a query is aborted")
+    parser.add_argument('--debug', action='store_true', help="serve: Flask development server with reloader and debugger")
+    args = parser.parse_args()
+    if (args.workers is not None and args.workers < 1) or args.query_timeout <= 0:
+        parser.error("--workers must be at least 1 and --query-timeout positive")
+
+    # Needs neither the relay's database nor its config
+    if args.command == 'admission-selftest':
+        if grpc is None:
+            raise SystemExit("grpcio is not installed")
+        steps = admission_selftest()
+        for name, passed, detail in steps:
+            print(f"{'ok  ' if passed else 'FAIL'} {name}: {detail}")
+        raise SystemExit(0 if all(passed for _, passed, _ in steps) else 1)
+
     setup_database()
-    app.run(host='0.0.0.0', port=5111, debug=True)
+    setup_admin_database()
+    try:
+        reconciled = ban_registry.load()
+        if reconciled["added_to_table"] or reconciled["removed_from_table"]:
+            print(f"Reconciled ban list with config.toml: {reconciled}")
+    except Exception as e:
+        print(f"Could not load the ban list from {CONFIG_PATH}: {e}")
+    if LIVE_STREAM_MODE == 'relay' and websocket is None:
+        print("websocket-client is not installed, the live stream falls back to browser mode")
+    if ADMISSION_GRPC_ADDRESS and grpc is None:
+        print("grpcio is not installed, bans only take effect after a relay restart")
+    if args.command == 'stats-rebuild':
+        started = time.time()
+        print(f"Rebuilt statistics from {stats_rebuild()} events in {time.time() - started:.1f}s")
+    elif args.command == 'stats-check':
+        report = stats_check()
+        print(json.dumps(report, indent=2))
+        raise SystemExit(0 if report["consistent"] else 1)
+    elif args.command == 'fts-rebuild':
+        if not fts_ready:
+            raise SystemExit("Full-text search is disabled (FULLTEXT_SEARCH = False or FTS5 missing)")
+        started = time.time()
+        print(f"Indexed {fts_rebuild()} event rows in {time.time() - started:.1f}s")
+    elif args.command == 'admission-check':
+        if not admission_enabled():
+            raise SystemExit("The admission hook is disabled (ADMISSION_GRPC_ADDRESS = None or grpcio missing)")
+        try:
+            pubkey = parse_pubkey(args.pubkey or '').hex()
+        except ValueError as e:
+            raise SystemExit(str(e))
+        decision, message, seconds = admission_check(pubkey, args.kind)
+        print(f"{'PERMIT' if decision == ADMISSION_PERMIT else 'DENY'} {message or ''} ({seconds * 1000:.1f} ms)")
+        raise SystemExit(0 if decision == ADMISSION_PERMIT else 1)
+    elif args.command == 'import':
+        if not args.file:
+            raise SystemExit("Usage: admin-panel.py import FILE|- [--verify-signatures] [--workers N]")
+
+        def report(totals, offset):
+            print(f"{totals['lines']:,} lines · {totals['inserted']:,} inserted · {totals['duplicate']:,} duplicates · "
+                  f"{totals['lines_per_second'] or 0:,} lines/s", flush=True)
+
+        try:
+            raw = sys.stdin.buffer if args.file == '-' else open(args.file, 'rb')
+        except OSError as e:
+            raise SystemExit(f"Cannot open {args.file}: {e.strerror}")
+        try:
+            totals, _ = import_events(open_import_stream(raw), args.verify_signatures, args.workers, on_batch=report)
+        except (OSError, RuntimeError) as e:
+            raise SystemExit(str(e))
+        finally:
+            raw.close()
+        print(json.dumps(totals, indent=2))
+    else:
+        QUERY_WORKERS, QUERY_TIMEOUT = args.workers or QUERY_WORKERS, args.query_timeout
+        if args.debug:
+            # With the debug reloader this block runs twice; only the serving child starts the workers
+            if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+                start_background_workers()
+            app.run(host=args.host, port=args.port, debug=True)
+        else:
+            start_background_workers()
+            # A thread per connection, so open live streams never block other requests;
+            # expensive queries are bounded by the query pool instead
+            server = make_server(args.host, args.port, app, threaded=True)
+            print(f"Admin panel listening on http://{args.host}:{args.port} ({QUERY_WORKERS} query workers, {QUERY_TIMEOUT:g}s query timeout)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,625 @@
+import sqlite3
+import json
+import math
+import hashlib
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+import importlib.util
+from datetime import datetime
+from werkzeug.exceptions import HTTPException
+
+try:
+    import resource  # not available on Windows; peak RSS is then not reported
+except ImportError:
+    resource = None
+
+# Benchmarks for admin-panel.py. `generate` builds a relay database in the
+# nostr-rs-relay schema from a seed, so the same arguments always give the same
+# events. `run` generates one database per size (or reuses it) and measures every
+# endpoint of the panel through the Flask test client, each size in a fresh
+# process so peak memory is comparable. `compare` puts two result files side by side.
+
+PANEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'admin-panel.py')
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_REPEAT = 30
+DEFAULT_DATA_DIR = 'bench-data'
+
+# --- Generator ---
+# Authors follow a Zipf distribution (a few very active accounts, a long tail),
+# kinds a mix typical for a public relay. The relay's rules are applied on the
+# way: only the newest replaceable event per author and kind is kept, and kind 5
+# deletions hide the event they name. Event rates grow towards the present, and
+# a handful of spam bots flood the last 24 hours with near-identical notes.
+# Ids are the real SHA-256 of the event; signatures are random bytes.
+
+RELAY_SCHEMA = '''
+CREATE TABLE event (
+    id INTEGER PRIMARY KEY,
+    event_hash BLOB NOT NULL,
+    first_seen INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    expires_at INTEGER,
+    author BLOB NOT NULL,
+    delegated_by BLOB,
+    kind INTEGER NOT NULL,
+    hidden INTEGER DEFAULT FALSE,
+    content TEXT NOT NULL
+);
+CREATE TABLE tag (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL,
+    name TEXT,
+    value TEXT,
+    created_at INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    FOREIGN KEY(event_id) REFERENCES event(id) ON UPDATE CASCADE ON DELETE CASCADE
+);
+'''
+# Created after the bulk load, which is several times faster than maintaining them row by row
+RELAY_INDEXES = '''
+CREATE UNIQUE INDEX event_hash_index ON event(event_hash);
+CREATE INDEX author_index ON event(author);
+CREATE INDEX kind_index ON event(kind);
+CREATE INDEX created_at_index ON event(created_at);
+CREATE INDEX delegated_by_index ON event(delegated_by);
+CREATE INDEX event_composite_index ON event(kind, created_at);
+CREATE INDEX kind_author_index ON event(kind, author);
+CREATE INDEX kind_created_at_index ON event(kind, created_at);
+CREATE INDEX author_created_at_index ON event(author, created_at);
+CREATE INDEX author_kind_index ON event(author, kind);
+CREATE INDEX tag_val_index ON tag(value);
+CREATE INDEX tag_composite_index ON tag(event_id, name, value);
+CREATE INDEX tag_name_eid_index ON tag(name, event_id, value);
+CREATE INDEX tag_covering_index ON tag(name, kind, value, created_at, event_id);
+'''
+RELAY_SCHEMA_VERSION = 18
+
+KIND_WEIGHTS = {1: 40, 7: 25, 6: 6, 4: 5, 9735: 4, 30078: 3, 0: 2.5, 3: 2.5, 10002: 1.5, 5: 1, 1984: 0.5, 30023: 0.5}
+REPLACEABLE_KINDS = (0, 3, 10002)
+ZIPF_EXPONENT = 1.0
+# Event times are index ** GROWTH of the time span: below 1, recent days get more events
+GROWTH = 0.7
+SPAM_BOTS = 10
+SPAM_SHARE_LAST_DAY = 0.15
+EVENTS_PER_AUTHOR = 25
+BATCH_SIZE = 10000
+WORDS = ('gm nostr relay bitcoin lightning zap sats note freedom privacy keys client follow post reply thread '
+         'meme coffee morning build ship code open source protocol decentralized censorship resistant pleb '
+         'node wallet channel fee block mempool halving price chart moon ngmi wagmi based vibe music art photo '
+         'weekend weather city travel food book podcast video stream live news today tomorrow world people').split()
+RELAYS = ['wss://relay.damus.io', 'wss://nos.lol', 'wss://relay.nostr.band', 'wss://nostr.wine', 'wss://relay.snort.social',
+          'wss://eden.nostr.land', 'wss://relay.primal.net', 'wss://purplepag.es']
+
+class EventFactory:
+    """Builds signed-looking events from one random generator, so a seed reproduces them."""
+
+    def __init__(self, rng, authors, now):
+        self.rng = rng
+        self.authors = authors
+        self.now = now
+        ranks = range(1, len(authors) + 1)
+        total, self.author_weights = 0.0, []
+        for rank in ranks:
+            total += 1 / rank ** ZIPF_EXPONENT
+            self.author_weights.append(total)
+        self.kinds = list(KIND_WEIGHTS)
+        total, self.kind_weights = 0.0, []
+        for kind in self.kinds:
+            total += KIND_WEIGHTS[kind]
+            self.kind_weights.append(total)
+        self.bots = [rng.randbytes(32) for _ in range(SPAM_BOTS)]
+        self.spam_texts = [self.text(12) for _ in range(3)]
+        # The latest event ids seen, for replies, reactions and reposts
+        self.recent = []
+        # Per author the (row id, event id) of their latest note, which a kind 5 deletion refers to
+        self.last_note = {}
+
+    def author(self):
+        return self.rng.choices(self.authors, cum_weights=self.author_weights)[0]
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words))
+
+    def event_ref(self):
+        return self.rng.choice(self.recent) if self.recent else self.rng.randbytes(32).hex()
+
+    def pubkey_ref(self):
+        return self.author().hex()
+
+    def content_and_tags(self, kind):
+        rng = self.rng
+        if kind == 1:
+            tags, content = [], self.text(rng.randint(3, 40))
+            if rng.random() < 0.3:
+                tags += [['e', self.event_ref(), '', 'reply'], ['p', self.pubkey_ref()]]
+            if rng.random() < 0.1:
+                topic = rng.choice(WORDS)
+                tags.append(['t', topic])
+                content += f' #{topic}'
+            if rng.random() < 0.05:
+                content += f' https://image.example/{rng.randbytes(8).hex()}.jpg'
+            return content, tags
+        if kind == 7:
+            return rng.choice(['+', '+', '🤙', '❤️', '-']), [['e', self.event_ref()], ['p', self.pubkey_ref()]]
+        if kind == 6:
+            return '', [['e', self.event_ref(), rng.choice(RELAYS)], ['p', self.pubkey_ref()]]
+        if kind == 4:
+            return rng.randbytes(rng.randint(32, 300)).hex() + '?iv=' + rng.randbytes(16).hex(), [['p', self.pubkey_ref()]]
+        if kind == 9735:
+            return '', [['p', self.pubkey_ref()], ['e', self.event_ref()], ['bolt11', 'lnbc' + rng.randbytes(150).hex()],
+                        ['description', json.dumps({"kind": 9734, "content": "", "tags": [["amount", str(rng.randint(1, 100000) * 1000)]]})]]
+        if kind == 30078:
+            return json.dumps({"settings": rng.randbytes(40).hex()}), [['d', f'app/{rng.randint(1, 50)}/{rng.randbytes(4).hex()}']]
+        if kind == 0:
+            return json.dumps({"name": rng.choice(WORDS) + str(rng.randint(1, 9999)), "about": self.text(15),
+                               "picture": f'https://image.example/{rng.randbytes(8).hex()}.png'}), []
+        if kind == 3:
+            follows = min(int(rng.paretovariate(1.2) * 20), 2000)
+            return '', [['p', self.pubkey_ref()] for _ in range(follows)]
+        if kind == 10002:
+            return '', [['r', relay] for relay in rng.sample(RELAYS, rng.randint(2, 6))]
+        if kind == 1984:
+            return self.text(8), [['p', self.pubkey_ref(), rng.choice(['spam', 'nudity', 'impersonation'])]]
+        if kind == 30023:
+            title = self.text(5)
+            return '\n\n'.join(self.text(rng.randint(40, 200)) for _ in range(rng.randint(2, 12))), \
+                [['d', title.replace(' ', '-')], ['title', title], ['t', rng.choice(WORDS)]]
+        return self.text(10), []
+
+    def event(self, first_seen, spam=False):
+        """(event dict, expires_at) for an event the relay first saw at first_seen."""
+        rng = self.rng
+        if spam:
+            author, kind = rng.choice(self.bots), 1
+            content, tags = rng.choice(self.spam_texts) + ' ' + rng.choice(WORDS), []
+        else:
+            author, kind = self.author(), rng.choices(self.kinds, cum_weights=self.kind_weights)[0]
+            if kind == 5:
+                note = self.last_note.get(author)
+                content, tags = 'deleted', [['e', note[1]]] if note else []
+            else:
+                content, tags = self.content_and_tags(kind)
+        # Mostly published a moment before the relay saw them, sometimes backfilled from long ago
+        created_at = first_seen - (rng.randint(0, 30) if rng.random() > 0.02 else rng.randint(0, 365 * 86400))
+        expires_at = None
+        if kind == 1 and rng.random() < 0.01:
+            expires_at = self.now + rng.randint(3600, 30 * 86400)
+            tags.append(['expiration', str(expires_at)])
+        return make_event(author.hex(), created_at, kind, tags, content, rng.randbytes(64).hex()), expires_at
+
+def make_event(pubkey, created_at, kind, tags, content, sig):
+    serialized = json.dumps([0, pubkey, created_at, kind, tags, content], ensure_ascii=False, separators=(',', ':'))
+    return {"id": hashlib.sha256(serialized.encode('utf-8')).hexdigest(), "pubkey": pubkey, "created_at": created_at,
+            "kind": kind, "tags": tags, "content": content, "sig": sig}
+
+def tag_rows(event_id, event):
+    # Like the relay, only single-letter tags are indexed
+    return [(event_id, tag[0], tag[1], event['created_at'], event['kind']) for tag in event['tags'] if len(tag) >= 2 and len(tag[0]) == 1]
+
+def generate_database(path, events, seed=1, authors=None, days=180, quiet=False):
+    """Writes a relay database with `events` event rows, minus the replaceable events superseded on the way."""
+    started = time.time()
+    rng = random.Random(seed)
+    now = int(time.time())
+    factory = EventFactory(rng, [rng.randbytes(32) for _ in range(authors or max(100, events // EVENTS_PER_AUTHOR))], now)
+    tmp_path = path + '.tmp'
+    for leftover in (tmp_path, tmp_path + '-journal'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executescript(RELAY_SCHEMA)
+    # Ids of superseded replaceable events, deleted in one pass at the end: without indexes, deleting row by row would scan the tags every time
+    conn.execute('CREATE TEMP TABLE superseded (id INTEGER PRIMARY KEY)')
+    span = days * 86400
+    latest = {}
+    for batch_start in range(0, events, BATCH_SIZE):
+        event_rows, tags, superseded, hidden = [], [], [], []
+        for row_id in range(batch_start + 1, min(events, batch_start + BATCH_SIZE) + 1):
+            first_seen = now - span + int(span * (row_id / events) ** GROWTH)
+            spam = first_seen > now - 86400 and rng.random() < SPAM_SHARE_LAST_DAY
+            event, expires_at = factory.event(first_seen, spam)
+            kind, author = event['kind'], bytes.fromhex(event['pubkey'])
+            if kind in REPLACEABLE_KINDS:
+                previous = latest.get((author, kind))
+                if previous:
+                    superseded.append((previous,))
+                latest[(author, kind)] = row_id
+            elif kind == 5 and event['tags']:
+                hidden.append((factory.last_note.pop(author)[0],))
+            elif kind == 1:
+                factory.last_note[author] = (row_id, event['id'])
+            factory.recent.append(event['id'])
+            if len(factory.recent) > 1000:
+                del factory.recent[:500]
+            event_rows.append((row_id, bytes.fromhex(event['id']), first_seen, event['created_at'], expires_at, author, kind,
+                               json.dumps(event, ensure_ascii=False, separators=(',', ':'))))
+            tags.extend(tag_rows(row_id, event))
+        conn.executemany('INSERT INTO event (id, event_hash, first_seen, created_at, expires_at, author, kind, hidden, content) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)', event_rows)
+        conn.executemany('INSERT INTO tag (event_id, name, value, created_at, kind) VALUES (?, ?, ?, ?, ?)', tags)
+        conn.executemany('INSERT INTO superseded (id) VALUES (?)', superseded)
+        conn.executemany('UPDATE event SET hidden = 1 WHERE id = ?', hidden)
+        conn.commit()
+        if not quiet:
+            print(f"\r{path}: {min(events, batch_start + BATCH_SIZE):,} / {events:,} events", end='', file=sys.stderr, flush=True)
+    if not quiet:
+        print(file=sys.stderr)
+    conn.execute('DELETE FROM event WHERE id IN (SELECT id FROM superseded)')
+    conn.execute('DELETE FROM tag WHERE event_id IN (SELECT id FROM superseded)')
+    conn.commit()
+    conn.executescript(RELAY_INDEXES)
+    conn.execute(f'PRAGMA user_version = {RELAY_SCHEMA_VERSION}')
+    conn.commit()
+    stored = conn.execute('SELECT COUNT(*) FROM event').fetchone()[0]
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+    os.replace(tmp_path, path)
+    # Fewer rows than generated events: superseded replaceable events are gone, as on the relay
+    return {"path": path, "events": events, "stored": stored, "seed": seed, "seconds": round(time.time() - started, 1), "bytes": os.path.getsize(path)}
+
+def synthetic_ndjson(rng, count):
+    """Fresh events as an NDJSON upload, for the import endpoint."""
+    now = int(time.time())
+    lines = [json.dumps(make_event(rng.randbytes(32).hex(), now - rng.randint(0, 3600), 1, [['t', rng.choice(WORDS)]],
+                                   ' '.join(rng.choices(WORDS, k=12)), rng.randbytes(64).hex()), separators=(',', ':'))
+             for _ in range(count)]
+    return '\n'.join(lines).encode('utf-8')
+
+# --- Messung ---
+# One database per process: the panel is loaded from its file with the paths
+# pointed at a copy of the database, the statistics are built (and timed), then
+# every scenario is requested `repeat` times after one warm-up request. Cached
+# endpoints are measured cold unless --warm-cache is given. Peak Python memory
+# is taken in one extra traced request, so tracing does not distort the timings.
+
+# Endpoints the harness deliberately leaves out, with the reason
+SKIPPED_ROUTES = {('/api/stream', 'GET'): "endless Server-Sent Events stream"}
+
+def load_panel(panel_path, work_dir):
+    spec = importlib.util.spec_from_file_location('admin_panel_bench', panel_path)
+    panel = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(panel)
+    panel.DATABASE_PATH = os.path.join(work_dir, 'nostr.db')
+    panel.CONFIG_PATH = os.path.join(work_dir, 'config.toml')
+    panel.ADMIN_DATABASE_PATH = os.path.join(work_dir, 'admin-panel.db')
+    panel.IMPORT_DIR = os.path.join(work_dir, 'imports')
+    panel.LIVE_STREAM_MODE = 'database'
+    panel.ADMISSION_GRPC_ADDRESS = None
+    # The only writer is the benchmark itself, so maintenance must not wait for the load to drop
+    panel.MAINTENANCE_MAX_WRITE_RATE = float('inf')
+    panel.setup_database()
+    panel.setup_admin_database()
+    return panel
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a sorted list."""
+    return samples[max(0, min(len(samples), math.ceil(q / 100 * len(samples))) - 1)]
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return round(time.perf_counter() - started, 3), result
+
+def run_until_idle(step):
+    """Calls step() until it reports no more work; returns how often it did work."""
+    rounds = 0
+    while step():
+        rounds += 1
+    return rounds
+
+def build_scenarios(panel, rng):
+    """(name, method, path, options) per scenario. path and options may be functions of the request
+    number, for requests that need a different pubkey or id each time."""
+    conn = sqlite3.connect(panel.DATABASE_PATH)
+    try:
+        max_id, newest = conn.execute('SELECT MAX(id), MAX(created_at) FROM event').fetchone()
+        top_author = conn.execute('SELECT author FROM event WHERE kind = 1 GROUP BY author ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0].hex()
+        sample_event = conn.execute('SELECT event_hash FROM event WHERE id >= ? ORDER BY id LIMIT 1', (max_id // 2,)).fetchone()[0].hex()
+        delete_ids = [row[0] for row in conn.execute('SELECT id FROM event WHERE kind = 7 AND id > ? ORDER BY id LIMIT 1000', (max_id // 3,))]
+    finally:
+        conn.close()
+    day = 86400
+    fresh_keys = lambda count: [rng.randbytes(32).hex() for _ in range(count)]
+    single_bans = fresh_keys(200)
+    bulk_lists = [fresh_keys(1000) for _ in range(50)]
+    with open(panel.CONFIG_PATH) as f:
+        config_content = f.read()
+    return [
+        ('index page', 'GET', '/', None),
+        ('stats', 'GET', '/api/stats', None),
+        ('stats timeseries 24h', 'GET', '/api/stats/timeseries?window=24h&step=1h', None),
+        ('stats timeseries 30d kind 1', 'GET', '/api/stats/timeseries?window=30d&step=1d&kind=1', None),
+        ('suspects 1h', 'GET', '/api/suspects?window=1h', None),
+        ('suspects 24h', 'GET', '/api/suspects?window=24h', None),
+        ('events latest', 'GET', '/api/events?limit=50', None),
+        ('events by author', 'GET', f'/api/events?q={top_author}&limit=50', None),
+        ('events by id', 'GET', f'/api/events?q={sample_event}', None),
+        ('events by id prefix', 'GET', f'/api/events?q={sample_event[:10]}', None),
+        ('events content search', 'GET', '/api/events?q=lightning&limit=50', None),
+        ('events kind and time', 'GET', f'/api/events?kind=7&since={newest - 7 * day}&until={newest - day}&limit=100', None),
+        ('events author filter', 'GET', f'/api/events?author={top_author}&kind=1,6&limit=100', None),
+        ('export 5000', 'GET', '/api/events/export?limit=5000', None),
+        ('export 5000 gzip', 'GET', '/api/events/export?limit=5000&gzip=1', None),
+        ('storage', 'GET', '/api/storage', None),
+        ('retention', 'GET', '/api/retention', None),
+        ('retention estimate', 'GET', '/api/retention/estimate', None),
+        ('maintenance status', 'GET', '/api/maintenance', None),
+        ('pool', 'GET', '/api/pool', None),
+        ('stream status', 'GET', '/api/stream/status', None),
+        ('banned', 'GET', '/api/banned', None),
+        ('ban status', 'GET', '/api/banned/status', None),
+        ('config', 'GET', '/api/config', None),
+        ('performance', 'GET', '/api/performance', None),
+        ('metrics', 'GET', '/metrics', None),
+        ('ban', 'POST', '/api/banned', lambda i: {"json": {"pubkey": single_bans[i % len(single_bans)]}}),
+        ('unban', 'DELETE', lambda i: f'/api/banned/{single_bans[i % len(single_bans)]}', None),
+        ('bulk ban 1000', 'POST', '/api/banned/bulk?action=ban', lambda i: {"json": {"pubkeys": bulk_lists[i % len(bulk_lists)]}}),
+        ('bulk unban 1000', 'POST', '/api/banned/bulk?action=unban', lambda i: {"json": {"pubkeys": bulk_lists[i % len(bulk_lists)]}}),
+        ('import 200 events', 'POST', '/api/events/import', lambda i: {"data": synthetic_ndjson(rng, 200), "content_type": 'application/x-ndjson'}),
+        ('delete event', 'DELETE', lambda i: f'/api/events/{delete_ids[i % len(delete_ids)] if delete_ids else 1}', None),
+        ('save config', 'POST', '/api/config', {"json": {"content": config_content}}),
+        # Rules 1 and 2 are created before the measurement; these add and delete the rules from 3 on
+        ('retention rule add', 'POST', '/api/retention/rules', {"json": {"kind": 1984, "max_age_days": 30}}),
+        ('retention rule delete', 'DELETE', lambda i: f'/api/retention/rules/{i + 3}', None),
+        ('retention rule toggle', 'PATCH', '/api/retention/rules/1', lambda i: {"json": {"enabled": i % 2 == 0}}),
+        ('retention quiet hours', 'PUT', '/api/retention/quiet-hours', {"json": {"start": 2, "end": 6}}),
+        ('queue retention run', 'POST', '/api/retention/run', None),
+        ('queue batch delete', 'POST', '/api/events/batch-delete', {"json": {"kind": 1984, "age_days": 90}}),
+        ('queue storage report', 'POST', '/api/storage', None),
+        ('queue purge', 'POST', '/api/banned/purge', None),
+        ('queue maintenance', 'POST', '/api/maintenance', {"json": {"task": "optimize"}}),
+        ('jobs', 'GET', '/api/jobs', None),
+        ('job', 'GET', '/api/jobs/1', None),
+        ('cancel job', 'DELETE', lambda i: f'/api/jobs/{i + 1}', None),
+        ('performance reset', 'DELETE', '/api/performance', None),
+    ]
+
+def prepare_request(scenario, index):
+    _, method, path, options = scenario
+    return (path(index) if callable(path) else path), method, (options(index) if callable(options) else dict(options or {}))
+
+def request_once(client, prepared):
+    url, method, kwargs = prepared
+    response = client.open(url, method=method, **kwargs)
+    # Reading the body runs streamed responses to the end
+    size = len(response.get_data())
+    response.close()
+    return response.status_code, size
+
+def clear_response_cache(panel):
+    cache = getattr(panel, 'response_cache', None)
+    if cache is not None:
+        with cache.lock:
+            cache.entries.clear()
+
+def measure_scenario(panel, client, scenario, repeat, warm_cache):
+    # Request bodies are built up front, so generating them is not part of the timing
+    requests = [prepare_request(scenario, index) for index in range(repeat + 2)]
+    request_once(client, requests[0])
+    samples, statuses, size = [], {}, 0
+    for prepared in requests[1:-1]:
+        if not warm_cache:
+            clear_response_cache(panel)
+        started = time.perf_counter()
+        status, size = request_once(client, prepared)
+        samples.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+    if not warm_cache:
+        clear_response_cache(panel)
+    tracemalloc.start()
+    try:
+        request_once(client, requests[-1])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    samples.sort()
+    return {"name": scenario[0], "method": scenario[1], "path": requests[0][0], "requests": repeat,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())}, "response_bytes": size,
+            "p50_ms": round(percentile(samples, 50) * 1000, 3), "p90_ms": round(percentile(samples, 90) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3), "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3), "peak_python_bytes": peak}
+
+def route_coverage(panel, scenarios):
+    """Routes and methods no scenario requests, so new endpoints get noticed."""
+    adapter = panel.app.url_map.bind('localhost')
+    covered = set()
+    for scenario in scenarios:
+        url, method, _ = prepare_request(scenario, 0)
+        try:
+            rule, _ = adapter.match(url.split('?')[0], method=method, return_rule=True)
+        except HTTPException:
+            continue
+        covered.add((rule.rule, method))
+    return [{"route": rule.rule, "method": method, "reason": SKIPPED_ROUTES.get((rule.rule, method), "no scenario")}
+            for rule in panel.app.url_map.iter_rules() if rule.endpoint != 'static'
+            for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}) if (rule.rule, method) not in covered]
+
+# Background work, queued through the API and then run in the foreground
+BACKGROUND_JOBS = (
+    ('job batch-delete', '/api/events/batch-delete', {"kind": 7, "age_days": 90}),
+    ('job storage-report', '/api/storage', None),
+    ('job purge-authors', '/api/banned/purge', None),
+    ('job maintenance analyze', '/api/maintenance', {"task": "analyze"}),
+    ('job maintenance checkpoint', '/api/maintenance', {"task": "checkpoint", "mode": "TRUNCATE"}),
+)
+
+def background_tasks(panel, client):
+    admin = sqlite3.connect(panel.ADMIN_DATABASE_PATH)
+    admin.execute("UPDATE jobs SET status = 'cancelled' WHERE status IN ('queued', 'running')")
+    admin.commit()
+    admin.close()
+    tasks = {}
+    for name, path, payload in BACKGROUND_JOBS:
+        response = client.post(path, json=payload)
+        if response.status_code != 202:
+            tasks[name] = {"skipped": f"{response.status_code} {response.get_data(as_text=True)[:200]}"}
+            continue
+        tasks[name] = {"seconds": timed(run_until_idle, panel.run_next_job)[0]}
+    return tasks
+
+def measure_database(db_path, panel_path=PANEL_PATH, repeat=DEFAULT_REPEAT, warm_cache=False, seed=1):
+    work_dir = tempfile.mkdtemp(prefix='nostr-bench-')
+    try:
+        shutil.copyfile(db_path, os.path.join(work_dir, 'nostr.db'))
+        rng = random.Random(seed)
+        conn = sqlite3.connect(os.path.join(work_dir, 'nostr.db'))
+        events = conn.execute('SELECT COUNT(*) FROM event').fetchone()[0]
+        # Recent authors, in a generated database mostly the spam bots
+        banned = [row[0].hex() for row in conn.execute('SELECT DISTINCT author FROM (SELECT author FROM event ORDER BY id DESC LIMIT 100) LIMIT 5')]
+        conn.close()
+        with open(os.path.join(work_dir, 'config.toml'), 'w') as f:
+            f.write('[info]\nname = "benchmark"\n\n[verification]\npubkey_blacklist = [' + ', '.join(f'"{pk}"' for pk in banned) + ']\n')
+        panel = load_panel(panel_path, work_dir)
+        panel.ban_registry.load()
+        # Older panel versions, measured with --panel, may not have these aggregates yet
+        setup = {name: {"seconds": timed(run_until_idle, getattr(panel, step))[0]}
+                 for name, step in (("stats build", 'stats_advance'), ("spam build", 'spam_advance')) if hasattr(panel, step)}
+        client = panel.app.test_client()
+        for rule in ({"kind": 7, "max_age_days": 365}, {"author_cap": 5000}):
+            client.post('/api/retention/rules', json=rule)
+        scenarios = build_scenarios(panel, rng)
+        results = []
+        for scenario in scenarios:
+            results.append(measure_scenario(panel, client, scenario, repeat, warm_cache))
+            print(f"  {scenario[0]}: p50 {results[-1]['p50_ms']} ms, p99 {results[-1]['p99_ms']} ms", file=sys.stderr, flush=True)
+        background = background_tasks(panel, client)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024) if resource else None
+        return {"database": os.path.abspath(db_path), "events": events, "db_bytes": os.path.getsize(db_path), "repeat": repeat,
+                "warm_cache": warm_cache, "setup": setup, "endpoints": results, "background": background,
+                "uncovered_routes": route_coverage(panel, scenarios), "max_rss_bytes": max_rss}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def environment(panel_path):
+    with open(panel_path, 'rb') as f:
+        panel_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    try:
+        commit = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(panel_path)),
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"panel": os.path.abspath(panel_path), "panel_sha256": panel_hash, "git": commit, "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "cpus": os.cpu_count(),
+            "created_at": datetime.now().isoformat(timespec='seconds')}
+
+def run_benchmarks(sizes, panel_path, repeat, warm_cache, data_dir, seed, output):
+    os.makedirs(data_dir, exist_ok=True)
+    results = {"environment": environment(panel_path), "seed": seed, "sizes": []}
+    for size in sizes:
+        db_path = os.path.join(data_dir, f'nostr-{size}-seed{seed}.db')
+        generated = None
+        if not os.path.exists(db_path):
+            generated = generate_database(db_path, size, seed)
+        print(f"Measuring {db_path}", file=sys.stderr)
+        result_path = os.path.join(data_dir, f'.measure-{size}.json')
+        # A fresh process per size, so the peak RSS belongs to this size only
+        subprocess.run([sys.executable, os.path.abspath(__file__), 'measure', db_path, '--panel', panel_path, '--repeat', str(repeat),
+                        '--seed', str(seed), '--output', result_path] + (['--warm-cache'] if warm_cache else []), check=True)
+        with open(result_path) as f:
+            measured = json.load(f)
+        os.remove(result_path)
+        measured["generated"] = generated
+        results["sizes"].append(measured)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    return results
+
+# --- Vergleich ---
+
+def succeeded(endpoint):
+    return all(status.startswith('2') for status in endpoint["statuses"])
+
+def compare_results(old, new, threshold, min_ms=1.0):
+    """Rows of (events, endpoint, old p50, new p50, old p99, new p99, regressed) for endpoints in both files."""
+    # Sizes are matched on the stored event count, which the seed makes reproducible
+    size_key = lambda size: size["events"]
+    # A `measure` result is a single size
+    sizes = lambda result: result.get("sizes", [result])
+    old_sizes = {size_key(size): size for size in sizes(old)}
+    rows = []
+    for size in sizes(new):
+        before = old_sizes.get(size_key(size))
+        if before is None:
+            continue
+        old_endpoints = {endpoint["name"]: endpoint for endpoint in before["endpoints"]}
+        for endpoint in size["endpoints"]:
+            previous = old_endpoints.get(endpoint["name"])
+            # An endpoint the other version does not have (404) or rejects is no baseline
+            if previous is None or not all(succeeded(e) for e in (previous, endpoint)):
+                continue
+            # Differences below min_ms are noise, whatever the ratio
+            regressed = endpoint["p99_ms"] > previous["p99_ms"] * threshold and endpoint["p99_ms"] - previous["p99_ms"] > min_ms
+            rows.append((size_key(size), endpoint["name"], previous["p50_ms"], endpoint["p50_ms"], previous["p99_ms"], endpoint["p99_ms"], regressed))
+    return rows
+
+def print_comparison(rows):
+    print(f"{'events':>10}  {'endpoint':<30} {'p50 old':>9} {'p50 new':>9} {'p99 old':>9} {'p99 new':>9}")
+    for events, name, old_p50, new_p50, old_p99, new_p99, regressed in rows:
+        change = f"{new_p99 / old_p99:.2f}x" if old_p99 else ''
+        print(f"{events:>10,}  {name:<30} {old_p50:>9.2f} {new_p50:>9.2f} {old_p99:>9.2f} {new_p99:>9.2f}  {change}{'  REGRESSION' if regressed else ''}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthetic relay databases and benchmarks for admin-panel.py")
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help="build a synthetic relay database")
+    generate.add_argument('output', help="path of the database to write")
+    generate.add_argument('--events', type=int, default=100000)
+    generate.add_argument('--authors', type=int, help=f"default: one per {EVENTS_PER_AUTHOR} events")
+    generate.add_argument('--days', type=int, default=180, help="time span the events are spread over")
+    generate.add_argument('--seed', type=int, default=1)
+    run = commands.add_parser('run', help="generate databases as needed and benchmark every endpoint on each")
+    run.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="comma-separated event counts")
+    run.add_argument('--output', help="result file (default: <data-dir>/results-<time>.json)")
+    measure = commands.add_parser('measure', help="benchmark every endpoint on one existing database (it is copied, not modified)")
+    measure.add_argument('database')
+    measure.add_argument('--output', help="result file (default: stdout)")
+    for command in (run, measure):
+        command.add_argument('--panel', default=PANEL_PATH, help="admin-panel.py to benchmark, e.g. an older version")
+        command.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="requests per endpoint")
+        command.add_argument('--warm-cache', action='store_true', help="keep the response cache between requests")
+        command.add_argument('--seed', type=int, default=1)
+    run.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="where generated databases and results are kept")
+    compare = commands.add_parser('compare', help="compare two result files; exits 1 on a p99 regression")
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=1.25, help="p99 ratio that counts as a regression")
+    compare.add_argument('--min-ms', type=float, default=1.0, help="p99 increase below which nothing counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        print(json.dumps(generate_database(args.output, args.events, args.seed, args.authors, args.days), indent=2))
+    elif args.command == 'measure':
+        result = {"environment": environment(args.panel), **measure_database(args.database, args.panel, args.repeat, args.warm_cache, args.seed)}
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+        else:
+            print(json.dumps(result, indent=2))
+    elif args.command == 'run':
+        try:
+            sizes = [int(size) for size in args.sizes.split(',')]
+        except ValueError:
+            parser.error("--sizes must be comma-separated integers")
+        output = args.output or os.path.join(args.data_dir, f"results-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        results = run_benchmarks(sizes, args.panel, args.repeat, args.warm_cache, args.data_dir, args.seed, output)
+        for size in results["sizes"]:
+            slowest = sorted(size["endpoints"], key=lambda endpoint: endpoint["p99_ms"], reverse=True)[:5]
+            print(f"{size['events']:,} events: slowest p99 " + ', '.join(f"{e['name']} {e['p99_ms']} ms" for e in slowest))
+        print(f"Results written to {output}")
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare_results(old, new, args.threshold, args.min_ms)
+        print_comparison(rows)
+        raise SystemExit(1 if any(row[-1] for row in rows) else 0)